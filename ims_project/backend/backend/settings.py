@@ -12,7 +12,6 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 import os
-import logging
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -53,6 +52,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "inventory.metrics.RequestMetricsMiddleware",  # Outermost, so it times everything below.
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -157,7 +157,36 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-logging.basicConfig(level=logging.DEBUG)
+# Logging: one JSON object per line, written by a background thread so a
+# request only pays for an enqueue. SQL statements are never logged (even
+# with DEBUG on); set DJANGO_LOG_LEVEL=DEBUG to trace the app's own loggers.
+LOG_LEVEL = os.environ.get("DJANGO_LOG_LEVEL", "INFO")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "json": {"()": "inventory.log.JSONFormatter"},
+    },
+    "filters": {
+        # Low-stock crossings can fire for many products at once.
+        "stock_warnings": {"()": "inventory.log.RateLimitFilter", "rate": 20, "period": 60},
+    },
+    "handlers": {
+        "background": {
+            "()": "inventory.log.BackgroundHandler",
+            "stream": "ext://sys.stderr",
+            "formatter": "json",
+        },
+    },
+    "root": {"handlers": ["background"], "level": "WARNING"},
+    "loggers": {
+        "django": {"level": "INFO"},
+        "django.db.backends": {"level": "WARNING"},
+        "inventory": {"level": LOG_LEVEL},
+        "inventory.alerts": {"level": LOG_LEVEL, "filters": ["stock_warnings"]},
+    },
+}
 
 
 CORS_ALLOWED_ORIGINS = [
@@ -169,15 +198,58 @@ AUTH_USER_MODEL = "inventory.User"
 # ✅ Configure REST Framework Authentication
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",  # ✅ Enable Token Authentication
+        "inventory.auth.CachedTokenAuthentication",  # ✅ Token Authentication, cached per process
         "rest_framework.authentication.SessionAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.AllowAny",  # ✅ Allow unauthenticated access
         # "rest_framework.permissions.IsAuthenticated",  # ✅ Require authentication by default
     ],
+    # Every list endpoint is paged; append-heavy viewsets override this with cursor paging.
+    "DEFAULT_PAGINATION_CLASS": "inventory.pagination.StandardPagination",
+    "PAGE_SIZE": 50,
 }
 
+# Seconds the dashboard snapshot may go without a full rebuild. The report
+# worker (or `rebuild_dashboard --stale` from cron) rebuilds it in the
+# background; requests serve it as stored unless ?fresh=1.
+DASHBOARD_SNAPSHOT_MAX_AGE = 300
+
+# How sales, purchases and other non-transfer transactions without an explicit
+# warehouse pick one: "first", "most_stock", "fifo", "round_robin" or the dotted
+# path of a callable (see inventory/allocation.py). With SPLIT, a bulk-posted
+# sale no single warehouse can cover is taken from several.
+STOCK_ALLOCATION_STRATEGY = "first"
+STOCK_ALLOCATION_SPLIT = True
+
+# Seconds snapshot_stock stays behind the clock, so movements from transactions
+# still open when it runs fall after its cutoff instead of being missed.
+SNAPSHOT_SETTLE_SECONDS = 300
+
+# In-process LRU behind /api/products/lookup/: entries kept, and seconds before
+# another process's writes become visible.
+PRODUCT_LOOKUP_CACHE_SIZE = 4096
+PRODUCT_LOOKUP_CACHE_TTL = 30
+
+# Token authentication cache: entries per process and seconds before a
+# process rechecks the database. TOKEN_AUTH_SHARED_CACHE names a CACHES
+# alias consulted on a local miss (None: database only).
+TOKEN_AUTH_CACHE_SIZE = 10000
+TOKEN_AUTH_CACHE_TTL = 60
+TOKEN_AUTH_SHARED_CACHE = None
+
+# Seconds a token stays valid after login (None: until logout).
+TOKEN_EXPIRY_SECONDS = None
+
+# Hours a transaction Idempotency-Key is remembered (purge_idempotency_keys).
+IDEMPOTENCY_KEY_RETENTION_HOURS = 24
+
+# Requests slower than this are logged with their SQL (None turns it off).
+SLOW_REQUEST_SECONDS = 1.0
+
+# GS1 prefix for generated EAN-13 barcodes; 200-299 is reserved for in-store use.
+BARCODE_PREFIX = "200"
+
 # for image
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
\ No newline at end of file
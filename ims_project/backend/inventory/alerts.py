@@ -0,0 +1,72 @@
+"""
+Low-stock alerting.
+
+``Product.is_low_stock`` records which side of its threshold each product
+is on. The stock mutation paths (stock.apply_deltas, Inventory.save,
+Product.save) compare it with the new stock and only act on a crossing:
+
+- Dropping below the threshold opens a LowStockAlert.
+- Climbing back above it resolves the open alert.
+
+A product that keeps selling while already low creates no new alerts.
+"""
+import logging
+
+from django.db.models import F, Q
+from django.utils.timezone import now
+
+from .models import LowStockAlert, Product
+
+
+# Sampled by the "stock_warnings" filter in settings.LOGGING.
+logger = logging.getLogger(__name__)
+
+
+def record_crossings(crossings):
+    """
+    Open or resolve alerts for ``(product_id, stock, threshold, is_low_stock)``
+    tuples whose low-stock state just changed. Callers update the flag.
+    """
+    dropped = [(product_id, stock, threshold) for product_id, stock, threshold, is_low in crossings if is_low]
+    recovered = [product_id for product_id, _, _, is_low in crossings if not is_low]
+    if dropped:
+        LowStockAlert.objects.bulk_create([
+            LowStockAlert(product_id=product_id, stock=stock, threshold=threshold)
+            for product_id, stock, threshold in dropped
+        ])
+        for product_id, stock, threshold in dropped:
+            logger.warning("product stock below threshold",
+                           extra={"product_id": product_id, "stock": stock, "threshold": threshold})
+    if recovered:
+        LowStockAlert.objects.filter(product_id__in=recovered, status='Open').update(
+            status='Resolved', resolved_at=now()
+        )
+
+
+def sync_low_stock(product_ids):
+    """
+    Flip ``is_low_stock`` for any of these products whose stock crossed the
+    threshold and record the crossings. The locking read sees the latest
+    committed flag, so concurrent sales of the same product raise one alert.
+    """
+    product_ids = set(product_ids)
+    if not product_ids:
+        return
+    crossed = list(
+        Product.objects.select_for_update()
+        .filter(pk__in=product_ids)
+        .filter(
+            Q(is_low_stock=False, stock__lt=F('low_stock_threshold'))
+            | Q(is_low_stock=True, stock__gte=F('low_stock_threshold'))
+        )
+        .order_by('pk')
+        .values_list('pk', 'stock', 'low_stock_threshold', 'is_low_stock')
+    )
+    if not crossed:
+        return
+    crossings = [(pk, stock, threshold, not was_low) for pk, stock, threshold, was_low in crossed]
+    for is_low in (True, False):
+        ids = [pk for pk, _, _, low in crossings if low == is_low]
+        if ids:
+            Product.objects.filter(pk__in=ids).update(is_low_stock=is_low)
+    record_crossings(crossings)
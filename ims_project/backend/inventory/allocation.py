@@ -0,0 +1,156 @@
+"""
+Warehouse allocation for non-transfer transactions.
+
+A transaction posted with an explicit ``warehouse`` is booked there.
+Otherwise the product's candidates are loaded in one query (every
+warehouse, with the product's stock row in it if there is one). The
+STOCK_ALLOCATION_STRATEGY setting orders them:
+
+- ``first``: oldest warehouse first;
+- ``most_stock``: the warehouse holding the most of the product first;
+- ``fifo``: the oldest stock first, by batch number and then by when the
+  row was first stocked;
+- ``round_robin``: the warehouse order rotates on every allocation (per
+  process), which spreads sales over every warehouse that can cover them.
+
+The setting can also be the dotted path of a ``callable(candidates)``
+that returns the candidates in preference order.
+
+Incoming stock goes to the first candidate. Outgoing stock comes from the
+first candidate that can cover the whole quantity. If none can, and
+splitting is allowed, the quantity is taken from the candidates in order.
+"""
+import itertools
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import FilteredRelation, Q
+from django.utils.module_loading import import_string
+
+from .models import Warehouse
+
+
+DEFAULT_STRATEGY = "first"
+
+
+def load_candidates(product_ids):
+    """
+    {product_id: [candidate, ...]} for every warehouse, in warehouse order.
+    A candidate is a dict of ``warehouse_id``, ``quantity``, ``batch_number``
+    and ``stocked_at`` (both None where the product has no row yet).
+    """
+    product_ids = set(product_ids)
+    if not product_ids:
+        return {}
+    rows = (
+        Warehouse.objects
+        .annotate(stock=FilteredRelation(
+            "inventory_stock", condition=Q(inventory_stock__product_id__in=product_ids),
+        ))
+        .order_by("pk")
+        .values_list("pk", "stock__product_id", "stock__quantity", "stock__batch_number", "stock__last_stock_check")
+    )
+    warehouse_ids = []
+    stock = {}
+    for warehouse_id, product_id, quantity, batch_number, stocked_at in rows:
+        if not warehouse_ids or warehouse_ids[-1] != warehouse_id:
+            warehouse_ids.append(warehouse_id)
+        if product_id is not None:
+            stock[(product_id, warehouse_id)] = (quantity, batch_number, stocked_at)
+    return {
+        product_id: [
+            dict(zip(
+                ("warehouse_id", "quantity", "batch_number", "stocked_at"),
+                (warehouse_id, *stock.get((product_id, warehouse_id), (0, None, None))),
+            ))
+            for warehouse_id in warehouse_ids
+        ]
+        for product_id in product_ids
+    }
+
+
+#  STRATEGIES  +++++++++++++++++++++++++++++++++++++++
+def first(candidates):
+    return sorted(candidates, key=lambda c: c["warehouse_id"])
+
+
+def most_stock(candidates):
+    return sorted(candidates, key=lambda c: (-c["quantity"], c["warehouse_id"]))
+
+
+def fifo(candidates):
+    return sorted(candidates, key=lambda c: (
+        c["stocked_at"] is None,
+        c["batch_number"] is None, c["batch_number"] or "",
+        c["stocked_at"] or 0,
+        c["warehouse_id"],
+    ))
+
+
+_turns = itertools.count()
+
+
+def round_robin(candidates):
+    ordered = first(candidates)
+    if not ordered:
+        return ordered
+    start = next(_turns) % len(ordered)
+    return ordered[start:] + ordered[:start]
+
+
+STRATEGIES = {
+    "first": first,
+    "most_stock": most_stock,
+    "fifo": fifo,
+    "round_robin": round_robin,
+}
+
+
+def get_strategy(name=None):
+    name = name or getattr(settings, "STOCK_ALLOCATION_STRATEGY", DEFAULT_STRATEGY)
+    if callable(name):
+        return name
+    if name in STRATEGIES:
+        return STRATEGIES[name]
+    if "." in name:
+        return import_string(name)
+    raise ValidationError(f"Unknown stock allocation strategy: {name}.")
+
+
+#  ALLOCATION  +++++++++++++++++++++++++++++++++++++++
+def allocate(candidates, quantity, incoming, strategy=None, split=None):
+    """
+    Choose where ``quantity`` of one product goes to (incoming) or comes
+    from (outgoing). Returns ``[(warehouse_id, quantity), ...]`` and takes
+    the quantities off (or adds them to) ``candidates``, so later rows of the
+    same batch see what earlier rows used.
+    """
+    if not candidates:
+        raise ValidationError("No warehouse found.")
+    ordered = get_strategy(strategy)(candidates)
+
+    if incoming:
+        ordered[0]["quantity"] += quantity
+        return [(ordered[0]["warehouse_id"], quantity)]
+
+    for candidate in ordered:
+        if candidate["quantity"] >= quantity:
+            candidate["quantity"] -= quantity
+            return [(candidate["warehouse_id"], quantity)]
+
+    if split is None:
+        split = getattr(settings, "STOCK_ALLOCATION_SPLIT", True)
+    if not split or sum(c["quantity"] for c in ordered) < quantity:
+        raise ValidationError("Not enough stock in any warehouse for this transaction.")
+
+    parts = []
+    remaining = quantity
+    for candidate in ordered:
+        taken = min(candidate["quantity"], remaining)
+        if taken:
+            candidate["quantity"] -= taken
+            parts.append((candidate["warehouse_id"], taken))
+            remaining -= taken
+        if not remaining:
+            break
+    return parts
@@ -0,0 +1,174 @@
+"""
+Token authentication without a database round-trip per request.
+
+``CachedTokenAuthentication`` is DRF's TokenAuthentication with a bounded,
+per-process LRU of token key -> token (with its user) in front of the
+``Token`` + ``User`` query. When TOKEN_AUTH_SHARED_CACHE names a Django
+cache alias, that cache is checked before the database on a local miss, so
+a new worker does not have to reload every scanner's token.
+
+Entries are dropped when their token is deleted (logout) and when their
+user is saved or deleted (deactivation, role changes), once the write
+commits. Other processes see the change once their local entry expires
+after TOKEN_AUTH_CACHE_TTL seconds.
+
+With TOKEN_EXPIRY_SECONDS set, tokens older than that are deleted and
+rejected, and ``issue_token`` hands out a fresh one on the next login.
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction as db_transaction
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+DEFAULT_CACHE_SIZE = 10000
+DEFAULT_CACHE_TTL = 60
+
+
+class TokenCache:
+    """Thread-safe LRU of token key -> Token that can be invalidated by user id."""
+
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE, ttl=DEFAULT_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.generation = 0  # Bumped on every invalidation.
+        self._entries = OrderedDict()  # key -> (expires_at, token)
+        self._keys = defaultdict(set)  # user_id -> cached keys
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, token, generation):
+        """Store a token read at ``generation``; skipped if an invalidation ran since."""
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._drop(token.key)
+            self._entries[token.key] = (time.monotonic() + self.ttl, token)
+            self._keys[token.user_id].add(token.key)
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, keys=(), user_ids=()):
+        """Drop these keys and every key cached for these users; returns the keys dropped."""
+        with self._lock:
+            self.generation += 1
+            keys = set(keys)
+            for user_id in user_ids:
+                keys |= self._keys.get(user_id, set())
+            for key in keys:
+                self._drop(key)
+            return keys
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._keys.clear()
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._keys.get(entry[1].user_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys[entry[1].user_id]
+
+
+cache = TokenCache(
+    max_size=getattr(settings, "TOKEN_AUTH_CACHE_SIZE", DEFAULT_CACHE_SIZE),
+    ttl=getattr(settings, "TOKEN_AUTH_CACHE_TTL", DEFAULT_CACHE_TTL),
+)
+
+
+def _shared_cache():
+    alias = getattr(settings, "TOKEN_AUTH_SHARED_CACHE", None)
+    return caches[alias] if alias else None
+
+
+def _shared_key(key):
+    # Keep raw tokens out of the shared cache's key space.
+    return "authtoken:" + hashlib.sha256(key.encode()).hexdigest()
+
+
+def is_expired(token):
+    expiry = getattr(settings, "TOKEN_EXPIRY_SECONDS", None)
+    return expiry is not None and token.created + timedelta(seconds=expiry) <= timezone.now()
+
+
+def issue_token(user):
+    """The user's token, replacing it first if it has expired."""
+    token, created = Token.objects.get_or_create(user=user)
+    if not created and is_expired(token):
+        token.delete()
+        token = Token.objects.create(user=user)
+    return token
+
+
+def invalidate_tokens(keys=(), user_ids=()):
+    """Drop cached tokens by key and by user once the current transaction commits."""
+    keys, user_ids = set(keys), set(user_ids)
+    if not keys and not user_ids:
+        return
+
+    def drop():
+        dropped = cache.invalidate(keys, user_ids)
+        shared = _shared_cache()
+        if shared is not None:
+            if user_ids:
+                dropped |= set(Token.objects.filter(user_id__in=user_ids).values_list("key", flat=True))
+            shared.delete_many([_shared_key(key) for key in dropped])
+
+    db_transaction.on_commit(drop)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        token = cache.get(key)
+        if token is None:
+            token = self._load(key)
+        if is_expired(token):
+            cache.invalidate(keys=[key])
+            Token.objects.filter(key=key).delete()
+            raise exceptions.AuthenticationFailed("Token has expired.")
+        # Each request gets its own copies, so views can change request.user freely.
+        return copy.copy(token.user), copy.copy(token)
+
+    def _load(self, key):
+        generation = cache.generation
+        shared = _shared_cache()
+        token = shared.get(_shared_key(key)) if shared is not None else None
+        if token is None:
+            try:
+                token = Token.objects.select_related("user").get(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed("Invalid token.")
+            if not token.user.is_active:
+                raise exceptions.AuthenticationFailed("User inactive or deleted.")
+            if shared is not None:
+                shared.set(_shared_key(key), token, cache.ttl)
+        cache.put(token, generation)
+        return token
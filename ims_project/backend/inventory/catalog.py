@@ -0,0 +1,324 @@
+"""
+Bulk product import and export.
+
+Uploads are parsed as a stream (CSV rows or JSON lines), validated and
+inserted ``CHUNK_SIZE`` rows at a time with ``bulk_create``. New products
+have no inventories, so the stock aggregate and second UPDATE that
+``Product.save()`` performs are skipped. Exports stream straight from a
+database cursor.
+"""
+import codecs
+import csv
+import json
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction as db_transaction
+from django.utils.dateparse import parse_date
+
+from .alerts import record_crossings
+from .codes import allocate_barcodes, allocate_skus, is_sequence_sku
+from .models import Category, Product, Supplier
+from .reports import encode_csv
+
+
+CHUNK_SIZE = 1000
+
+# Only the first errors are returned; the counts cover every row.
+MAX_REPORTED_ERRORS = 500
+
+# Column order for exports; imports accept the same columns (``stock`` is
+# ignored, stock only moves through transactions).
+EXPORT_FIELDS = [
+    "sku", "barcode", "product_name", "category", "buying_price", "selling_price",
+    "low_stock_threshold", "stock", "supplier", "expiration_date", "image_url", "description",
+]
+
+FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+}
+
+
+#  PARSING  +++++++++++++++++++++++++++++++++++++++
+def format_for(filename, requested=None):
+    """Pick the upload format from an explicit choice or the file extension."""
+    if requested:
+        return requested.lower()
+    if filename and filename.lower().endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    return "csv"
+
+
+def parse_rows(upload, file_format="csv"):
+    """
+    Yield ``(line_number, row_dict)`` from a binary file-like object without
+    reading it into memory. Rows that cannot be decoded are yielded as
+    ``(line_number, None)``.
+    """
+    lines = codecs.iterdecode(upload, "utf-8-sig")
+    if file_format == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+    elif file_format == "jsonl":
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row if isinstance(row, dict) else None
+    else:
+        raise ValueError(f"Unsupported import format: {file_format}.")
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+#  VALIDATION  +++++++++++++++++++++++++++++++++++++++
+def _clean(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _decimal(row, field, errors):
+    value = _clean(row.get(field))
+    if value is None:
+        errors.append(f"{field} is required.")
+        return None
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        errors.append(f"{field} must be a number.")
+        return None
+    if not number.is_finite() or number < 0:
+        errors.append(f"{field} cannot be negative.")
+        return None
+    return number.quantize(Decimal("0.01"))
+
+
+def _validate(row, categories, suppliers):
+    """Turn one parsed row into an unsaved Product, or return its errors."""
+    errors = []
+    product_name = _clean(row.get("product_name"))
+    if not product_name:
+        errors.append("product_name is required.")
+    elif len(product_name) > 100:
+        errors.append("product_name cannot be longer than 100 characters.")
+
+    category_name = _clean(row.get("category"))
+    if not category_name:
+        errors.append("category is required.")
+    elif category_name not in categories:
+        errors.append("category cannot be longer than 50 characters.")
+
+    buying_price = _decimal(row, "buying_price", errors)
+    selling_price = _decimal(row, "selling_price", errors)
+    if buying_price is not None and selling_price is not None and selling_price < buying_price:
+        errors.append("Selling price cannot be lower than the buying price.")
+
+    low_stock_threshold = 3
+    if _clean(row.get("low_stock_threshold")) is not None:
+        try:
+            low_stock_threshold = int(_clean(row["low_stock_threshold"]))
+        except ValueError:
+            low_stock_threshold = -1
+        if low_stock_threshold < 0:
+            errors.append("low_stock_threshold must be a whole number.")
+
+    expiration_date = None
+    if _clean(row.get("expiration_date")) is not None:
+        try:
+            expiration_date = parse_date(_clean(row["expiration_date"]))
+        except ValueError:
+            expiration_date = None
+        if expiration_date is None:
+            errors.append("expiration_date must be a YYYY-MM-DD date.")
+        elif expiration_date < date.today():
+            errors.append("Expiration date cannot be in the past.")
+
+    supplier_id = _clean(row.get("supplier"))
+    if supplier_id is not None:
+        supplier_id = int(supplier_id) if supplier_id.isdigit() else None
+        if supplier_id not in suppliers:
+            errors.append(f"Supplier {row.get('supplier')} does not exist.")
+
+    sku = _clean(row.get("sku"))
+    barcode = _clean(row.get("barcode"))
+    if sku and len(sku) > 30:
+        errors.append("sku cannot be longer than 30 characters.")
+    elif sku and is_sequence_sku(sku):
+        errors.append(f"SKU {sku} uses the generated SKU format; leave sku blank to generate one.")
+    if barcode and len(barcode) > 50:
+        errors.append("barcode cannot be longer than 50 characters.")
+
+    if errors:
+        return None, errors
+    return Product(
+        product_name=product_name,
+        category_id=categories[category_name],
+        sku=sku,
+        barcode=barcode,
+        buying_price=buying_price,
+        selling_price=selling_price,
+        low_stock_threshold=low_stock_threshold,
+        supplier_id=supplier_id,
+        expiration_date=expiration_date,
+        image_url=_clean(row.get("image_url")),
+        description=_clean(row.get("description")),
+    ), []
+
+
+def _resolve_categories(chunk, categories):
+    """Add the ids of every category named in the chunk, creating missing ones."""
+    names = {_clean(row.get("category")) for _, row in chunk if row} - {None} - categories.keys()
+    names = {name for name in names if len(name) <= 50}
+    if not names:
+        return
+    Category.objects.bulk_create([Category(category_name=name) for name in sorted(names)], ignore_conflicts=True)
+    categories.update(Category.objects.filter(category_name__in=names).values_list("category_name", "pk"))
+
+
+def _resolve_suppliers(chunk):
+    ids = {_clean(row.get("supplier")) for _, row in chunk if row} - {None}
+    ids = {int(value) for value in ids if value.isdigit()}
+    return set(Supplier.objects.filter(pk__in=ids).values_list("pk", flat=True))
+
+
+def _assign_codes(products, category_names):
+    """Fill in missing SKUs and barcodes from ranges reserved for the whole chunk."""
+    needs_sku = [product for product in products if not product.sku]
+    skus = allocate_skus([(category_names[product.category_id], product.product_name) for product in needs_sku])
+    for product, sku in zip(needs_sku, skus):
+        product.sku = sku
+
+    needs_barcode = [product for product in products if not product.barcode]
+    for product, barcode in zip(needs_barcode, allocate_barcodes(len(needs_barcode))):
+        product.barcode = barcode
+
+
+def _open_low_stock_alerts(products):
+    """
+    Open an alert for each inserted product that starts below its threshold,
+    as Product.save does. Ids are read back by SKU, since bulk_create does
+    not set them on MySQL.
+    """
+    low_skus = [product.sku for product in products if product.is_low_stock]
+    if low_skus:
+        record_crossings([
+            (pk, stock, threshold, True)
+            for pk, stock, threshold in Product.objects.filter(sku__in=low_skus)
+            .values_list("pk", "stock", "low_stock_threshold")
+        ])
+
+
+def import_products(rows, chunk_size=CHUNK_SIZE):
+    """
+    Validate and insert products from ``(line_number, row)`` pairs. Each chunk
+    is committed on its own; invalid rows are skipped and reported as
+    ``{"line": n, "errors": [...]}``.
+
+    Returns ``{"created": n, "failed": n, "errors": [...]}``.
+    """
+    categories = {}
+    category_names = {}
+    result = {"created": 0, "failed": 0, "errors": []}
+
+    for chunk in _chunks(rows, chunk_size):
+        failures = []
+        with db_transaction.atomic():
+            _resolve_categories(chunk, categories)
+            category_names.update({pk: name for name, pk in categories.items()})
+            suppliers = _resolve_suppliers(chunk)
+
+            candidates = []
+            for line_number, row in chunk:
+                if row is None:
+                    failures.append({"line": line_number, "errors": ["Row could not be parsed."]})
+                    continue
+                product, errors = _validate(row, categories, suppliers)
+                if errors:
+                    failures.append({"line": line_number, "errors": errors})
+                else:
+                    candidates.append((line_number, product))
+
+            # Codes supplied in the file must be new and unique within the file.
+            given_skus = {product.sku for _, product in candidates if product.sku}
+            given_barcodes = {product.barcode for _, product in candidates if product.barcode}
+            existing_skus = set(Product.objects.filter(sku__in=given_skus).values_list("sku", flat=True))
+            existing_barcodes = set(Product.objects.filter(barcode__in=given_barcodes).values_list("barcode", flat=True))
+            products = []
+            for line_number, product in candidates:
+                errors = []
+                if product.sku and product.sku in existing_skus:
+                    errors.append(f"SKU {product.sku} already exists.")
+                if product.barcode and product.barcode in existing_barcodes:
+                    errors.append(f"Barcode {product.barcode} already exists.")
+                if errors:
+                    failures.append({"line": line_number, "errors": errors})
+                    continue
+                if product.sku:
+                    existing_skus.add(product.sku)
+                if product.barcode:
+                    existing_barcodes.add(product.barcode)
+                products.append(product)
+
+            _assign_codes(products, category_names)
+            for product in products:
+                # New products start with no inventories, so stock is zero.
+                product.stock = 0
+                product.is_low_stock = product.stock < product.low_stock_threshold
+            Product.objects.bulk_create(products, batch_size=chunk_size)
+            _open_low_stock_alerts(products)
+            result["created"] += len(products)
+
+        failures.sort(key=lambda failure: failure["line"])
+        result["failed"] += len(failures)
+        result["errors"].extend(failures[:MAX_REPORTED_ERRORS - len(result["errors"])])
+
+    return result
+
+
+#  EXPORT  +++++++++++++++++++++++++++++++++++++++
+def export_rows():
+    """The header row followed by every product, streamed from the database."""
+    yield EXPORT_FIELDS
+    yield from (
+        Product.objects.order_by("pk")
+        .values_list(
+            "sku", "barcode", "product_name", "category__category_name", "buying_price", "selling_price",
+            "low_stock_threshold", "stock", "supplier_id", "expiration_date", "image_url", "description",
+        )
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+
+def encode_jsonl(rows):
+    rows = iter(rows)
+    header = next(rows)
+    for row in rows:
+        yield (json.dumps(dict(zip(header, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def stream_export(file_format="csv"):
+    """Return (chunks, content_type, filename) for a product export."""
+    if file_format not in FORMATS:
+        raise ValueError(f"Unsupported export format: {file_format}.")
+    if file_format == "jsonl":
+        chunks = encode_jsonl(export_rows())
+    else:
+        chunks = encode_csv(export_rows(), "Products")
+    return chunks, FORMATS[file_format], f"products.{file_format}"
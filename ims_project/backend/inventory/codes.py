@@ -0,0 +1,113 @@
+"""
+SKU and barcode allocation.
+
+Codes come from per-prefix counters in CodeSequence. A batch of N codes for
+a prefix is reserved with a single locked ``next_value = next_value + N``
+update, so every code is unique by construction and bulk imports never
+need a collision retry.
+
+- SKUs look like ``FRU-APP-00042``: category and product prefixes plus a
+  sequence number of at least five digits. Older random SKUs end in four
+  hex characters, so the two can never clash. Imports reject supplied SKUs
+  in this format (``is_sequence_sku``), which the counters cannot see.
+- Barcodes are EAN-13: ``BARCODE_PREFIX`` (GS1 "200", in-store use, by
+  default), the sequence number, and a check digit. Older random barcodes
+  are 12 characters long and can never clash either.
+"""
+import re
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction as db_transaction
+from django.db.models import F
+
+from .models import CodeSequence
+
+
+DEFAULT_BARCODE_PREFIX = "200"
+SKU_DIGITS = 5
+# Case-insensitive, as MySQL compares SKUs.
+SEQUENCE_SKU = re.compile(rf"^.{{0,3}}-.{{0,3}}-\d{{{SKU_DIGITS},}}$", re.IGNORECASE | re.DOTALL)
+
+
+def ean13_check_digit(digits):
+    """Check digit for the first 12 digits of an EAN-13 code."""
+    total = sum(int(digit) * (3 if position % 2 else 1) for position, digit in enumerate(digits))
+    return str((10 - total % 10) % 10)
+
+
+def is_valid_ean13(code):
+    return len(code) == 13 and code.isdigit() and ean13_check_digit(code[:12]) == code[12]
+
+
+def reserve(counts):
+    """
+    Reserve ``counts[prefix]`` consecutive numbers for each prefix and return
+    ``{prefix: first_number}``. Sequences are created on first use and locked
+    in prefix order, so concurrent callers never deadlock or overlap.
+    """
+    counts = {prefix: count for prefix, count in counts.items() if count > 0}
+    if not counts:
+        return {}
+
+    def fetch():
+        return dict(
+            CodeSequence.objects.select_for_update()
+            .filter(prefix__in=counts)
+            .order_by("prefix")
+            .values_list("prefix", "next_value")
+        )
+
+    with db_transaction.atomic():
+        starts = fetch()
+        missing = counts.keys() - starts.keys()
+        if missing:
+            CodeSequence.objects.bulk_create(
+                [CodeSequence(prefix=prefix) for prefix in sorted(missing)], ignore_conflicts=True
+            )
+            starts = fetch()
+        for prefix in sorted(counts):
+            CodeSequence.objects.filter(prefix=prefix).update(next_value=F("next_value") + counts[prefix])
+    return starts
+
+
+def sku_prefix(category_name, product_name):
+    return f"{category_name[:3].upper()}-{product_name[:3].upper()}"
+
+
+def is_sequence_sku(sku):
+    """Whether ``sku`` has the shape of a SKU from ``allocate_skus``."""
+    return bool(SEQUENCE_SKU.match(sku))
+
+
+def allocate_skus(names):
+    """One new SKU for each ``(category_name, product_name)`` pair, in order."""
+    prefixes = [sku_prefix(category_name, product_name) for category_name, product_name in names]
+    counts = {}
+    for prefix in prefixes:
+        counts[f"sku:{prefix}"] = counts.get(f"sku:{prefix}", 0) + 1
+    next_numbers = reserve(counts)
+
+    skus = []
+    for prefix in prefixes:
+        number = next_numbers[f"sku:{prefix}"]
+        next_numbers[f"sku:{prefix}"] += 1
+        skus.append(f"{prefix}-{number:0{SKU_DIGITS}d}")
+    return skus
+
+
+def allocate_barcodes(count):
+    """``count`` new EAN-13 barcodes from one reserved range."""
+    if count <= 0:
+        return []
+    prefix = str(getattr(settings, "BARCODE_PREFIX", DEFAULT_BARCODE_PREFIX))
+    digits = 12 - len(prefix)
+    first = reserve({f"ean:{prefix}": count})[f"ean:{prefix}"]
+    if first + count - 1 >= 10 ** digits:
+        raise ValidationError(f"The barcode range for prefix {prefix} is exhausted.")
+
+    barcodes = []
+    for number in range(first, first + count):
+        body = f"{prefix}{number:0{digits}d}"
+        barcodes.append(body + ean13_check_digit(body))
+    return barcodes
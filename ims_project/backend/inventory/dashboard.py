@@ -0,0 +1,152 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import Case, DecimalField, F, Sum, Value, When
+from django.utils.timezone import now
+
+from . import filters
+from .models import DashboardSnapshot, Product, SalesRecord, Transaction
+
+
+SNAPSHOT_PK = 1
+
+# Seconds a snapshot may go without a full rebuild. Incremental updates keep
+# it current for posted transactions; the rebuild catches everything else
+# (manual inventory edits, deleted transactions, price changes).
+DEFAULT_MAX_AGE = 300
+
+# Passed as ``since`` to accept a snapshot built at any time.
+BUILT_EVER = datetime.min.replace(tzinfo=dt_timezone.utc)
+
+
+def profit_total(start_date=None, end_date=None):
+    """
+    Net profit in one conditional aggregate:
+    profit = (sale unit price - buying price) * quantity sold;
+    loss due to damage/expiration = cost of items lost.
+    """
+    transactions = Transaction.objects.filter(transaction_type__in=["Sale", "Damaged", "Expired"])
+    # Half-open datetime bounds rather than __date, so the index on transaction_date is used.
+    if start_date:
+        transactions = transactions.filter(transaction_date__gte=filters.day_start(start_date))
+    if end_date:
+        transactions = transactions.filter(transaction_date__lt=filters.day_end(end_date))
+    profit_expression = Case(
+        When(transaction_type="Sale",
+             then=(F("unit_price") - F("product__buying_price")) * F("quantity")),
+        When(transaction_type__in=["Damaged", "Expired"],
+             then=Value(0) - F("product__buying_price") * F("quantity")),
+        default=Value(0),
+        output_field=DecimalField(max_digits=20, decimal_places=2),
+    )
+    total = transactions.aggregate(total=Sum(profit_expression))["total"] or 0
+    return Decimal(total).quantize(Decimal('0.01'))
+
+
+def rebuild_snapshot(since=None):
+    """
+    Recompute every dashboard total from scratch and store it, refreshing
+    the SalesRecord totals from the sales rollups on the way. With
+    ``since``, a snapshot rebuilt at or after that moment is returned as it
+    is. The check runs once the row is locked, so callers that queued behind
+    another rebuild take its result instead of repeating the full scan.
+    """
+    with db_transaction.atomic():
+        snapshot, _ = DashboardSnapshot.objects.select_for_update().get_or_create(pk=SNAPSHOT_PK)
+        if since is not None and snapshot.rebuilt_at is not None and snapshot.rebuilt_at >= since:
+            return snapshot
+        from .stock import refresh_sales_records
+        refresh_sales_records()
+        sales_agg = SalesRecord.objects.aggregate(
+            total_sale_amount=Sum('total_sale_amount'),
+            total_purchase_amount=Sum('total_purchase_amount'),
+            total_quantity_purchased=Sum('total_quantity_purchased'),
+            total_quantity_sold=Sum('total_quantity_sold')
+        )
+        snapshot.available_inventory = Product.objects.aggregate(total=Sum('stock'))['total'] or 0
+        snapshot.total_sale_amount = sales_agg['total_sale_amount'] or 0
+        snapshot.total_purchase_amount = sales_agg['total_purchase_amount'] or 0
+        snapshot.total_inventory_purchased = sales_agg['total_quantity_purchased'] or 0
+        snapshot.total_inventory_sold = sales_agg['total_quantity_sold'] or 0
+        snapshot.net_profit = profit_total()
+        snapshot.rebuilt_at = now()
+        snapshot.save()
+    return snapshot
+
+
+def rebuild_stale_snapshot(max_age=None):
+    """
+    Rebuild the snapshot if it is older than ``max_age`` seconds
+    (DASHBOARD_SNAPSHOT_MAX_AGE). Called by the report worker on every poll
+    and by ``rebuild_dashboard --stale``. Returns the snapshot, or None if
+    it was fresh enough.
+    """
+    if max_age is None:
+        max_age = getattr(settings, "DASHBOARD_SNAPSHOT_MAX_AGE", DEFAULT_MAX_AGE)
+    cutoff = now() - timedelta(seconds=max_age)
+    # Cheap unlocked check first; rebuild_snapshot repeats it under the lock.
+    if DashboardSnapshot.objects.filter(pk=SNAPSHOT_PK, rebuilt_at__gte=cutoff).exists():
+        return None
+    return rebuild_snapshot(since=cutoff)
+
+
+def get_snapshot(fresh=False):
+    """
+    Return the stored snapshot. A stale one is served as it is: full rebuilds
+    run in the background (``rebuild_stale_snapshot``). The request pays for
+    one only when no snapshot has been built yet or ``fresh`` is set, and
+    then concurrent callers share a single rebuild.
+    """
+    requested_at = now()
+    snapshot = None if fresh else DashboardSnapshot.objects.filter(pk=SNAPSHOT_PK, rebuilt_at__isnull=False).first()
+    if snapshot is None:
+        # Any rebuild finishing after this request arrived is fresh enough.
+        snapshot = rebuild_snapshot(since=requested_at if fresh else BUILT_EVER)
+    return snapshot
+
+
+def record_transactions(transactions):
+    """
+    Fold freshly posted transactions into the snapshot with a single UPDATE
+    once the posting commits. The shared row is never locked by a posting
+    transaction, so concurrent postings do not queue behind each other on
+    it. A missing snapshot is left for the next read to build.
+    """
+    stock = sold = purchased = 0
+    sale_amount = purchase_amount = profit = Decimal('0')
+    buying_prices = dict(
+        Product.objects.filter(pk__in={txn.product_id for txn in transactions}).values_list('pk', 'buying_price')
+    )
+    for txn in transactions:
+        buying_price = buying_prices.get(txn.product_id, 0)
+        if txn.transaction_type in ('Purchase', 'Return'):
+            stock += txn.quantity
+        elif txn.transaction_type in ('Sale', 'Damaged', 'Expired'):
+            stock -= txn.quantity
+        if txn.transaction_type == 'Sale':
+            sold += txn.quantity
+            sale_amount += txn.total_price
+            profit += (txn.unit_price - buying_price) * txn.quantity
+        elif txn.transaction_type == 'Purchase':
+            purchased += txn.quantity
+            purchase_amount += txn.total_price
+        elif txn.transaction_type in ('Damaged', 'Expired'):
+            profit -= buying_price * txn.quantity
+
+    def apply():
+        # Runs in autocommit: the row lock lasts for this statement only.
+        DashboardSnapshot.objects.filter(pk=SNAPSHOT_PK).update(
+            available_inventory=F('available_inventory') + stock,
+            total_sale_amount=F('total_sale_amount') + sale_amount,
+            total_purchase_amount=F('total_purchase_amount') + purchase_amount,
+            total_inventory_purchased=F('total_inventory_purchased') + purchased,
+            total_inventory_sold=F('total_inventory_sold') + sold,
+            net_profit=F('net_profit') + profit,
+            updated_at=now(),
+        )
+
+    # The posting has committed by now; a failed update is logged rather than
+    # raised, and the next full rebuild picks the transactions up.
+    db_transaction.on_commit(apply, robust=True)
@@ -0,0 +1,146 @@
+"""
+List filtering, ordering and text search done in the database.
+
+- ``QueryParamFilter`` applies a view's ``filter_params``.
+- DRF's ``SearchFilter`` handles ``?search=``. Fields prefixed with ``^``
+  are prefix matches that can use the column's B-tree index. Fields
+  prefixed with ``@`` use the ``search`` lookup below: MATCH ... AGAINST
+  on MySQL, backed by the FULLTEXT indexes from migration 0012, and a
+  LIKE scan elsewhere.
+- ``KeysetOrderingFilter`` is ``?ordering=`` with an id tie-breaker, so it
+  works with cursor pagination.
+"""
+import re
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db.models import CharField, Exists, F, Lookup, OuterRef, Q
+from django.db.models.lookups import IContains
+from django.utils.dateparse import parse_date
+from django.utils.timezone import get_current_timezone, make_aware
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+from .models import Inventory
+
+
+#  FULL-TEXT LOOKUP  +++++++++++++++++++++++++++++++++++++++
+@CharField.register_lookup
+class FullTextSearch(Lookup):
+    """``field__search=term``: word-prefix full-text match."""
+    lookup_name = "search"
+
+    def as_mysql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        words = re.sub(r'[+\-<>()~*"@]', " ", str(self.rhs)).split()
+        # Boolean mode: every word must appear, each matched as a prefix.
+        query = " ".join(f"+{word}*" for word in words)
+        return f"MATCH ({lhs}) AGAINST (%s IN BOOLEAN MODE)", [*lhs_params, query]
+
+    def as_sql(self, compiler, connection):
+        return IContains(self.lhs, self.rhs).as_sql(compiler, connection)
+
+
+#  QUERY PARAMETERS  +++++++++++++++++++++++++++++++++++++++
+def integer(value):
+    if not value.isdigit():
+        raise ValueError("must be a whole number")
+    return int(value)
+
+
+def decimal(value):
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        raise ValueError("must be a number")
+    if not number.is_finite():
+        raise ValueError("must be a number")
+    return number
+
+
+def boolean(value):
+    return value.lower() in ("1", "true", "yes")
+
+
+def day(value):
+    if isinstance(value, date):
+        return value
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValueError("must be a date in YYYY-MM-DD format")
+    return parsed
+
+
+def day_start(value):
+    """Midnight (in the active timezone) at the start of a date or YYYY-MM-DD string."""
+    moment = datetime.combine(day(value), time.min)
+    return make_aware(moment, get_current_timezone()) if settings.USE_TZ else moment
+
+
+def day_end(value):
+    """Midnight after a date or YYYY-MM-DD string, for use as an exclusive upper bound."""
+    return day_start(value) + timedelta(days=1)
+
+
+class QueryParamFilter(BaseFilterBackend):
+    """
+    Apply ``view.filter_params``, a dict of query parameter to
+    ``(lookup, convert)``. ``lookup`` is an ORM lookup string or a
+    ``callable(queryset, value)``. ``convert`` turns the raw string into a
+    value and raises ValueError for bad input, which becomes a 400 response.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        for param, (lookup, convert) in getattr(view, "filter_params", {}).items():
+            raw = request.query_params.get(param, "").strip()
+            if not raw:
+                continue
+            try:
+                value = convert(raw)
+            except ValueError as exc:
+                raise ValidationError({param: f"{param} {exc}."})
+            if callable(lookup):
+                queryset = lookup(queryset, value)
+            else:
+                queryset = queryset.filter(**{lookup: value})
+        return queryset
+
+
+# Reusable lookups for filter_params.
+def product_low_stock(queryset, value):
+    return queryset.filter(is_low_stock=value)
+
+
+def product_in_warehouse(queryset, warehouse_id):
+    return queryset.filter(Exists(Inventory.objects.filter(product=OuterRef("pk"), warehouse_id=warehouse_id)))
+
+
+def inventory_low_stock(queryset, value):
+    if value:
+        return queryset.filter(quantity__lt=F("low_stock_threshold"))
+    return queryset.filter(quantity__gte=F("low_stock_threshold"))
+
+
+def transaction_in_warehouse(queryset, warehouse_id):
+    return queryset.filter(
+        Q(warehouse_id=warehouse_id) | Q(from_warehouse_id=warehouse_id) | Q(to_warehouse_id=warehouse_id)
+    )
+
+
+def lot_expiring_before(queryset, value):
+    return queryset.expiring_before(value)
+
+
+#  ORDERING  +++++++++++++++++++++++++++++++++++++++
+class KeysetOrderingFilter(OrderingFilter):
+    """OrderingFilter that appends ``id`` in the same direction as the first field."""
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if ordering and not any(field.lstrip("-") in ("id", "pk") for field in ordering):
+            ordering = [*ordering, "-id" if ordering[0].startswith("-") else "id"]
+        return ordering
@@ -0,0 +1,104 @@
+"""
+Idempotent POSTs with client-supplied keys.
+
+A client that may retry a POST sends an ``Idempotency-Key`` header (or, for
+the bulk endpoint, an ``idempotency_key`` field). The first request with a
+key runs in the same database transaction as the insert of its
+IdempotencyKey row. The response is stored on that row, and the commit
+makes both visible together. Later requests with the same key get the
+stored response back after one indexed lookup, without running anything
+again; they are marked with an ``Idempotent-Replayed: true`` header.
+
+A retry that arrives while the first request is still running blocks on
+the unique (scope, key) index until that transaction ends. It then
+replays the stored response.
+
+Only successful responses are kept. When the handler fails (an error
+status or an exception), its transaction and the key row are rolled back
+together, so the client can retry with the same key. Reusing a key for a
+different request body returns 422. Keys are scoped to the endpoint and
+the user, and ``purge_idempotency_keys`` deletes old ones.
+"""
+import hashlib
+import json
+
+from django.db import IntegrityError
+from django.db import transaction as db_transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+
+def request_hash(payload):
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def _replay(stored, fingerprint):
+    if stored["request_hash"] != fingerprint:
+        return Response(
+            {"error": "This Idempotency-Key was already used for a different request."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    response = Response(stored["response_body"], status=stored["status_code"])
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _lookup(scope, key):
+    return (
+        IdempotencyKey.objects.filter(scope=scope, key=key)
+        .values("request_hash", "status_code", "response_body")
+        .first()
+    )
+
+
+def run_once(request, endpoint, handler, key=None, payload=None):
+    """
+    Return ``handler()``'s Response, running it at most once per key.
+    ``key`` defaults to the Idempotency-Key header and ``payload`` (what
+    must match on a retry) to the request body.
+    """
+    key = key if key is not None else request.headers.get(HEADER)
+    if not key:
+        return handler()
+    key = str(key).strip()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return Response(
+            {"error": f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    user_id = request.user.pk if request.user and request.user.is_authenticated else "-"
+    scope = f"{endpoint}:{user_id}"
+    fingerprint = request_hash(request.data if payload is None else payload)
+
+    stored = _lookup(scope, key)
+    if stored is not None:
+        return _replay(stored, fingerprint)
+
+    try:
+        with db_transaction.atomic():
+            # Claim the key first; a concurrent retry waits here on the unique index.
+            record = IdempotencyKey.objects.create(
+                scope=scope, key=key, request_hash=fingerprint, status_code=status.HTTP_202_ACCEPTED,
+            )
+            response = handler()
+            if not 200 <= response.status_code < 300:
+                db_transaction.set_rollback(True)
+                return response
+            record.status_code = response.status_code
+            record.response_body = response.data
+            record.save(update_fields=["status_code", "response_body"])
+            return response
+    except IntegrityError:
+        # Another request claimed the key and committed first.
+        stored = _lookup(scope, key)
+        if stored is None:
+            raise
+        return _replay(stored, fingerprint)
@@ -0,0 +1,150 @@
+"""
+DB-backed report job queue.
+
+Report rows double as the job table: ``status`` moves Pending -> Running ->
+Completed / Failed / Cancelled. Workers claim jobs with a conditional
+UPDATE, so any number of worker processes can share one queue without a
+broker.
+"""
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils.timezone import now
+
+from . import reports
+from .models import Report
+
+
+# Seconds between progress/heartbeat updates and cancellation checks. Must
+# stay well below the worker's --stale-after, or live jobs get requeued.
+HEARTBEAT_SECONDS = 10
+
+
+def claim_jobs(limit):
+    """Atomically move up to ``limit`` pending reports to Running and return their ids."""
+    claimed = []
+    candidates = (
+        Report.objects.filter(status='Pending', cancel_requested=False)
+        .order_by('generated_date', 'id')
+        .values_list('pk', flat=True)[:limit]
+    )
+    for pk in candidates:
+        # Another worker may have taken it since the SELECT; only one UPDATE wins.
+        if Report.objects.filter(pk=pk, status='Pending').update(
+            status='Running', started_at=now(), heartbeat_at=now(), progress=0, rows_written=0,
+        ):
+            claimed.append(pk)
+    return claimed
+
+
+def requeue_stale(max_silence_seconds):
+    """
+    Return Running jobs whose worker stopped sending heartbeats to the queue.
+    Stale jobs that were asked to cancel are cancelled instead, since
+    claim_jobs never picks up a cancelled request.
+    """
+    cutoff = now() - timedelta(seconds=max_silence_seconds)
+    stale = Report.objects.filter(status='Running', heartbeat_at__lt=cutoff)
+    stale.filter(cancel_requested=True).update(status='Cancelled', finished_at=now())
+    return stale.filter(cancel_requested=False).update(status='Pending')
+
+
+def request_cancel(report):
+    """
+    Cancel a job. Pending jobs are cancelled immediately; running ones are
+    flagged and stop at their next progress check.
+    """
+    if Report.objects.filter(pk=report.pk, status='Pending').update(
+        status='Cancelled', cancel_requested=True, finished_at=now(),
+    ):
+        return 'Cancelled'
+    Report.objects.filter(pk=report.pk, status='Running').update(cancel_requested=True)
+    return Report.objects.filter(pk=report.pk).values_list('status', flat=True).first()
+
+
+def mark_failed(report_id, error):
+    Report.objects.filter(pk=report_id, status='Running').update(
+        status='Failed', error_message=str(error), finished_at=now(),
+    )
+    return 'Failed'
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def heartbeat(report_id, **fields):
+    Report.objects.filter(pk=report_id).update(heartbeat_at=now(), **fields)
+
+
+def _tracked(rows, report, total):
+    """Pass rows through, recording progress and honouring cancellation every HEARTBEAT_SECONDS."""
+    written = 0
+    last_beat = time.monotonic()
+    for row in rows:
+        yield row
+        written += 1
+        if time.monotonic() - last_beat >= HEARTBEAT_SECONDS:
+            if Report.objects.filter(pk=report.pk, cancel_requested=True).exists():
+                raise JobCancelled()
+            heartbeat(
+                report.pk,
+                rows_written=written - 1,  # The header row is not a data row.
+                progress=min(99, (written - 1) * 100 // max(total, 1)),
+            )
+            last_beat = time.monotonic()
+
+
+def run_job(report_id):
+    """
+    Generate one claimed report into MEDIA_ROOT/reports/. Runs inside a
+    worker process; returns the final status.
+    """
+    close_old_connections()
+    report = Report.objects.get(pk=report_id)
+    # Counting can take a while on large tables; beat on both sides of it.
+    heartbeat(report_id)
+    total = reports.count_rows(report)
+    heartbeat(report_id)
+    rows = _tracked(reports.report_rows(report), report, total)
+    chunks, _, filename = reports.stream_report(report, rows=rows)
+
+    relative_path = os.path.join(Report._meta.get_field('output_file').upload_to, filename)
+    absolute_path = os.path.join(settings.MEDIA_ROOT, relative_path)
+    os.makedirs(os.path.dirname(absolute_path), exist_ok=True)
+
+    try:
+        with open(absolute_path, 'wb') as output:
+            for chunk in chunks:
+                output.write(chunk)
+    except JobCancelled:
+        os.remove(absolute_path)
+        return _mark_cancelled(report_id)
+    except Exception as exc:
+        if os.path.exists(absolute_path):
+            os.remove(absolute_path)
+        return mark_failed(report_id, exc)
+
+    # A cancel that arrived after the last check, or a requeue, wins: the
+    # output is not published. A requeued job's file belongs to whichever
+    # worker picked it up again, so only a cancelled job's file is removed.
+    if not Report.objects.filter(pk=report_id, status='Running', cancel_requested=False).update(
+        status='Completed', progress=100, rows_written=total,
+        output_file=relative_path, finished_at=now(), heartbeat_at=now(),
+    ):
+        status = _mark_cancelled(report_id)
+        if status == 'Cancelled':
+            os.remove(absolute_path)
+        return status
+    return 'Completed'
+
+
+def _mark_cancelled(report_id):
+    """Finish a running job that was asked to stop; returns the job's status."""
+    Report.objects.filter(pk=report_id, status='Running', cancel_requested=True).update(
+        status='Cancelled', finished_at=now(),
+    )
+    return Report.objects.filter(pk=report_id).values_list('status', flat=True).first()
@@ -0,0 +1,156 @@
+"""
+Append-only stock ledger and point-in-time stock.
+
+Every stock change is inserted as a StockMovement. Posted transactions
+write one movement per warehouse they touch. Direct Inventory edits and
+deletes write Adjustment movements. Movements are never updated.
+
+``take_snapshots`` adds, per warehouse, a StockSnapshot for every product
+that moved since that warehouse's previous run. Each new snapshot is the
+product's latest snapshot plus the movements in between. The cutoff trails
+the clock by SNAPSHOT_SETTLE_SECONDS, so transactions still in flight when
+a run starts land after its cutoff rather than being missed.
+
+``stock_as_of`` answers "stock of product P in each warehouse just before
+moment T". It loads the latest snapshot before T for each warehouse, then
+adds only the movements between that snapshot and T. Both queries are
+range scans on (product, warehouse, time) indexes, so their cost tracks
+the movements since the last snapshot, not the whole history.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import Max, OuterRef, Q, Subquery, Sum
+from django.utils.timezone import now
+
+from .models import StockMovement, StockSnapshot, Warehouse
+
+
+DEFAULT_SETTLE_SECONDS = 300
+
+
+#  WRITING  +++++++++++++++++++++++++++++++++++++++
+def record_postings(transactions):
+    """Insert the movements of freshly posted transactions."""
+    from .stock import INCOMING_TYPES
+
+    movements = []
+    for txn in transactions:
+        if txn.transaction_type == 'Transfer':
+            moves = [(txn.from_warehouse_id, -txn.quantity), (txn.to_warehouse_id, txn.quantity)]
+        else:
+            delta = txn.quantity if txn.transaction_type in INCOMING_TYPES else -txn.quantity
+            moves = [(txn.warehouse_id, delta)]
+        movements += [
+            StockMovement(
+                product_id=txn.product_id, warehouse_id=warehouse_id, delta=delta,
+                reason=txn.transaction_type, transaction_id=txn.pk, occurred_at=txn.transaction_date,
+            )
+            for warehouse_id, delta in moves
+        ]
+    StockMovement.objects.bulk_create(movements, batch_size=1000)
+
+
+def record_adjustments(changes):
+    """Insert Adjustment movements for ``[(product_id, warehouse_id, delta)]`` (zero deltas skipped)."""
+    StockMovement.objects.bulk_create([
+        StockMovement(product_id=product_id, warehouse_id=warehouse_id, delta=delta, reason='Adjustment')
+        for product_id, warehouse_id, delta in changes
+        if delta
+    ])
+
+
+#  SNAPSHOTS  +++++++++++++++++++++++++++++++++++++++
+def _latest_snapshots(warehouse_id, product_ids):
+    """{product_id: quantity} of each product's latest snapshot in a warehouse."""
+    latest = (
+        StockSnapshot.objects.filter(product_id=OuterRef('product_id'), warehouse_id=warehouse_id)
+        .order_by('-taken_at').values('taken_at')[:1]
+    )
+    quantities = {}
+    product_ids = sorted(product_ids)
+    for start in range(0, len(product_ids), 1000):
+        rows = StockSnapshot.objects.filter(
+            warehouse_id=warehouse_id, product_id__in=product_ids[start:start + 1000], taken_at=Subquery(latest),
+        ).values_list('product_id', 'quantity')
+        quantities.update(rows)
+    return quantities
+
+
+def take_snapshots(warehouse_ids=None, cutoff=None):
+    """
+    Snapshot every product that moved in each warehouse since its previous
+    run, as of ``cutoff`` (default: now minus SNAPSHOT_SETTLE_SECONDS).
+    Returns the number of snapshot rows written.
+    """
+    if cutoff is None:
+        cutoff = now() - timedelta(seconds=getattr(settings, "SNAPSHOT_SETTLE_SECONDS", DEFAULT_SETTLE_SECONDS))
+    if warehouse_ids is None:
+        warehouse_ids = Warehouse.objects.order_by('pk').values_list('pk', flat=True)
+
+    written = 0
+    for warehouse_id in warehouse_ids:
+        with db_transaction.atomic():
+            previous = StockSnapshot.objects.filter(warehouse_id=warehouse_id).aggregate(
+                taken_at=Max('taken_at'),
+            )['taken_at']
+            if previous is not None and previous >= cutoff:
+                continue
+            window = StockMovement.objects.filter(warehouse_id=warehouse_id, occurred_at__lte=cutoff)
+            if previous is not None:
+                window = window.filter(occurred_at__gt=previous)
+            deltas = dict(
+                window.order_by().values('product_id').annotate(total=Sum('delta')).values_list('product_id', 'total')
+            )
+            if not deltas:
+                continue
+            base = _latest_snapshots(warehouse_id, deltas) if previous is not None else {}
+            StockSnapshot.objects.bulk_create([
+                StockSnapshot(
+                    product_id=product_id, warehouse_id=warehouse_id,
+                    quantity=base.get(product_id, 0) + delta, taken_at=cutoff,
+                )
+                for product_id, delta in sorted(deltas.items())
+            ], batch_size=1000)
+            written += len(deltas)
+    return written
+
+
+#  POINT-IN-TIME QUERIES  +++++++++++++++++++++++++++++++++++++++
+def stock_as_of(product_id, moment=None, warehouse_ids=None):
+    """
+    {warehouse_id: quantity} for one product just before ``moment``
+    (default: now), counting every movement that occurred before it.
+    Warehouses the product never moved in are left out.
+    """
+    moment = moment or now()
+    snapshots = StockSnapshot.objects.filter(product_id=product_id, taken_at__lt=moment)
+    if warehouse_ids is not None:
+        snapshots = snapshots.filter(warehouse_id__in=warehouse_ids)
+    latest = (
+        StockSnapshot.objects.filter(
+            product_id=product_id, warehouse_id=OuterRef('warehouse_id'), taken_at__lt=moment,
+        )
+        .order_by('-taken_at').values('taken_at')[:1]
+    )
+    base = {
+        warehouse_id: (quantity, taken_at)
+        for warehouse_id, quantity, taken_at in snapshots.filter(taken_at=Subquery(latest))
+        .values_list('warehouse_id', 'quantity', 'taken_at')
+    }
+
+    # Replay only what happened after each warehouse's snapshot.
+    since = ~Q(warehouse_id__in=list(base))
+    for warehouse_id, (_, taken_at) in base.items():
+        since |= Q(warehouse_id=warehouse_id, occurred_at__gt=taken_at)
+    movements = StockMovement.objects.filter(since, product_id=product_id, occurred_at__lt=moment)
+    if warehouse_ids is not None:
+        movements = movements.filter(warehouse_id__in=warehouse_ids)
+
+    quantities = {warehouse_id: quantity for warehouse_id, (quantity, _) in base.items()}
+    for warehouse_id, total in (
+        movements.order_by().values('warehouse_id').annotate(total=Sum('delta')).values_list('warehouse_id', 'total')
+    ):
+        quantities[warehouse_id] = quantities.get(warehouse_id, 0) + total
+    return dict(sorted(quantities.items()))
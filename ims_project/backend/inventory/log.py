@@ -0,0 +1,136 @@
+"""
+Logging helpers wired up by settings.LOGGING.
+
+- ``JSONFormatter`` writes one JSON object per line. Values passed with
+  ``extra=`` become top-level keys.
+- ``BackgroundHandler`` is a QueueHandler: callers only enqueue the
+  record, and a listener thread formats and writes it. When the queue is
+  full, records are dropped and counted rather than blocking the request.
+- ``RateLimitFilter`` lets at most ``rate`` records per ``period`` seconds
+  through for each message. It notes how many were suppressed on the next
+  record that gets through. It is meant for chatty events like stock
+  warnings.
+
+This module must not import models: it is loaded while logging is
+configured, before the app registry is ready.
+"""
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+
+# Attributes every LogRecord has; anything else came in through ``extra=``.
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class BackgroundHandler(QueueHandler):
+    """
+    Hand records to a bounded queue drained by a QueueListener thread that
+    writes them to ``stream`` (default stderr) with this handler's formatter.
+    """
+
+    def __init__(self, stream=None, max_queue=10000):
+        super().__init__(queue.Queue(max_queue))
+        self.target = logging.StreamHandler(stream)
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self.listener = QueueListener(self.queue, self.target, respect_handler_level=False)
+        self.listener.start()
+        self._running = True
+        atexit.register(self.flush_and_stop)
+
+    def setFormatter(self, fmt):
+        super().setFormatter(fmt)
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Formatting happens on the listener thread; only resolve what cannot
+        # safely cross threads (lazy %-args and live tracebacks).
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            formatter = self.target.formatter or logging.Formatter()
+            record.exc_text = formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def flush_and_stop(self):
+        """Write out everything queued and stop the listener thread (idempotent)."""
+        with self._lock:
+            running, self._running = self._running, False
+        if running:
+            self.listener.stop()
+
+    def close(self):
+        self.flush_and_stop()
+        super().close()
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Pass at most ``rate`` records per ``period`` seconds for each message
+    template (or ``extra={"sample_key": ...}`` when given).
+    """
+
+    max_keys = 4096
+
+    def __init__(self, name="", rate=10, period=60.0):
+        super().__init__(name)
+        self.rate = rate
+        self.period = period
+        self._windows = {}  # key -> [window start, passed, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if not super().filter(record):
+            return False
+        key = (record.name, getattr(record, "sample_key", record.msg))
+        current = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None and len(self._windows) >= self.max_keys:
+                # Forget finished windows so per-key sampling stays bounded.
+                self._windows = {
+                    k: w for k, w in self._windows.items() if current - w[0] < self.period
+                }
+            if window is None or current - window[0] >= self.period:
+                suppressed = window[2] if window else 0
+                window = self._windows[key] = [current, 0, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+            if window[1] >= self.rate:
+                window[2] += 1
+                return False
+            window[1] += 1
+            return True
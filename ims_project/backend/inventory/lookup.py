@@ -0,0 +1,138 @@
+"""
+Barcode / SKU scan lookup.
+
+A code resolves through the unique ``barcode`` and ``sku`` indexes, and the
+product and its per-warehouse stock come back in one LEFT JOIN query. Hits
+are kept in a bounded, per-process LRU cache. Product and inventory writes
+drop the affected entries when they commit. Other processes see the change
+once their entry expires after PRODUCT_LOOKUP_CACHE_TTL seconds.
+"""
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import Q
+
+from .models import Product
+
+
+DEFAULT_CACHE_SIZE = 4096
+DEFAULT_CACHE_TTL = 30
+
+
+class LookupCache:
+    """Thread-safe LRU of code -> payload that can be invalidated by product id."""
+
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE, ttl=DEFAULT_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.generation = 0  # Bumped on every invalidation.
+        self._entries = OrderedDict()  # code -> (expires_at, product_id, payload)
+        self._codes = defaultdict(set)  # product_id -> cached codes
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, code):
+        with self._lock:
+            entry = self._entries.get(code)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._drop(code)
+                return None
+            self._entries.move_to_end(code)
+            return entry[2]
+
+    def put(self, code, product_id, payload, generation):
+        """Store a payload read at ``generation``; skipped if an invalidation ran since."""
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._drop(code)
+            self._entries[code] = (time.monotonic() + self.ttl, product_id, payload)
+            self._codes[product_id].add(code)
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, product_ids):
+        with self._lock:
+            self.generation += 1
+            for product_id in product_ids:
+                for code in self._codes.pop(product_id, ()):
+                    self._entries.pop(code, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._codes.clear()
+
+    def _drop(self, code):
+        entry = self._entries.pop(code, None)
+        if entry is not None:
+            codes = self._codes.get(entry[1])
+            if codes is not None:
+                codes.discard(code)
+                if not codes:
+                    del self._codes[entry[1]]
+
+
+cache = LookupCache(
+    max_size=getattr(settings, "PRODUCT_LOOKUP_CACHE_SIZE", DEFAULT_CACHE_SIZE),
+    ttl=getattr(settings, "PRODUCT_LOOKUP_CACHE_TTL", DEFAULT_CACHE_TTL),
+)
+
+
+def invalidate_products(product_ids):
+    """Drop cached lookups for these products once the current transaction commits."""
+    product_ids = set(product_ids)
+    if product_ids:
+        db_transaction.on_commit(lambda: cache.invalidate(product_ids))
+
+
+def _fetch(code):
+    rows = (
+        Product.objects.filter(Q(barcode=code) | Q(sku=code))
+        .order_by("pk", "inventories__warehouse_id")
+        .values(
+            "id", "product_name", "sku", "barcode", "selling_price", "stock", "low_stock_threshold",
+            "inventories__warehouse_id", "inventories__warehouse__name", "inventories__quantity",
+        )
+    )
+    products = {}
+    for row in rows:
+        product = products.setdefault(row["id"], {
+            "id": row["id"],
+            "product_name": row["product_name"],
+            "sku": row["sku"],
+            "barcode": row["barcode"],
+            "selling_price": str(row["selling_price"]),
+            "stock": row["stock"],
+            "low_stock_threshold": row["low_stock_threshold"],
+            "warehouses": [],
+        })
+        if row["inventories__warehouse_id"] is not None:
+            product["warehouses"].append({
+                "warehouse_id": row["inventories__warehouse_id"],
+                "warehouse": row["inventories__warehouse__name"],
+                "quantity": row["inventories__quantity"],
+            })
+    # A barcode match wins over a SKU that happens to look the same.
+    matches = sorted(products.values(), key=lambda product: product["barcode"] != code)
+    return matches[0] if matches else None
+
+
+def lookup(code):
+    """The product whose barcode or SKU is ``code``, with per-warehouse stock, or None."""
+    payload = cache.get(code)
+    if payload is not None:
+        return payload
+    generation = cache.generation
+    payload = _fetch(code)
+    if payload is not None:
+        cache.put(code, payload["id"], payload, generation)
+    return payload
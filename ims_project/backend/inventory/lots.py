@@ -0,0 +1,156 @@
+"""
+Batch/lot stock, kept next to the per-warehouse Inventory totals.
+
+Receipts that carry a batch number add to that batch's StockLot, which
+expires on the given date or else on the product's expiration date. Stock
+received without a batch number stays untracked: it counts in
+Inventory.quantity but belongs to no lot.
+
+Outgoing stock named by batch comes from that lot; naming a batch the
+warehouse does not hold is an error. Otherwise it is taken first-expired-
+first-out: lots by expiry date (undated lots last, then by age), then
+untracked stock. Sales skip lots that have already expired, so expired
+goods cannot be sold. ``expire_lots`` writes them off instead.
+Transfers carry their lots, with batch and expiry, to the destination.
+"""
+from collections import defaultdict
+from datetime import date
+
+from django.core.exceptions import ValidationError
+from django.db.models import F
+from django.utils.timezone import localdate
+
+from .models import Product, StockLot
+
+
+class LotLedger:
+    """
+    Lot balances for the (product, warehouse) pairs a batch of transactions
+    touches, locked with SELECT ... FOR UPDATE. ``balances`` is the caller's
+    {(product_id, warehouse_id): inventory quantity} before the batch, and
+    the caller keeps it current as rows are applied.
+
+    ``plan`` works out one transaction's lot changes without applying them,
+    so a row that fails can be skipped. ``apply`` records the changes and
+    ``save`` writes them, one UPDATE per touched lot. Must run inside an
+    atomic block.
+    """
+
+    def __init__(self, pairs, balances):
+        self.balances = balances
+        self.lots = defaultdict(dict)  # (product_id, warehouse_id) -> {batch: [quantity, expiry, age]}
+        self.deltas = defaultdict(int)  # (product_id, warehouse_id, batch) -> delta
+        self.new_expiries = {}  # (product_id, warehouse_id, batch) -> expiry of lots to create
+        self._expiries = {}  # product_id -> Product.expiration_date
+        self._age = 0
+
+        pairs = set(pairs)
+        if not pairs:
+            return
+        rows = (
+            StockLot.objects.select_for_update()
+            .filter(product_id__in={p for p, _ in pairs}, warehouse_id__in={w for _, w in pairs})
+            .order_by('pk')
+            .values_list('product_id', 'warehouse_id', 'batch_number', 'quantity', 'expiry_date')
+        )
+        for product_id, warehouse_id, batch_number, quantity, expiry_date in rows:
+            if (product_id, warehouse_id) in pairs:
+                self.lots[(product_id, warehouse_id)][batch_number] = [quantity, expiry_date, self._next_age()]
+
+    def _next_age(self):
+        self._age += 1
+        return self._age
+
+    def _product_expiry(self, product_id):
+        if product_id not in self._expiries:
+            self._expiries[product_id] = (
+                Product.objects.filter(pk=product_id).values_list('expiration_date', flat=True).first()
+            )
+        return self._expiries[product_id]
+
+    def _take(self, product_id, warehouse_id, quantity, batch_number=None, sellable_only=False):
+        """[(batch, quantity, expiry)] taken from lots; the rest comes from untracked stock."""
+        lots = self.lots[(product_id, warehouse_id)]
+        if batch_number:
+            if batch_number not in lots:
+                raise ValidationError(f"Batch {batch_number} is not stocked in this warehouse.")
+            available, expiry_date, _ = lots[batch_number]
+            if available < quantity:
+                raise ValidationError(f"Batch {batch_number} has only {available} in stock.")
+            return [(batch_number, quantity, expiry_date)]
+
+        today = localdate()
+        taken = []
+        remaining = quantity
+        for batch, (available, expiry_date, _) in sorted(
+            lots.items(), key=lambda item: (item[1][1] is None, item[1][1] or date.min, item[1][2]),
+        ):
+            if not remaining:
+                break
+            if not available or (sellable_only and expiry_date is not None and expiry_date < today):
+                continue
+            used = min(available, remaining)
+            taken.append((batch, used, expiry_date))
+            remaining -= used
+
+        untracked = self.balances.get((product_id, warehouse_id), 0) - sum(lot[0] for lot in lots.values())
+        if remaining > max(untracked, 0):
+            raise ValidationError("Not enough unexpired stock in the warehouse for this transaction.")
+        return taken
+
+    def plan(self, moves, transaction_type, batch_number=None, expiry_date=None):
+        """
+        Lot changes ``[(product_id, warehouse_id, batch, delta, expiry)]`` for
+        one transaction's stock movements (a transfer lists its source first).
+        """
+        changes = []
+        taken = []
+        for product_id, warehouse_id, delta in moves:
+            if delta < 0:
+                taken = self._take(product_id, warehouse_id, -delta, batch_number, transaction_type == 'Sale')
+                changes += [(product_id, warehouse_id, batch, -used, expiry) for batch, used, expiry in taken]
+            elif transaction_type == 'Transfer':
+                changes += [(product_id, warehouse_id, batch, used, expiry) for batch, used, expiry in taken]
+            elif batch_number:
+                expiry = expiry_date or self._product_expiry(product_id)
+                changes.append((product_id, warehouse_id, batch_number, delta, expiry))
+        return changes
+
+    def apply(self, changes):
+        for product_id, warehouse_id, batch, delta, expiry_date in changes:
+            lots = self.lots[(product_id, warehouse_id)]
+            if batch not in lots:
+                lots[batch] = [0, expiry_date, self._next_age()]
+                self.new_expiries[(product_id, warehouse_id, batch)] = expiry_date
+            lots[batch][0] += delta
+            self.deltas[(product_id, warehouse_id, batch)] += delta
+
+    def save(self):
+        if self.new_expiries:
+            StockLot.objects.bulk_create([
+                StockLot(product_id=p, warehouse_id=w, batch_number=batch, quantity=0, expiry_date=expiry_date)
+                for (p, w, batch), expiry_date in sorted(self.new_expiries.items(), key=lambda item: item[0])
+            ], ignore_conflicts=True)
+        for (product_id, warehouse_id, batch) in sorted(self.deltas):
+            delta = self.deltas[(product_id, warehouse_id, batch)]
+            if delta:
+                StockLot.objects.filter(
+                    product_id=product_id, warehouse_id=warehouse_id, batch_number=batch,
+                ).update(quantity=F('quantity') + delta)
+        self.deltas.clear()
+        self.new_expiries.clear()
+
+
+def expired_lot_rows(day=None):
+    """Bulk-post rows writing off every lot that expired before ``day`` (default today)."""
+    lots = (
+        StockLot.objects.expiring_before(day or localdate())
+        .values_list('product_id', 'warehouse_id', 'batch_number', 'quantity', 'product__buying_price')
+    )
+    return [
+        {
+            "product": product_id, "transaction_type": "Expired", "quantity": quantity,
+            "unit_price": buying_price, "warehouse": warehouse_id, "batch_number": batch_number,
+        }
+        for product_id, warehouse_id, batch_number, quantity, buying_price in lots
+    ]
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, DecimalField, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import TruncDay, TruncMonth
+
+from inventory.models import SalesRollup, Transaction
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily and monthly SalesRollup rows from the transaction history."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        zero_amount = Value(0, output_field=DecimalField(max_digits=14, decimal_places=2))
+        totals = {
+            "quantity_sold": Sum(Case(When(transaction_type="Sale", then="quantity"),
+                                      default=Value(0), output_field=IntegerField())),
+            "sale_amount": Sum(Case(When(transaction_type="Sale", then="total_price"), default=zero_amount)),
+            "quantity_purchased": Sum(Case(When(transaction_type="Purchase", then="quantity"),
+                                           default=Value(0), output_field=IntegerField())),
+            "purchase_amount": Sum(Case(When(transaction_type="Purchase", then="total_price"), default=zero_amount)),
+        }
+        sales = Transaction.objects.filter(Q(transaction_type="Sale") | Q(transaction_type="Purchase"))
+
+        with transaction.atomic():
+            SalesRollup.objects.all().delete()
+            created = 0
+            for granularity, trunc in (("day", TruncDay), ("month", TruncMonth)):
+                # One grouped query per granularity, streamed and inserted in batches.
+                grouped = (
+                    sales.annotate(period_start=trunc("transaction_date"))
+                    .values("product_id", "warehouse_id", "period_start")
+                    .annotate(**totals)
+                    .order_by()
+                )
+                batch = []
+                for row in grouped.iterator(chunk_size=batch_size):
+                    period_start = row.pop("period_start")
+                    batch.append(SalesRollup(
+                        granularity=granularity,
+                        period_start=period_start.date() if hasattr(period_start, "date") else period_start,
+                        **row,
+                    ))
+                    if len(batch) >= batch_size:
+                        SalesRollup.objects.bulk_create(batch)
+                        created += len(batch)
+                        batch = []
+                SalesRollup.objects.bulk_create(batch)
+                created += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {created} sales rollup rows."))
@@ -0,0 +1,130 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from inventory.models import Inventory, User, Warehouse
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the key API endpoints against the current (seeded) database and record query counts "
+        "and p50/p95 latencies. Write endpoints post real transactions, so run it on a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=30)
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+        parser.add_argument("--baseline", help="Compare against a previous --output file and fail on regressions.")
+        parser.add_argument("--tolerance", type=float, default=1.25,
+                            help="Allowed p95 slowdown factor against the baseline (default 1.25).")
+
+    def handle(self, *args, **options):
+        target = self._stock_target()
+        user, _ = User.objects.get_or_create(username="benchmark", defaults={"role": "Staff"})
+        token, _ = Token.objects.get_or_create(user=user)
+        client = Client(HTTP_HOST="localhost", HTTP_AUTHORIZATION=f"Token {token.key}")
+
+        product_id, warehouse_id, other_warehouse_id = target
+        flip = {"transfer": False, "sale": False}
+
+        def transaction_create():
+            # Alternate purchase and sale so stock stays level across iterations.
+            flip["sale"] = not flip["sale"]
+            return client.post("/api/transactions/", {
+                "product": product_id,
+                "transaction_type": "Sale" if flip["sale"] else "Purchase",
+                "quantity": 1,
+                "unit_price": "1.00",
+            }, content_type="application/json")
+
+        def transfer():
+            flip["transfer"] = not flip["transfer"]
+            source, destination = (warehouse_id, other_warehouse_id)
+            if not flip["transfer"]:
+                source, destination = destination, source
+            return client.post("/api/transactions/bulk/", [{
+                "product": product_id,
+                "transaction_type": "Transfer",
+                "quantity": 1,
+                "unit_price": "1.00",
+                "from_warehouse": source,
+                "to_warehouse": destination,
+            }], content_type="application/json")
+
+        scenarios = [
+            ("product list", lambda: client.get("/api/products/")),
+            ("inventory list", lambda: client.get("/api/inventory/")),
+            ("transaction list", lambda: client.get("/api/transactions/")),
+            ("transaction create", transaction_create),
+            ("transfer", transfer),
+            ("dashboard", lambda: client.get("/api/dashboard/")),
+        ]
+
+        results = {}
+        for name, request in scenarios:
+            request()  # Warm-up: connections, caches, lazily built snapshots.
+            timings = []
+            queries = 0
+            for _ in range(options["iterations"]):
+                with CaptureQueriesContext(connection) as ctx:
+                    started = time.perf_counter()
+                    response = request()
+                    timings.append((time.perf_counter() - started) * 1000)
+                if response.status_code >= 400:
+                    raise CommandError(f"{name}: HTTP {response.status_code} {response.content[:200]!r}")
+                queries = max(queries, len(ctx.captured_queries))
+            timings.sort()
+            results[name] = {
+                "p50_ms": round(statistics.median(timings), 2),
+                "p95_ms": round(timings[max(0, int(len(timings) * 0.95) - 1)], 2),
+                "queries": queries,
+            }
+            self.stdout.write(
+                f"{name:<20} p50 {results[name]['p50_ms']:>8.2f} ms   "
+                f"p95 {results[name]['p95_ms']:>8.2f} ms   {queries:>3} queries"
+            )
+
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                json.dump(results, fh, indent=2)
+
+        if options["baseline"]:
+            self._compare(results, options["baseline"], options["tolerance"])
+
+    def _stock_target(self):
+        """Pick a product stocked in two warehouses so sales and transfers always succeed."""
+        default_warehouse_id = Warehouse.objects.order_by("pk").values_list("pk", flat=True).first()
+        candidate = (
+            Inventory.objects.filter(warehouse_id=default_warehouse_id, quantity__gte=100)
+            .exclude(product__inventories__quantity__lt=100)
+            .annotate(other=F("product__inventories__warehouse_id"))
+            .exclude(other=default_warehouse_id)
+            .values_list("product_id", "warehouse_id", "other")
+            .first()
+        )
+        if candidate is None:
+            raise CommandError("No product with stock in two warehouses; run seed_ims first.")
+        return candidate
+
+    def _compare(self, results, baseline_path, tolerance):
+        with open(baseline_path) as fh:
+            baseline = json.load(fh)
+        regressions = []
+        for name, current in results.items():
+            previous = baseline.get(name)
+            if not previous:
+                continue
+            if current["queries"] > previous["queries"]:
+                regressions.append(f"{name}: {previous['queries']} -> {current['queries']} queries")
+            if current["p95_ms"] > previous["p95_ms"] * tolerance:
+                regressions.append(f"{name}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+        if regressions:
+            raise CommandError("Performance regressions:\n  " + "\n  ".join(regressions))
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
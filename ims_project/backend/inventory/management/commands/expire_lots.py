@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from inventory.lots import expired_lot_rows
+from inventory.models import Transaction
+
+
+class Command(BaseCommand):
+    help = "Post Expired transactions writing off every stock lot whose expiry date has passed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", help="Write off lots that expired before this YYYY-MM-DD date (default: today).")
+        parser.add_argument("--dry-run", action="store_true", help="List the lapsed lots without posting anything.")
+
+    def handle(self, *args, **options):
+        day = None
+        if options["date"]:
+            day = parse_date(options["date"])
+            if day is None:
+                raise CommandError("--date must be in YYYY-MM-DD format.")
+
+        rows = expired_lot_rows(day)
+        if not rows:
+            self.stdout.write(self.style.SUCCESS("No lapsed lots."))
+            return
+        if options["dry_run"]:
+            for row in rows:
+                self.stdout.write(
+                    f"product={row['product']} warehouse={row['warehouse']} "
+                    f"batch={row['batch_number']} quantity={row['quantity']}"
+                )
+            self.stdout.write(self.style.WARNING(f"{len(rows)} lapsed lot(s). Re-run without --dry-run to write them off."))
+            return
+
+        # One bulk post: every lot is locked and written off in a single transaction.
+        transactions, errors = Transaction.objects.bulk_post(rows)
+        for error in errors:
+            row = rows[error["index"]]
+            self.stdout.write(self.style.ERROR(
+                f"batch {row['batch_number']} (product={row['product']}): {'; '.join(error['errors'])}"
+            ))
+        self.stdout.write(self.style.SUCCESS(f"Wrote off {len(transactions)} lapsed lot(s)."))
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+from django.utils.timezone import now
+
+from inventory.models import Inventory, Product, Transaction
+
+
+class Command(BaseCommand):
+    help = "Print the query plan and timing of the hot lookup paths against the current database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=20, help="Runs per query for the timing.")
+
+    def hot_queries(self):
+        product = Product.objects.order_by("pk").first()
+        inventory = Inventory.objects.order_by("pk").first()
+        month_start = now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        return [
+            ("inventory by (product, warehouse)",
+             Inventory.objects.filter(product_id=inventory.product_id, warehouse_id=inventory.warehouse_id)
+             if inventory else Inventory.objects.none()),
+            ("latest transactions page",
+             Transaction.objects.order_by("-transaction_date", "-id")[:50]),
+            ("latest transaction of a product",
+             Transaction.objects.filter(product=product).order_by("-transaction_date")[:1]),
+            ("sales since start of month",
+             Transaction.objects.filter(transaction_type="Sale", transaction_date__gte=month_start)
+             .values("transaction_type").annotate(total=Sum("quantity"))),
+            ("products by date_updated",
+             Product.objects.order_by("-date_updated")[:50]),
+            ("inventory by last_updated",
+             Inventory.objects.order_by("-last_updated")[:50]),
+        ]
+
+    def handle(self, *args, **options):
+        if not Product.objects.exists():
+            self.stderr.write("No products found; seed the database first.")
+            return
+
+        for label, query in self.hot_queries():
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(query.explain())
+
+            started = time.perf_counter()
+            for _ in range(options["repeat"]):
+                list(query.all())
+            elapsed_ms = (time.perf_counter() - started) * 1000 / options["repeat"]
+            self.stdout.write(f"  {elapsed_ms:.2f} ms per run\n")
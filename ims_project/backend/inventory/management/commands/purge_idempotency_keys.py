@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from inventory.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Delete idempotency keys older than the retention window; retries after that post again."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours", type=int, default=getattr(settings, "IDEMPOTENCY_KEY_RETENTION_HOURS", 24),
+            help="Keep keys created within this many hours (default: IDEMPOTENCY_KEY_RETENTION_HOURS).",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = now() - timedelta(hours=options["hours"])
+        deleted, _ = IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} idempotency key(s)."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from inventory.dashboard import rebuild_snapshot, rebuild_stale_snapshot
+
+
+class Command(BaseCommand):
+    help = "Rebuild the dashboard snapshot from scratch."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stale", action="store_true",
+                            help="Only rebuild if older than DASHBOARD_SNAPSHOT_MAX_AGE (for cron).")
+
+    def handle(self, *args, **options):
+        snapshot = rebuild_stale_snapshot() if options["stale"] else rebuild_snapshot()
+        if snapshot is None:
+            self.stdout.write("Dashboard snapshot is fresh; nothing to do.")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Dashboard snapshot rebuilt: {snapshot.available_inventory} items in stock, "
+            f"net profit {snapshot.net_profit}."
+        ))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Coalesce
+
+from inventory.alerts import sync_low_stock
+from inventory.models import Product
+
+
+class Command(BaseCommand):
+    help = "Compare Product.stock against the sum of its inventories and report (or fix) any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Rewrite drifted Product.stock values.")
+
+    def handle(self, *args, **options):
+        # One grouped query: every product whose stored stock differs from its inventories.
+        drifted = list(
+            Product.objects.annotate(actual_stock=Coalesce(Sum("inventories__quantity"), Value(0)))
+            .exclude(stock=F("actual_stock"))
+            .values_list("pk", "product_name", "stock", "actual_stock")
+        )
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("Product stock matches inventory totals."))
+            return
+
+        for pk, name, stock, actual_stock in drifted:
+            self.stdout.write(f"{name} (id={pk}): stock={stock}, inventories={actual_stock}")
+
+        if not options["fix"]:
+            self.stdout.write(self.style.WARNING(f"{len(drifted)} product(s) drifted. Re-run with --fix to correct."))
+            return
+
+        with transaction.atomic():
+            Product.objects.bulk_update(
+                [Product(pk=pk, stock=actual_stock) for pk, _, _, actual_stock in drifted],
+                ["stock"],
+                batch_size=500,
+            )
+            sync_low_stock(pk for pk, _, _, _ in drifted)
+        self.stdout.write(self.style.SUCCESS(f"Corrected stock for {len(drifted)} product(s)."))
@@ -0,0 +1,69 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError
+
+from inventory import dashboard, jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate queued reports in a local process pool (no external broker required), "
+        "and rebuild the dashboard snapshot when it goes stale."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=2, help="Reports generated in parallel.")
+        parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds between queue polls.")
+        parser.add_argument("--stale-after", type=int, default=300,
+                            help="Requeue running jobs with no heartbeat for this many seconds.")
+        parser.add_argument("--once", action="store_true", help="Drain the queue once and exit.")
+
+    def handle(self, *args, **options):
+        processes = options["processes"]
+        # Spawned children set Django up from scratch instead of inheriting
+        # the parent's open database connection through fork().
+        pool = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=django.setup,
+        )
+        running = {}
+        self.stdout.write(f"Report worker started with {processes} process(es).")
+        try:
+            while True:
+                try:
+                    self._poll(pool, running, processes, options)
+                except DatabaseError as exc:
+                    # Keep the worker alive through transient database errors.
+                    self.stderr.write(f"Queue poll failed: {exc}")
+                if options["once"] and not running:
+                    break
+                time.sleep(options["poll_interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping report worker.")
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _poll(self, pool, running, processes, options):
+        for report_id, future in list(running.items()):
+            if future.done():
+                del running[report_id]
+                if future.exception() is None:
+                    status = future.result()
+                else:
+                    # The child died before it could record the outcome itself.
+                    status = jobs.mark_failed(report_id, future.exception())
+                self.stdout.write(f"Report {report_id}: {status}")
+
+        jobs.requeue_stale(options["stale_after"])
+        # Keeps full dashboard rebuilds off the request path.
+        if dashboard.rebuild_stale_snapshot() is not None:
+            self.stdout.write("Dashboard snapshot rebuilt")
+        free = processes - len(running)
+        for report_id in jobs.claim_jobs(free) if free else []:
+            running[report_id] = pool.submit(jobs.run_job, report_id)
+            self.stdout.write(f"Report {report_id}: started")
@@ -0,0 +1,164 @@
+import random
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.timezone import now
+
+from inventory.alerts import record_crossings
+from inventory.models import (
+    Category, Inventory, Product, StockMovement, Supplier, Transaction, Warehouse,
+)
+
+
+CATEGORY_NAMES = [
+    "Beverages", "Snacks", "Dairy", "Bakery", "Produce", "Frozen", "Household",
+    "Personal Care", "Electronics", "Stationery", "Hardware", "Pet Supplies",
+]
+ADJECTIVES = ["Classic", "Organic", "Premium", "Value", "Fresh", "Deluxe", "Mini", "Family", "Lite", "Extra"]
+NOUNS = ["Cola", "Chips", "Milk", "Bread", "Apples", "Pizza", "Detergent", "Shampoo", "Charger",
+         "Notebook", "Hammer", "Dog Food", "Yogurt", "Cookies", "Juice", "Batteries", "Soap", "Rice"]
+CITIES = ["Boston", "Denver", "Austin", "Seattle", "Atlanta", "Chicago", "Phoenix", "Portland"]
+
+# Roughly what a store sees: mostly sales, a steady flow of purchases, a little shrinkage.
+TRANSACTION_MIX = [("Sale", 70), ("Purchase", 20), ("Return", 4), ("Damaged", 3), ("Expired", 3)]
+
+
+class Command(BaseCommand):
+    help = "Bulk-generate categories, suppliers, products, inventories and transaction history for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=1000)
+        parser.add_argument("--warehouses", type=int, default=5)
+        parser.add_argument("--transactions", type=int, default=50000)
+        parser.add_argument("--suppliers", type=int, default=50)
+        parser.add_argument("--days", type=int, default=365, help="Spread transaction history over this many days.")
+        parser.add_argument("--seed", type=int, default=None, help="Random seed for a reproducible dataset.")
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        batch_size = options["batch_size"]
+        # Tag so repeated runs never collide on unique names, SKUs or barcodes.
+        run = uuid.UUID(int=rng.getrandbits(128)).hex[:6].upper()
+
+        with transaction.atomic():
+            categories = [
+                Category.objects.get_or_create(category_name=name)[0] for name in CATEGORY_NAMES
+            ]
+
+            Warehouse.objects.bulk_create([
+                Warehouse(name=f"Warehouse {run}-{i + 1}", location=rng.choice(CITIES))
+                for i in range(options["warehouses"])
+            ])
+            warehouses = list(Warehouse.objects.filter(name__startswith=f"Warehouse {run}-").order_by("pk"))
+
+            Supplier.objects.bulk_create([
+                Supplier(
+                    supplier_name=f"{rng.choice(CITIES)} Wholesale {i + 1}",
+                    contact_person=f"Contact {i + 1}",
+                    phone_number=f"{run}{i:07d}"[-15:],
+                    email=f"supplier{i + 1}.{run.lower()}@example.com",
+                    supplier_rating=Decimal(rng.randint(10, 50)) / 10,
+                )
+                for i in range(options["suppliers"])
+            ], batch_size=batch_size)
+            suppliers = list(Supplier.objects.filter(email__endswith=f".{run.lower()}@example.com"))
+
+            # Products are inserted directly: new products have no inventories yet,
+            # so Product.save()'s SKU/barcode/stock work is done here in bulk.
+            products = []
+            stock_plan = []
+            for i in range(options["products"]):
+                category = rng.choice(categories)
+                buying_price = Decimal(rng.randint(50, 5000)) / 100
+                levels = [
+                    (warehouse, rng.randint(0, 500)) for warehouse in warehouses if rng.random() < 0.7
+                ]
+                stock_plan.append(levels)
+                product = Product(
+                    product_name=f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i + 1}",
+                    category=category,
+                    sku=f"{category.category_name[:3].upper()}-{run}-{i:07d}",
+                    barcode=f"{run}{i:07d}",
+                    buying_price=buying_price,
+                    selling_price=(buying_price * Decimal(rng.uniform(1.1, 1.8))).quantize(Decimal("0.01")),
+                    stock=sum(quantity for _, quantity in levels),
+                    low_stock_threshold=rng.choice([3, 5, 10, 20]),
+                    supplier=rng.choice(suppliers) if suppliers else None,
+                )
+                product.is_low_stock = product.stock < product.low_stock_threshold
+                products.append(product)
+            Product.objects.bulk_create(products, batch_size=batch_size)
+            products = list(Product.objects.filter(sku__contains=f"-{run}-").order_by("pk"))
+            # Products that start below their threshold get an open alert, as in Product.save.
+            record_crossings([
+                (product.pk, product.stock, product.low_stock_threshold, True)
+                for product in products
+                if product.is_low_stock
+            ])
+
+            inventories = [
+                Inventory(product=product, warehouse=warehouse, quantity=quantity)
+                for product, levels in zip(products, stock_plan)
+                for warehouse, quantity in levels
+            ]
+            Inventory.objects.bulk_create(inventories, batch_size=batch_size)
+            StockMovement.objects.bulk_create([
+                StockMovement(product=row.product, warehouse=row.warehouse, delta=row.quantity, reason="Opening")
+                for row in inventories
+                if row.quantity
+            ], batch_size=batch_size)
+
+            self._seed_transactions(rng, run, products, warehouses, options)
+
+        # Derived tables, each rebuilt with set-based queries; the dashboard
+        # rebuild also derives the SalesRecord totals from the rollups.
+        call_command("backfill_sales_rollups", stdout=self.stdout)
+        call_command("rebuild_dashboard", stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded run {run}: {len(products)} products, {len(warehouses)} warehouses, "
+            f"{len(inventories)} inventory rows, {options['transactions']} transactions."
+        ))
+
+    def _seed_transactions(self, rng, run, products, warehouses, options):
+        types, weights = zip(*TRANSACTION_MIX)
+        start = now() - timedelta(days=options["days"])
+        span_seconds = options["days"] * 24 * 3600
+        batch_size = options["batch_size"]
+        remaining = options["transactions"]
+
+        while remaining > 0:
+            count = min(batch_size, remaining)
+            remaining -= count
+            batch = []
+            for _ in range(count):
+                product = rng.choice(products)
+                transaction_type = rng.choices(types, weights)[0]
+                quantity = rng.randint(1, 20) if transaction_type == "Purchase" else rng.randint(1, 4)
+                unit_price = product.buying_price if transaction_type == "Purchase" else product.selling_price
+                batch.append(Transaction(
+                    product=product,
+                    transaction_type=transaction_type,
+                    quantity=quantity,
+                    unit_price=unit_price,
+                    total_price=unit_price * quantity,
+                    warehouse=rng.choice(warehouses),
+                    transaction_by=f"seed_ims {run}",
+                ))
+            Transaction.objects.bulk_create(batch)
+
+        # transaction_date is auto_now_add, so spread the history out afterwards.
+        seeded = Transaction.objects.filter(transaction_by=f"seed_ims {run}").only("pk").order_by("pk")
+        batch = []
+        for txn in seeded.iterator(chunk_size=batch_size):
+            txn.transaction_date = start + timedelta(seconds=rng.randint(0, span_seconds))
+            batch.append(txn)
+            if len(batch) >= batch_size:
+                Transaction.objects.bulk_update(batch, ["transaction_date"], batch_size=500)
+                batch = []
+        Transaction.objects.bulk_update(batch, ["transaction_date"], batch_size=500)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from inventory.ledger import take_snapshots
+
+
+class Command(BaseCommand):
+    help = "Snapshot per-warehouse stock from the movement ledger so as-of queries replay only recent movements."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--warehouse", type=int, action="append", help="Only this warehouse id (repeatable).")
+
+    def handle(self, *args, **options):
+        written = take_snapshots(warehouse_ids=options["warehouse"])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} stock snapshot(s)."))
@@ -0,0 +1,174 @@
+"""
+Per-endpoint request metrics.
+
+``RequestMetricsMiddleware`` records, for every request:
+
+- wall time;
+- the number of SQL queries and the time spent in them, counted through
+  ``connection.execute_wrapper``;
+- the response size;
+- the resolved view name (``transaction-list``, ``dashboard-stats``, ...).
+
+The values go into in-process histograms, which ``/api/metrics/`` serves
+in the Prometheus text format. Each worker process keeps its own
+histograms. Requests slower than SLOW_REQUEST_SECONDS are logged with
+their queries.
+
+Queries run while a streaming response is being consumed happen after
+the middleware returns, so they are not counted.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Most queries kept per request for the slow-request log.
+MAX_LOGGED_QUERIES = 100
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last slot is +Inf.
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(**labels):
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels.items()
+    )
+    return ",".join(f'{key}="{value}"' for key, value in escaped)
+
+
+class MetricsRegistry:
+    HISTOGRAMS = {
+        "ims_http_request_duration_seconds": ("Request wall time.", DURATION_BUCKETS),
+        "ims_http_db_queries": ("SQL queries per request.", QUERY_BUCKETS),
+        "ims_http_db_duration_seconds": ("Time spent in SQL per request.", DURATION_BUCKETS),
+        "ims_http_response_size_bytes": ("Response body size (non-streaming responses).", SIZE_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._requests = {}  # (view, method, status) -> count
+            self._histograms = {name: {} for name in self.HISTOGRAMS}  # name -> (view, method) -> Histogram
+
+    def _observe(self, name, key, value):
+        histograms = self._histograms[name]
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram(self.HISTOGRAMS[name][1])
+        histogram.observe(value)
+
+    def observe_request(self, view, method, status, duration, queries, db_time, size=None):
+        key = (view, method)
+        with self._lock:
+            self._requests[(view, method, status)] = self._requests.get((view, method, status), 0) + 1
+            self._observe("ims_http_request_duration_seconds", key, duration)
+            self._observe("ims_http_db_queries", key, queries)
+            self._observe("ims_http_db_duration_seconds", key, db_time)
+            if size is not None:
+                self._observe("ims_http_response_size_bytes", key, size)
+
+    def render(self):
+        """Everything recorded so far in the Prometheus text exposition format."""
+        with self._lock:
+            lines = [
+                "# HELP ims_http_requests_total Requests handled, by view, method and status.",
+                "# TYPE ims_http_requests_total counter",
+            ]
+            for (view, method, status), count in sorted(self._requests.items()):
+                lines.append(f"ims_http_requests_total{{{_labels(view=view, method=method, status=status)}}} {count}")
+            for name, (help_text, buckets) in self.HISTOGRAMS.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for (view, method), histogram in sorted(self._histograms[name].items()):
+                    labels = _labels(view=view, method=method)
+                    cumulative = 0
+                    for bound, count in zip((*buckets, "+Inf"), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    lines.append(f"{name}_sum{{{labels}}} {histogram.sum:.6f}")
+                    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class QueryTracker:
+    """``connection.execute_wrapper`` callable that counts and times queries."""
+
+    def __init__(self, keep_queries=False):
+        self.count = 0
+        self.time = 0.0
+        self.queries = [] if keep_queries else None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.time += elapsed
+            if self.queries is not None and len(self.queries) < MAX_LOGGED_QUERIES:
+                self.queries.append((round(elapsed * 1000, 2), sql))
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        slow_after = getattr(settings, "SLOW_REQUEST_SECONDS", None)
+        tracker = QueryTracker(keep_queries=slow_after is not None)
+        start = time.perf_counter()
+        with connection.execute_wrapper(tracker):
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = getattr(request, "resolver_match", None)
+        view = (match.url_name or match.view_name) if match else "unresolved"
+        size = None if response.streaming else len(response.content)
+        registry.observe_request(view, request.method, response.status_code, duration,
+                                 tracker.count, tracker.time, size)
+
+        if slow_after is not None and duration >= slow_after:
+            logger.warning("slow request", extra={
+                "view": view,
+                "method": request.method,
+                "path": request.path,
+                "status_code": response.status_code,
+                "duration_ms": round(duration * 1000, 1),
+                "db_queries": tracker.count,
+                "db_ms": round(tracker.time * 1000, 1),
+                "queries": tracker.queries,
+            })
+        return response
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint."""
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
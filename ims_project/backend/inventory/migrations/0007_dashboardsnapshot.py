@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_report_title_alter_product_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('available_inventory', models.BigIntegerField(default=0)),
+                ('total_sale_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_purchase_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_inventory_purchased', models.BigIntegerField(default=0)),
+                ('total_inventory_sold', models.BigIntegerField(default=0)),
+                ('net_profit', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('rebuilt_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
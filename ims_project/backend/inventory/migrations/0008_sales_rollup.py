@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_dashboardsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='warehouse',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='inventory.warehouse'),
+        ),
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('day', 'Day'), ('month', 'Month')], max_length=5)),
+                ('period_start', models.DateField()),
+                ('quantity_sold', models.PositiveIntegerField(default=0)),
+                ('sale_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('quantity_purchased', models.PositiveIntegerField(default=0)),
+                ('purchase_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='inventory.product')),
+                ('warehouse', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='inventory.warehouse')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['granularity', 'period_start'], name='sales_rollup_period_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'warehouse', 'granularity', 'period_start'), name='unique_sales_rollup_period')],
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:25
+
+from django.db import migrations, models
+from django.db.models import Count, F, Min
+
+
+def merge_duplicate_inventories(apps, schema_editor):
+    """Fold duplicate (product, warehouse) rows into the oldest one before adding the constraint."""
+    Inventory = apps.get_model('inventory', 'Inventory')
+    duplicates = (
+        Inventory.objects.values('product_id', 'warehouse_id')
+        .annotate(rows=Count('id'), keep_id=Min('id'))
+        .filter(rows__gt=1)
+    )
+    for group in duplicates:
+        extra = Inventory.objects.filter(
+            product_id=group['product_id'], warehouse_id=group['warehouse_id'],
+        ).exclude(pk=group['keep_id'])
+        extra_quantity = sum(extra.values_list('quantity', flat=True))
+        Inventory.objects.filter(pk=group['keep_id']).update(quantity=F('quantity') + extra_quantity)
+        extra.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_sales_rollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventory',
+            index=models.Index(fields=['last_updated'], name='inventory_last_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['date_updated'], name='product_date_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['transaction_date', 'id'], name='transaction_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['product', 'transaction_date'], name='transaction_product_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['transaction_type', 'transaction_date'], name='transaction_type_date_idx'),
+        ),
+        migrations.RunPython(merge_duplicate_inventories, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='inventory',
+            constraint=models.UniqueConstraint(fields=('product', 'warehouse'), name='unique_inventory_product_warehouse'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:50
+
+from django.db import migrations, models
+
+
+# MATCH ... AGAINST (inventory.filters.FullTextSearch) needs a FULLTEXT index
+# on exactly the searched column. Other databases fall back to LIKE.
+FULLTEXT_INDEXES = [
+    ("inventory_product", "product_name_fulltext", "product_name"),
+    ("inventory_supplier", "supplier_name_fulltext", "supplier_name"),
+]
+
+
+def add_fulltext_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    for table, name, column in FULLTEXT_INDEXES:
+        schema_editor.execute(f"CREATE FULLTEXT INDEX {name} ON {table} ({column})")
+
+
+def drop_fulltext_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    for table, name, column in FULLTEXT_INDEXES:
+        schema_editor.execute(f"DROP INDEX {name} ON {table}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_code_sequence'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['product_name'], name='product_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supplier',
+            index=models.Index(fields=['supplier_name'], name='supplier_name_idx'),
+        ),
+        migrations.RunPython(add_fulltext_indexes, drop_fulltext_indexes),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def flag_low_stock(apps, schema_editor):
+    """Flag products already below their threshold and open an alert for each."""
+    Product = apps.get_model('inventory', 'Product')
+    LowStockAlert = apps.get_model('inventory', 'LowStockAlert')
+    low = Product.objects.filter(stock__lt=F('low_stock_threshold'))
+    low.update(is_low_stock=True)
+    LowStockAlert.objects.bulk_create(
+        [
+            LowStockAlert(product_id=pk, stock=stock, threshold=threshold)
+            for pk, stock, threshold in low.values_list('pk', 'stock', 'low_stock_threshold').iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LowStockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock', models.PositiveIntegerField()),
+                ('threshold', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('Open', 'Open'), ('Resolved', 'Resolved')], default='Open', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RemoveField(
+            model_name='product',
+            name='low_stock_warning',
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='is_low_stock',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_low_stock', 'date_updated'], name='product_low_stock_idx'),
+        ),
+        migrations.AddField(
+            model_name='lowstockalert',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='low_stock_alerts', to='inventory.product'),
+        ),
+        migrations.AddIndex(
+            model_name='lowstockalert',
+            index=models.Index(fields=['status', 'created_at'], name='low_stock_alert_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lowstockalert',
+            index=models.Index(fields=['product', 'status'], name='low_stock_alert_product_idx'),
+        ),
+        migrations.RunPython(flag_low_stock, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def open_lots(apps, schema_editor):
+    """Give every batch-numbered inventory row a lot holding its current quantity."""
+    Inventory = apps.get_model('inventory', 'Inventory')
+    StockLot = apps.get_model('inventory', 'StockLot')
+    rows = (
+        Inventory.objects.exclude(batch_number__isnull=True).exclude(batch_number='').filter(quantity__gt=0)
+        .values_list('product_id', 'warehouse_id', 'batch_number', 'quantity', 'product__expiration_date')
+    )
+    StockLot.objects.bulk_create(
+        [
+            StockLot(product_id=product_id, warehouse_id=warehouse_id, batch_number=batch_number,
+                     quantity=quantity, expiry_date=expiry_date)
+            for product_id, warehouse_id, batch_number, quantity, expiry_date in rows.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0013_low_stock_alerts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch_number', models.CharField(max_length=50)),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('expiry_date', models.DateField(blank=True, null=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lots', to='inventory.product')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lots', to='inventory.warehouse')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'warehouse', 'expiry_date'], name='stock_lot_fefo_idx'), models.Index(fields=['expiry_date'], name='stock_lot_expiry_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'warehouse', 'batch_number'), name='unique_stock_lot')],
+            },
+        ),
+        migrations.RunPython(open_lots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:11
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def open_ledger(apps, schema_editor):
+    """Open the ledger with each inventory row's current quantity."""
+    Inventory = apps.get_model('inventory', 'Inventory')
+    StockMovement = apps.get_model('inventory', 'StockMovement')
+    rows = Inventory.objects.filter(quantity__gt=0).values_list('product_id', 'warehouse_id', 'quantity')
+    StockMovement.objects.bulk_create(
+        [
+            StockMovement(product_id=product_id, warehouse_id=warehouse_id, delta=quantity, reason='Opening')
+            for product_id, warehouse_id, quantity in rows.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0014_stock_lots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField()),
+                ('reason', models.CharField(choices=[('Sale', 'Sale'), ('Purchase', 'Purchase'), ('Return', 'Return'), ('Transfer', 'Transfer'), ('Damaged', 'Damaged'), ('Expired', 'Expired'), ('Adjustment', 'Adjustment'), ('Opening', 'Opening')], max_length=20)),
+                ('occurred_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='inventory.product')),
+                ('transaction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='inventory.transaction')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='inventory.warehouse')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'warehouse', 'occurred_at'], name='stock_movement_replay_idx'), models.Index(fields=['warehouse', 'occurred_at'], name='stock_movement_window_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField()),
+                ('taken_at', models.DateTimeField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='inventory.product')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='inventory.warehouse')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['warehouse', 'taken_at'], name='stock_snapshot_run_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'warehouse', 'taken_at'), name='unique_stock_snapshot')],
+            },
+        ),
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
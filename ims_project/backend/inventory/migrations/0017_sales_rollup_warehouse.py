@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:41
+
+import django.db.models.deletion
+import django.db.models.functions.comparison
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_unassigned_rollups(apps, schema_editor):
+    """Fold duplicate warehouse-less rollups into one row per bucket before they become unique."""
+    SalesRollup = apps.get_model('inventory', 'SalesRollup')
+    duplicates = (
+        SalesRollup.objects.filter(warehouse__isnull=True)
+        .values('product_id', 'granularity', 'period_start')
+        .annotate(
+            rows=Count('pk'), keep=Min('pk'),
+            sold=Sum('quantity_sold'), sale_amount=Sum('sale_amount'),
+            purchased=Sum('quantity_purchased'), purchase_amount=Sum('purchase_amount'),
+        )
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for bucket in duplicates.iterator():
+        rows = SalesRollup.objects.filter(
+            warehouse__isnull=True, product_id=bucket['product_id'],
+            granularity=bucket['granularity'], period_start=bucket['period_start'],
+        )
+        rows.filter(pk=bucket['keep']).update(
+            quantity_sold=bucket['sold'], sale_amount=bucket['sale_amount'],
+            quantity_purchased=bucket['purchased'], purchase_amount=bucket['purchase_amount'],
+        )
+        rows.exclude(pk=bucket['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0016_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='salesrollup',
+            index=models.Index(fields=['product', 'warehouse', 'granularity', 'period_start'], name='sales_rollup_bucket_idx'),
+        ),
+        migrations.RemoveConstraint(
+            model_name='salesrollup',
+            name='unique_sales_rollup_period',
+        ),
+        migrations.AlterField(
+            model_name='salesrollup',
+            name='warehouse',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='sales_rollups', to='inventory.warehouse'),
+        ),
+        migrations.RunPython(merge_unassigned_rollups, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='salesrollup',
+            constraint=models.UniqueConstraint(models.F('product'), django.db.models.functions.comparison.Coalesce('warehouse', models.Value(0)), models.F('granularity'), models.F('period_start'), name='unique_sales_rollup_period'),
+        ),
+    ]
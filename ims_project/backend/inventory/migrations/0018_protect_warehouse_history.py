@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0017_sales_rollup_warehouse'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stocklot',
+            name='warehouse',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='lots', to='inventory.warehouse'),
+        ),
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='warehouse',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stock_movements', to='inventory.warehouse'),
+        ),
+        migrations.AlterField(
+            model_name='stocksnapshot',
+            name='warehouse',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stock_snapshots', to='inventory.warehouse'),
+        ),
+    ]
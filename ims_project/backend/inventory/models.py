@@ -1,11 +1,13 @@
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db import transaction as db_transaction
 from datetime import date
 from django.utils.timezone import now
 import logging
-from django.db.models import Sum
-import uuid
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import AbstractUser, Group, Permission
+from django.core.serializers.json import DjangoJSONEncoder
 
 
 # Custom User Model
@@ -61,6 +63,11 @@ class Supplier(models.Model):
     supplier_rating = models.DecimalField(max_digits=2, decimal_places=1, default=3.0)
     date_created = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['supplier_name'], name='supplier_name_idx'),
+        ]
+
     def __str__(self):
         return self.supplier_name
 
@@ -83,19 +90,32 @@ class Product(models.Model):
     description = models.TextField(null=True, blank=True)
     date_created = models.DateTimeField(auto_now_add=True)
     date_updated = models.DateTimeField(auto_now=True)
-    low_stock_warning = models.TextField(blank=True, null=True) 
+    is_low_stock = models.BooleanField(default=False)  # stock < low_stock_threshold; kept by inventory.alerts.
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date_updated'], name='product_date_updated_idx'),
+            models.Index(fields=['product_name'], name='product_name_idx'),
+            models.Index(fields=['is_low_stock', 'date_updated'], name='product_low_stock_idx'),
+        ]
+
+    @property
+    def low_stock_warning(self):
+        """Warning text while the product is flagged as low on stock, else None."""
+        if self.is_low_stock:
+            return f"⚠️ Warning: {self.product_name} stock is low ({self.stock} items remaining). Please restock!"
+        return None
 
     def save(self, *args, **kwargs):
+        from .codes import allocate_barcodes, allocate_skus
+
         # Auto-generate SKU if not provided.
         if not self.sku:
-            category_code = self.category.category_name[:3].upper()
-            product_code = self.product_name[:3].upper()
-            unique_id = str(uuid.uuid4().hex[:4]).upper()
-            self.sku = f"{category_code}-{product_code}-{unique_id}"
+            self.sku = allocate_skus([(self.category.category_name, self.product_name)])[0]
 
-        # Auto-generate Barcode if not provided.
+        # Auto-generate Barcode (EAN-13) if not provided.
         if not self.barcode:
-            self.barcode = str(uuid.uuid4().hex[:12]).upper()
+            self.barcode = allocate_barcodes(1)[0]
 
         # Determine if this is a new instance.
         is_new = self.pk is None
@@ -118,18 +138,21 @@ class Product(models.Model):
         if self.expiration_date and self.expiration_date < date.today():
             raise ValidationError("Expiration date cannot be in the past.")
 
-        if self.stock < self.low_stock_threshold:
-            self.low_stock_warning = f"⚠️ Warning: {self.product_name} stock is low ({self.stock} items remaining). Please restock!"
-        else:
-            self.low_stock_warning = None
-
-        print(f"Saving Product: {self.product_name}, Warning: {self.low_stock_warning}")
+        # Only a change of side against the threshold raises or resolves an
+        # alert. A new product counts as coming from above it, so one created
+        # low opens its alert straight away.
+        is_low_stock = self.stock < self.low_stock_threshold
+        was_low_stock = self.is_low_stock and not is_new
+        if is_low_stock != was_low_stock:
+            from .alerts import record_crossings
+            record_crossings([(self.pk, self.stock, self.low_stock_threshold, is_low_stock)])
+        self.is_low_stock = is_low_stock
 
         # For new instances, update the record directly using queryset.update()
         # to avoid calling super().save() twice (which can attempt a duplicate insert).
         if is_new:
             self.__class__.objects.filter(pk=self.pk).update(
-                stock=self.stock, low_stock_warning=self.low_stock_warning
+                stock=self.stock, is_low_stock=self.is_low_stock
             )
         else:
             # For updates, simply call super().save() to update the instance.
@@ -140,8 +163,30 @@ class Product(models.Model):
 
 
 # Inventory Table  ++++++++++++++++++++++++++++++++++++++++++++++
+def _net_changes(changes):
+    """Sum (product_id, warehouse_id, delta) changes per pair."""
+    totals = {}
+    for product_id, warehouse_id, delta in changes:
+        totals[(product_id, warehouse_id)] = totals.get((product_id, warehouse_id), 0) + delta
+    return [(product_id, warehouse_id, delta) for (product_id, warehouse_id), delta in totals.items()]
+
+
+class InventoryQuerySet(models.QuerySet):
+    def with_last_transaction_type(self):
+        """
+        Annotate each row with the type of its product's latest transaction,
+        resolved by a correlated subquery instead of one query per row.
+        """
+        latest = (
+            Transaction.objects.filter(product_id=OuterRef('product_id'))
+            .order_by('-transaction_date', '-id')
+            .values('transaction_type')[:1]
+        )
+        return self.annotate(last_transaction_type=Subquery(latest))
+
+
 class Inventory(models.Model):
-    
+
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="inventories")
     # product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name="inventory")
     warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE, related_name="inventory_stock")
@@ -153,8 +198,22 @@ class Inventory(models.Model):
     last_updated = models.DateTimeField(auto_now=True)
     low_stock_threshold = models.PositiveIntegerField(default=3)
 
+    objects = InventoryQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # One stock row per product per warehouse; get-or-create races
+            # can no longer produce duplicates that aggregates double-count.
+            models.UniqueConstraint(fields=['product', 'warehouse'], name='unique_inventory_product_warehouse'),
+        ]
+        indexes = [
+            models.Index(fields=['last_updated'], name='inventory_last_updated_idx'),
+        ]
 
     def save(self, *args, **kwargs):
+        from .alerts import sync_low_stock
+        from .ledger import record_adjustments
+
         # Prevent negative stock and overselling
         if self.quantity < 0:
             raise ValidationError("Stock quantity cannot be negative.")
@@ -167,25 +226,60 @@ class Inventory(models.Model):
             raise ValidationError("Stock update results in negative quantity.")
         self.quantity = new_quantity
 
-        # Update the related product’s aggregated stock across all inventories.
-        total_stock = self.product.inventories.aggregate(total_stock=Sum('quantity'))['total_stock'] or 0
-        # Instead of self.product.save(), update directly to bypass validations.
-        from .models import Product  # Ensure Product is imported
-        Product.objects.filter(pk=self.product.pk).update(stock=total_stock)
-     
         # Reset the incoming/outgoing trackers after applying the update.
         self.incoming_stock = 0
         self.outgoing_stock = 0
 
-        if self.quantity < self.low_stock_threshold:
-            print(f"⚠️ Warning: {self.product.product_name} stock is low ({self.quantity} remaining). Please restock!")
-        super().save(*args, **kwargs)
+        # Move the product's aggregated stock by this row's change only. The old
+        # quantity is read by the same UPDATE, instead of re-summing every
+        # inventory of the product.
+        with db_transaction.atomic():
+            if self._state.adding:
+                adjustments = [(self.product_id, self.warehouse_id, self.quantity)]
+                Product.objects.filter(pk=self.product_id).update(stock=F('stock') + self.quantity)
+            else:
+                stored = (
+                    Inventory.objects.select_for_update().filter(pk=self.pk)
+                    .values_list('product_id', 'warehouse_id', 'quantity').first()
+                )
+                adjustments = [(self.product_id, self.warehouse_id, self.quantity)]
+                if stored is not None:
+                    adjustments.append((stored[0], stored[1], -stored[2]))
+                stored_quantity = Subquery(Inventory.objects.filter(pk=self.pk).values('quantity')[:1])
+                loaded_product_id = getattr(self, '_loaded_product_id', self.product_id)
+                if loaded_product_id == self.product_id:
+                    Product.objects.filter(pk=self.product_id).update(
+                        stock=F('stock') + self.quantity - stored_quantity
+                    )
+                else:
+                    # The row moved to another product: take it off the old one.
+                    Product.objects.filter(pk=loaded_product_id).update(stock=F('stock') - stored_quantity)
+                    Product.objects.filter(pk=self.product_id).update(stock=F('stock') + self.quantity)
+            super().save(*args, **kwargs)
+            record_adjustments(_net_changes(adjustments))
+            sync_low_stock({self.product_id, getattr(self, '_loaded_product_id', self.product_id)})
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_product_id = instance.__dict__.get('product_id')
+        return instance
 
     def __str__(self):
         return f"{self.product.product_name} - {self.quantity} in stock at {self.warehouse.name}"
 
 
 # TRANSACTION MODEL   +++++++++++++++++++++++++++++++++++++++++++++
+class TransactionManager(models.Manager):
+    def bulk_post(self, rows, user=None):
+        """
+        Post many transactions at once with set-based stock updates.
+        Returns (transactions, errors); see inventory.stock.bulk_post.
+        """
+        from .stock import bulk_post
+        return bulk_post(rows, user=user)
+
+
 class Transaction(models.Model):
     TRANSACTION_TYPES = [
         ('Sale', 'Sale'),
@@ -210,85 +304,80 @@ class Transaction(models.Model):
     # Added fields for transfer transaction type
     from_warehouse = models.ForeignKey(Warehouse, on_delete=models.SET_NULL, null=True, related_name="from_warehouse_transactions")
     to_warehouse = models.ForeignKey(Warehouse, on_delete=models.SET_NULL, null=True, related_name="to_warehouse_transactions")
+    # Warehouse the stock of a non-transfer transaction was booked against.
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.SET_NULL, null=True, blank=True, related_name="transactions")
 
+    objects = TransactionManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['transaction_date', 'id'], name='transaction_date_idx'),
+            models.Index(fields=['product', 'transaction_date'], name='transaction_product_date_idx'),
+            models.Index(fields=['transaction_type', 'transaction_date'], name='transaction_type_date_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         # Calculate total price.
         self.total_price = self.unit_price * self.quantity
 
-        # Update inventory and product stock based on transaction type.
-        if self.transaction_type == 'Transfer':
-            self._handle_transfer()
-        else:
-            # For Purchase and Return, treat as incoming (stock increases);
-            # For Sale, Damaged, or Expired, treat as outgoing (stock decreases).
-            is_incoming = self.transaction_type in ['Purchase', 'Return']
-            self._update_inventory(incoming=is_incoming, outgoing=(not is_incoming))
-        super().save(*args, **kwargs)
-
-        # Update SalesRecord for statistics.
-        from .models import SalesRecord
-        sale_record, created = SalesRecord.objects.get_or_create(product=self.product)
-        sale_record.update_record(self)
+        # Stock is only moved when the transaction is first posted; later saves
+        # (status changes, payments) must not apply it a second time.
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+
+        from .dashboard import record_transactions
+        from .ledger import record_postings
+        from .stock import apply_rollups
+        with db_transaction.atomic():
+            # Update inventory and product stock based on transaction type.
+            if self.transaction_type == 'Transfer':
+                self._handle_transfer()
+            else:
+                # For Purchase and Return, treat as incoming (stock increases);
+                # For Sale, Damaged, or Expired, treat as outgoing (stock decreases).
+                is_incoming = self.transaction_type in ['Purchase', 'Return']
+                self._update_inventory(incoming=is_incoming, outgoing=(not is_incoming))
+            super().save(*args, **kwargs)
+            record_postings([self])
 
+            # Update the sales rollups and dashboard totals for statistics.
+            apply_rollups([self])
+            record_transactions([self])
 
     def _update_inventory(self, incoming=False, outgoing=False):
         """
-        For non-transfer transactions, update the inventory for a default warehouse.
-        (You may adjust the warehouse selection logic based on your requirements.)
+        For non-transfer transactions, book the stock against ``warehouse`` if
+        one was given, otherwise against the warehouse the allocation strategy
+        picks. A single transaction is never split across warehouses.
         """
-        # Use a default warehouse (e.g. the first one in the database).
-        default_warehouse = Warehouse.objects.first()
-        if not default_warehouse:
-            raise ValidationError("No default warehouse found.")
-
-        inventory, created = Inventory.objects.get_or_create(
-            product=self.product,
-            warehouse=default_warehouse,
-            defaults={'quantity': 0, 'incoming_stock': 0, 'outgoing_stock': 0}
+        from .allocation import allocate, load_candidates
+        from .stock import post_movements
+
+        if not self.warehouse_id:
+            candidates = load_candidates([self.product_id])[self.product_id]
+            [(self.warehouse_id, _)] = allocate(candidates, self.quantity, incoming, split=False)
+
+        delta = self.quantity if incoming else -self.quantity
+        post_movements(
+            [(self.product_id, self.warehouse_id, delta)],
+            "Not enough stock in the warehouse for this transaction.",
+            self.transaction_type, self.batch_number,
         )
-        if incoming:
-            # inventory.quantity = self.quantity
-            inventory.incoming_stock += self.quantity
-        else:
-            if inventory.quantity < self.quantity:
-                raise ValidationError("Not enough stock in the default warehouse for this transaction.")
-            # inventory.quantity -= self.quantity
-            inventory.outgoing_stock += self.quantity
-        inventory.save()
 
     def _handle_transfer(self):
         """
         For transfers, move stock from the source warehouse to the target warehouse.
-        Increase target inventory and decrease source inventory.
+        Both rows are updated in one atomic block, in a fixed order.
         """
-        if not (self.from_warehouse and self.to_warehouse):
-            raise ValidationError("Both from_warehouse and to_warehouse must be provided for a transfer.")
-        if self.from_warehouse == self.to_warehouse:
-            raise ValidationError("The from_warehouse and to_warehouse cannot be the same for a transfer.")
-
-        # Get source inventory record; if not found, raise error.
-        try:
-            source_inventory = Inventory.objects.get(product=self.product, warehouse=self.from_warehouse)
-        except Inventory.DoesNotExist:
-            raise ValidationError("No inventory record exists for this product in the source warehouse.")
-
-        if source_inventory.quantity < self.quantity:
-            raise ValidationError("Not enough stock in the source warehouse for the transfer.")
-
-        # Get or create target inventory record.
-        target_inventory, created = Inventory.objects.get_or_create(
-            product=self.product,
-            warehouse=self.to_warehouse,
-            defaults={'quantity': 0, 'incoming_stock': 0, 'outgoing_stock': 0}
-        )
-
-        # Adjust source and target inventories.
-        source_inventory.outgoing_stock += self.quantity
-        source_inventory.save()
+        from .stock import post_movements, movements_for
 
-        target_inventory.incoming_stock += self.quantity
-        target_inventory.save()
+        moves = movements_for(
+            'Transfer', self.product_id, self.quantity,
+            from_warehouse_id=self.from_warehouse_id, to_warehouse_id=self.to_warehouse_id,
+        )
+        post_movements(
+            moves, "Not enough stock in the source warehouse for the transfer.", 'Transfer', self.batch_number,
+        )
 
     def __str__(self):
         # Including product name in the transaction string.
@@ -319,6 +408,228 @@ class SalesRecord(models.Model):
     def __str__(self):
         return f"{self.product.product_name} - {self.total_quantity_sold} sold"
 
+#  SALES ROLLUP MODEL  ++++++++++++++++++++++++++++++++++++++++
+class SalesRollup(models.Model):
+    """
+    Pre-aggregated sales and purchases per product and warehouse for one day
+    or one month, so range queries read a handful of rows instead of
+    scanning transactions.
+    """
+    GRANULARITIES = [
+        ('day', 'Day'),
+        ('month', 'Month'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="sales_rollups")
+    # Deleting a warehouse must not erase its sales history.
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.PROTECT, null=True, blank=True, related_name="sales_rollups")
+    granularity = models.CharField(max_length=5, choices=GRANULARITIES)
+    period_start = models.DateField()
+    quantity_sold = models.PositiveIntegerField(default=0)
+    sale_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    quantity_purchased = models.PositiveIntegerField(default=0)
+    purchase_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            # NULLs never compare equal in a unique index, so rollups without a
+            # warehouse are keyed on 0 instead. (MySQL has no partial indexes.)
+            models.UniqueConstraint(
+                F('product'), Coalesce('warehouse', Value(0)), F('granularity'), F('period_start'),
+                name='unique_sales_rollup_period',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['granularity', 'period_start'], name='sales_rollup_period_idx'),
+            models.Index(fields=['product', 'warehouse', 'granularity', 'period_start'], name='sales_rollup_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} {self.granularity} {self.period_start}: {self.quantity_sold} sold"
+
+
+#  DASHBOARD SNAPSHOT  ++++++++++++++++++++++++++++++++++++++++
+class DashboardSnapshot(models.Model):
+    """
+    Single-row summary behind the dashboard. Posted transactions update it
+    incrementally; inventory.dashboard rebuilds it when it gets too old.
+    """
+    available_inventory = models.BigIntegerField(default=0)
+    total_sale_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_purchase_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_inventory_purchased = models.BigIntegerField(default=0)
+    total_inventory_sold = models.BigIntegerField(default=0)
+    net_profit = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # Negative means a loss.
+    rebuilt_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Dashboard snapshot (rebuilt {self.rebuilt_at})"
+
+#  LOW STOCK ALERTS  ++++++++++++++++++++++++++++++++++++++++
+class LowStockAlert(models.Model):
+    """
+    Raised when a product's stock drops below its threshold and resolved when
+    it climbs back; inventory.alerts records one per crossing, not per sale.
+    """
+    STATUS_CHOICES = [
+        ('Open', 'Open'),
+        ('Resolved', 'Resolved'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="low_stock_alerts")
+    stock = models.PositiveIntegerField()  # Stock when the threshold was crossed.
+    threshold = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Open')
+    created_at = models.DateTimeField(auto_now_add=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='low_stock_alert_status_idx'),
+            models.Index(fields=['product', 'status'], name='low_stock_alert_product_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.product_name}: {self.stock} < {self.threshold} ({self.status})"
+
+
+#  CODE SEQUENCES  ++++++++++++++++++++++++++++++++++++++++
+class CodeSequence(models.Model):
+    """
+    Next free number for one SKU or barcode prefix; inventory.codes hands out
+    ranges from it so generated codes never collide.
+    """
+    prefix = models.CharField(max_length=40, unique=True)
+    next_value = models.PositiveBigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.prefix} -> {self.next_value}"
+
+
+#  STOCK LOTS  ++++++++++++++++++++++++++++++++++++++++
+class StockLotQuerySet(models.QuerySet):
+    def expiring_before(self, day):
+        """Lots with stock left whose expiry date is before ``day``, soonest first."""
+        return self.filter(expiry_date__lt=day, quantity__gt=0).order_by('expiry_date', 'pk')
+
+
+class StockLot(models.Model):
+    """
+    Stock of one batch of a product in one warehouse. Batch-numbered receipts
+    add to it, and sales take from the first-expiring lots (inventory.lots).
+    Inventory.quantity is the warehouse total, batch-tracked or not.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="lots")
+    # Like the ledger and the rollups, lots keep a warehouse with history from being deleted.
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.PROTECT, related_name="lots")
+    batch_number = models.CharField(max_length=50)
+    quantity = models.PositiveIntegerField(default=0)
+    expiry_date = models.DateField(null=True, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    objects = StockLotQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'warehouse', 'batch_number'], name='unique_stock_lot'),
+        ]
+        indexes = [
+            # FEFO picking walks one product's lots in one warehouse by expiry.
+            models.Index(fields=['product', 'warehouse', 'expiry_date'], name='stock_lot_fefo_idx'),
+            models.Index(fields=['expiry_date'], name='stock_lot_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.product_name} {self.batch_number} @ {self.warehouse.name}: {self.quantity}"
+
+
+#  STOCK LEDGER  ++++++++++++++++++++++++++++++++++++++++
+class StockMovement(models.Model):
+    """
+    One signed change to a product's stock in one warehouse. Rows are only
+    ever inserted (inventory.ledger), so the ledger can replay stock at any
+    point in time.
+    """
+    REASON_CHOICES = [
+        *Transaction.TRANSACTION_TYPES,
+        ('Adjustment', 'Adjustment'),  # Inventory rows edited or deleted directly.
+        ('Opening', 'Opening'),  # Stock that existed before the ledger.
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="stock_movements")
+    # Deleting a warehouse must not erase its stock history.
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.PROTECT, related_name="stock_movements")
+    delta = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    transaction = models.ForeignKey(
+        Transaction, on_delete=models.SET_NULL, null=True, blank=True, related_name="stock_movements",
+    )
+    occurred_at = models.DateTimeField(default=now)
+
+    class Meta:
+        indexes = [
+            # As-of replay: one product's movements in one warehouse over a time range.
+            models.Index(fields=['product', 'warehouse', 'occurred_at'], name='stock_movement_replay_idx'),
+            # Snapshot runs: one warehouse's movements since the previous run.
+            models.Index(fields=['warehouse', 'occurred_at'], name='stock_movement_window_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValidationError("Stock movements are append-only.")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.reason} {self.delta:+d} of product {self.product_id} @ warehouse {self.warehouse_id}"
+
+
+class StockSnapshot(models.Model):
+    """
+    Stock of one product in one warehouse including every movement up to
+    ``taken_at``. Written only for pairs that moved since the previous run.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="stock_snapshots")
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.PROTECT, related_name="stock_snapshots")
+    quantity = models.IntegerField()
+    taken_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'warehouse', 'taken_at'], name='unique_stock_snapshot'),
+        ]
+        indexes = [
+            models.Index(fields=['warehouse', 'taken_at'], name='stock_snapshot_run_idx'),
+        ]
+
+    def __str__(self):
+        return f"product {self.product_id} @ warehouse {self.warehouse_id}: {self.quantity} at {self.taken_at}"
+
+
+#  IDEMPOTENCY KEYS  ++++++++++++++++++++++++++++++++++++++++
+class IdempotencyKey(models.Model):
+    """
+    A client-supplied key for one POST and the response it produced;
+    inventory.idempotency replays the response when the request is retried.
+    """
+    scope = models.CharField(max_length=100)  # Endpoint and user the key belongs to.
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    response_body = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='unique_idempotency_key'),
+        ]
+        indexes = [
+            models.Index(fields=['created_at'], name='idempotency_key_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} {self.key} -> {self.status_code}"
+
 #  PAYMENT MODEL +++++++++++++++++++++++++++++++++++++++++++
 from django.db import models
 from django.core.exceptions import ValidationError
@@ -407,6 +718,29 @@ class Report(models.Model):
     data_range_end = models.DateField(null=True, blank=True)
     generated_date = models.DateTimeField(auto_now_add=True)
 
+    # Background generation (see inventory.jobs and manage.py run_report_worker).
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'),
+        ('Running', 'Running'),
+        ('Completed', 'Completed'),
+        ('Failed', 'Failed'),
+        ('Cancelled', 'Cancelled'),
+    ]
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending')
+    progress = models.PositiveSmallIntegerField(default=0)  # Percent of rows written.
+    rows_written = models.PositiveIntegerField(default=0)
+    output_file = models.FileField(upload_to='reports/', blank=True, null=True)
+    error_message = models.TextField(blank=True, null=True)
+    cancel_requested = models.BooleanField(default=False)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'generated_date'], name='report_status_idx'),
+        ]
+
     def __str__(self):
         # If title is provided, use it; otherwise, fall back to report_type and format.
         if self.title:
@@ -0,0 +1,20 @@
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+
+
+#  LIMIT / OFFSET  +++++++++++++++++++++++++++++++++++++++
+class StandardPagination(LimitOffsetPagination):
+    """Default paging for small tables (categories, warehouses, suppliers, ...)."""
+    default_limit = 50
+    max_limit = 500
+
+
+#  CURSOR (KEYSET)  +++++++++++++++++++++++++++++++++++++++
+class TransactionCursorPagination(CursorPagination):
+    """
+    Keyset paging for append-heavy tables: each page is a range scan from the
+    last seen (transaction_date, id), so deep pages cost the same as the first.
+    """
+    ordering = ("-transaction_date", "-id")
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
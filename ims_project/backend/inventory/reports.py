@@ -0,0 +1,246 @@
+"""
+Streaming report engine.
+
+Each report type yields its rows straight from a database cursor
+(``.iterator(chunk_size=...)``) and each format encodes them as they come,
+so a report of any size is produced in constant memory.
+"""
+import csv
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Sum, Value, When
+
+from . import filters
+from .models import Inventory, Supplier, Transaction
+
+
+CHUNK_SIZE = 2000
+
+
+def _in_range(queryset, report, field="transaction_date"):
+    # Half-open datetime bounds rather than __date, so the index on the field is used.
+    if report.data_range_start:
+        queryset = queryset.filter(**{f"{field}__gte": filters.day_start(report.data_range_start)})
+    if report.data_range_end:
+        queryset = queryset.filter(**{f"{field}__lt": filters.day_end(report.data_range_end)})
+    return queryset
+
+
+#  REPORT TYPES  +++++++++++++++++++++++++++++++++++++++
+def sales_query(report):
+    sales = _in_range(Transaction.objects.filter(transaction_type="Sale"), report).order_by("transaction_date", "id")
+    return sales.values_list(
+        "transaction_date", "product__product_name", "product__sku", "warehouse__name",
+        "quantity", "unit_price", "total_price", "transaction_by",
+    )
+
+
+def stock_query(report):
+    return Inventory.objects.order_by("product__product_name", "warehouse__name").values_list(
+        "product__product_name", "product__sku", "warehouse__name",
+        "quantity", "low_stock_threshold", "last_updated",
+    )
+
+
+def supplier_query(report):
+    suppliers = Supplier.objects.annotate(
+        products=Count("product"),
+        units=Sum("product__stock"),
+        value=Sum(F("product__stock") * F("product__buying_price"),
+                  output_field=DecimalField(max_digits=20, decimal_places=2)),
+    ).order_by("supplier_name", "id")
+    return suppliers.values_list(
+        "supplier_name", "contact_person", "phone_number", "email", "supplier_rating", "products", "units", "value",
+    )
+
+
+def audit_query(report):
+    return _in_range(Transaction.objects.all(), report).order_by("transaction_date", "id").values_list(
+        "transaction_date", "transaction_type", "product__product_name", "product__sku", "quantity",
+        "warehouse__name", "from_warehouse__name", "to_warehouse__name", "batch_number",
+        "transaction_by", "status",
+    )
+
+
+def profit_loss_query(report):
+    money = DecimalField(max_digits=20, decimal_places=2)
+    zero = Value(0, output_field=money)
+    return (
+        _in_range(Transaction.objects.filter(transaction_type__in=["Sale", "Damaged", "Expired"]), report)
+        .values("product_id")
+        .annotate(
+            sold=Sum(Case(When(transaction_type="Sale", then="quantity"), default=Value(0),
+                          output_field=IntegerField())),
+            revenue=Sum(Case(When(transaction_type="Sale", then="total_price"), default=zero)),
+            cost=Sum(Case(When(transaction_type="Sale", then=F("product__buying_price") * F("quantity")),
+                          default=zero, output_field=money)),
+            written_off=Sum(Case(When(transaction_type__in=["Damaged", "Expired"],
+                                      then=F("product__buying_price") * F("quantity")),
+                                 default=zero, output_field=money)),
+        )
+        .annotate(net=F("revenue") - F("cost") - F("written_off"))
+        .order_by("product_id")
+        .values_list("product__product_name", "product__sku", "sold", "revenue", "cost", "written_off", "net")
+    )
+
+
+# report_type -> (header row, function building the row queryset)
+REPORTS = {
+    "Sales Report": (
+        ["Date", "Product", "SKU", "Warehouse", "Quantity", "Unit Price", "Total", "Sold By"],
+        sales_query,
+    ),
+    "Stock Report": (
+        ["Product", "SKU", "Warehouse", "Quantity", "Low Stock Threshold", "Last Updated"],
+        stock_query,
+    ),
+    "Supplier Report": (
+        ["Supplier", "Contact", "Phone", "Email", "Rating", "Products", "Units In Stock", "Stock Value"],
+        supplier_query,
+    ),
+    "Inventory Audit": (
+        ["Date", "Type", "Product", "SKU", "Quantity", "Warehouse", "From", "To", "Batch", "By", "Status"],
+        audit_query,
+    ),
+    "Profit & Loss": (
+        ["Product", "SKU", "Units Sold", "Revenue", "Cost Of Goods Sold", "Written Off", "Net Profit"],
+        profit_loss_query,
+    ),
+}
+
+
+def report_rows(report):
+    """The header row followed by every data row, streamed from the database."""
+    header, query = REPORTS[report.report_type]
+    yield header
+    yield from query(report).iterator(chunk_size=CHUNK_SIZE)
+
+
+def count_rows(report):
+    """Number of data rows the report will contain (for progress tracking)."""
+    return REPORTS[report.report_type][1](report).count()
+
+
+#  FORMATS  +++++++++++++++++++++++++++++++++++++++
+class _Echo:
+    """A file-like object csv.writer can write to; it just hands the line back."""
+
+    def write(self, value):
+        return value
+
+
+def _text(value):
+    if value is None:
+        return ""
+    if isinstance(value, Decimal):
+        # Every money column is stored with two decimal places.
+        return str(value.quantize(Decimal("0.01")))
+    return str(value)
+
+
+def encode_csv(rows, title):
+    writer = csv.writer(_Echo())
+    for row in rows:
+        yield writer.writerow([_text(value) for value in row]).encode("utf-8")
+
+
+def encode_excel(rows, title):
+    """SpreadsheetML 2003: plain XML that Excel opens, written one row at a time."""
+    sheet_name = escape(title[:31], {'"': "&quot;"})
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<?mso-application progid="Excel.Sheet"?>\n'
+        '<Workbook xmlns="urn:schemas-microsoft-com:office:spreadsheet" '
+        'xmlns:ss="urn:schemas-microsoft-com:office:spreadsheet">\n'
+        f'<Worksheet ss:Name="{sheet_name}"><Table>\n'
+    ).encode("utf-8")
+    for row in rows:
+        cells = []
+        for value in row:
+            is_number = isinstance(value, (int, float, Decimal)) and not isinstance(value, bool)
+            kind = "Number" if is_number else "String"
+            cells.append(f'<Cell><Data ss:Type="{kind}">{escape(_text(value))}</Data></Cell>')
+        yield f"<Row>{''.join(cells)}</Row>\n".encode("utf-8")
+    yield b"</Table></Worksheet></Workbook>\n"
+
+
+def encode_pdf(rows, title, lines_per_page=60):
+    """
+    A minimal text PDF written page by page. The page tree is emitted after
+    the pages, so only object offsets are kept in memory.
+    """
+    offsets = {}
+    position = 0
+    page_ids = []
+
+    def emit(object_id, body):
+        nonlocal position
+        offsets[object_id] = position
+        chunk = f"{object_id} 0 obj\n".encode("latin-1") + body + b"\nendobj\n"
+        position += len(chunk)
+        return chunk
+
+    def pdf_string(text):
+        text = text.encode("latin-1", "replace").decode("latin-1")
+        return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    def page(lines, next_id):
+        content = ["BT /F1 8 Tf 10 TL 30 810 Td"]
+        content += [f"({pdf_string(line)}) '" for line in lines]
+        content.append("ET")
+        stream = "\n".join(content).encode("latin-1")
+        content_id, page_id = next_id, next_id + 1
+        page_ids.append(page_id)
+        return (
+            emit(content_id, b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+            + emit(page_id, (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                             f"/Contents {content_id} 0 R /Resources << /Font << /F1 3 0 R >> >> >>").encode())
+        )
+
+    header = b"%PDF-1.4\n"
+    position = len(header)
+    yield header
+    yield emit(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier >>")
+
+    next_id = 4
+    lines = [title, ""]
+    for row in rows:
+        lines.append(" | ".join(_text(value) for value in row))
+        if len(lines) >= lines_per_page:
+            yield page(lines, next_id)
+            next_id += 2
+            lines = []
+    if lines or not page_ids:
+        yield page(lines, next_id)
+        next_id += 2
+
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    yield emit(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode())
+    yield emit(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+    xref = [f"xref\n0 {next_id}\n", "0000000000 65535 f \n"]
+    xref += [f"{offsets.get(object_id, 0):010d} 00000 n \n" for object_id in range(1, next_id)]
+    yield "".join(xref).encode("latin-1")
+    yield f"trailer\n<< /Size {next_id} /Root 1 0 R >>\nstartxref\n{position}\n%%EOF\n".encode("latin-1")
+
+
+FORMATS = {
+    "CSV": (encode_csv, "text/csv", "csv"),
+    "Excel": (encode_excel, "application/vnd.ms-excel", "xls"),
+    "PDF": (encode_pdf, "application/pdf", "pdf"),
+}
+
+
+def stream_report(report, rows=None):
+    """
+    Return (chunks, content_type, filename) for a Report; chunks is a
+    generator of bytes suitable for a StreamingHttpResponse or a file.
+    ``rows`` overrides the row iterator (e.g. one wrapped for progress).
+    """
+    encode, content_type, extension = FORMATS[report.format]
+    title = str(report)
+    if rows is None:
+        rows = report_rows(report)
+    filename = f"{report.report_type.replace(' & ', '-').replace(' ', '-').lower()}-{report.pk}.{extension}"
+    return encode(rows, title), content_type, filename
@@ -1,40 +1,65 @@
 from rest_framework import serializers
 from .models import (
     Category, Product, SalesRecord, Supplier, 
-    Inventory, Warehouse, Transaction , User, Report
-    ) 
+    Inventory, Warehouse, Transaction , User, Report, SalesRollup, LowStockAlert, StockLot
+    )
 
 
 
+class SparseFieldsetMixin:
+    """
+    Honour ``?fields=a,b,c`` on GET requests so list views only serialize the
+    columns the client renders. Applies to the top-level serializer only;
+    nested serializers keep all their fields.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get("request")
+        if request is None or request.method != "GET":
+            return fields
+        is_root = self.parent is None or (
+            isinstance(self.parent, serializers.ListSerializer) and self.parent.parent is None
+        )
+        requested = request.query_params.get("fields") if is_root else None
+        if not requested:
+            return fields
+        wanted = {name.strip() for name in requested.split(",") if name.strip()}
+        return {name: field for name, field in fields.items() if name in wanted} or fields
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
-        fields = "__all__"
-        # fields = ['id', 'username', 'full_name', 'phone', 'address', 'role']
+        # Every field except the password hash and the groups/permissions
+        # relations, which would be fetched once per user.
+        exclude = ['password', 'groups', 'user_permissions']
 
 
 #  Categories ++++++++++++++++++++++++++++++++++++++
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = "__all__"
 
 #  Products ++++++++++++++++++++++++++++++++++++++
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     low_stock_warning = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
         fields = "__all__"
+        # Both follow the product's inventories; only the stock paths write them.
+        read_only_fields = ['stock', 'is_low_stock']
 
     def get_low_stock_warning(self, obj):
         """Return a warning message if stock is below threshold."""
-        if obj.stock < obj.low_stock_threshold:
+        if obj.is_low_stock:
             return f"⚠️ Warning: {obj.product_name} stock is below the threshold ({obj.low_stock_threshold}). Please restock!"
         return None  # No warning if stock is okay
 
 #  Inventories ++++++++++++++++++++++++++++++++++++++
-class InventorySerializer(serializers.ModelSerializer):
+class InventorySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     product_name = serializers.ReadOnlyField(source="product.product_name")
     warehouse_name = serializers.ReadOnlyField(source="warehouse.name")
     last_transaction_type = serializers.SerializerMethodField()
@@ -56,19 +81,35 @@ class InventorySerializer(serializers.ModelSerializer):
         ]
 
     def get_last_transaction_type(self, obj):
+        # List views annotate this via Inventory.objects.with_last_transaction_type().
+        if hasattr(obj, 'last_transaction_type'):
+            return obj.last_transaction_type
         # Attempt to fetch the latest transaction for the product
         last_txn = obj.product.transaction_set.order_by('-transaction_date').first()
         return last_txn.transaction_type if last_txn else None
 
 
+#  Stock lots  ++++++++++++++++++++++++++++++++++++++
+class StockLotSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    product_name = serializers.ReadOnlyField(source="product.product_name")
+    warehouse_name = serializers.ReadOnlyField(source="warehouse.name")
+
+    class Meta:
+        model = StockLot
+        fields = [
+            'id', 'product', 'product_name', 'warehouse', 'warehouse_name', 'batch_number', 'quantity',
+            'expiry_date', 'received_at',
+        ]
+
+
 #  Warehouse  ++++++++++++++++++++++++++++++++++++++
-class WarehouseSerializer(serializers.ModelSerializer):
+class WarehouseSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Warehouse
         fields = "__all__"
 
 #  Suppliers ++++++++++++++++++++++++++++++++++++++
-class SupplierSerializer(serializers.ModelSerializer):
+class SupplierSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Supplier
         fields = '__all__'
@@ -87,14 +128,37 @@ class SupplierSerializer(serializers.ModelSerializer):
         return data
 
 
-class SalesRecordSerializer(serializers.ModelSerializer):
+class SalesRecordSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = SalesRecord
         # fields = ['id', 'name', 'location'] 
         fields = "__all__"
 
+class SalesRollupSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    product_name = serializers.ReadOnlyField(source="product.product_name")
+
+    class Meta:
+        model = SalesRollup
+        fields = [
+            'id', 'product', 'product_name', 'warehouse', 'granularity', 'period_start',
+            'quantity_sold', 'sale_amount', 'quantity_purchased', 'purchase_amount',
+        ]
+
+#  Low stock alerts ++++++++++++++++++++++++++++++++++++++
+class LowStockAlertSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    product_name = serializers.ReadOnlyField(source="product.product_name")
+    sku = serializers.ReadOnlyField(source="product.sku")
+    current_stock = serializers.ReadOnlyField(source="product.stock")
+
+    class Meta:
+        model = LowStockAlert
+        fields = [
+            'id', 'product', 'product_name', 'sku', 'stock', 'threshold', 'current_stock',
+            'status', 'created_at', 'resolved_at',
+        ]
+
 #  Transactions ++++++++++++++++++++++++++++++++++++++
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     product_name = serializers.ReadOnlyField(source="product.product_name")
     from_warehouse = WarehouseSerializer(read_only=True)
     to_warehouse = WarehouseSerializer(read_only=True)
@@ -104,6 +168,21 @@ class TransactionSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['transaction_by']
 
+    # Fields whose values were posted to stock, the ledger, the rollups and
+    # the dashboard. Later saves do not re-post, so they cannot be edited.
+    POSTED_FIELDS = ['product', 'transaction_type', 'quantity', 'unit_price', 'batch_number', 'warehouse']
+
+    def validate(self, attrs):
+        if self.instance is not None:
+            changed = {
+                field: ["Cannot be changed once posted; post a correcting transaction instead."]
+                for field in self.POSTED_FIELDS
+                if field in attrs and (attrs[field] or None) != (getattr(self.instance, field) or None)
+            }
+            if changed:
+                raise serializers.ValidationError(changed)
+        return attrs
+
     def create(self, validated_data):
         request = self.context.get("request")
         if request and hasattr(request, "user"):
@@ -113,8 +192,30 @@ class TransactionSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class BulkTransactionRowSerializer(serializers.Serializer):
+    """
+    Field-level validation for one row of a bulk post. Related objects are
+    passed as ids and resolved for the whole batch at once by the service.
+    """
+    product = serializers.IntegerField()
+    transaction_type = serializers.ChoiceField(choices=Transaction.TRANSACTION_TYPES)
+    quantity = serializers.IntegerField(min_value=1)
+    unit_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    batch_number = serializers.CharField(max_length=50, required=False, allow_null=True, allow_blank=True)
+    expiry_date = serializers.DateField(required=False, allow_null=True)
+    warehouse = serializers.IntegerField(required=False, allow_null=True)
+    from_warehouse = serializers.IntegerField(required=False, allow_null=True)
+    to_warehouse = serializers.IntegerField(required=False, allow_null=True)
+
+
 class ReportSerializer(serializers.ModelSerializer):
     class Meta:
         model = Report
-        fields = ['id', 'title', 'report_type', 'format', 'data_range_start', 'data_range_end', 'generated_date']
-        read_only_fields = ['id', 'generated_date']
\ No newline at end of file
+        fields = [
+            'id', 'title', 'report_type', 'format', 'data_range_start', 'data_range_end', 'generated_date',
+            'status', 'progress', 'rows_written', 'output_file', 'error_message', 'started_at', 'finished_at',
+        ]
+        read_only_fields = [
+            'id', 'generated_date',
+            'status', 'progress', 'rows_written', 'output_file', 'error_message', 'started_at', 'finished_at',
+        ]
\ No newline at end of file
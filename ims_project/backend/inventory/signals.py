@@ -1,9 +1,56 @@
-from django.db.models.signals import post_save
+from django.db.models import F, QuerySet
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from django.db.models import Sum
-from .models import Inventory, Product
+from rest_framework.authtoken.models import Token
+from .alerts import sync_low_stock
+from .auth import invalidate_tokens
+from .ledger import record_adjustments
+from .lookup import invalidate_products
+from .models import Inventory, Product, User, Warehouse
+
+def _deleted_from(origin, *models):
+    """Whether a delete cascade started at an instance or queryset of one of ``models``."""
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model in models
+
+
+# Inventory.save keeps Product.stock current by applying each row's delta;
+# deleting a row has to take its quantity back off the product. Rows removed
+# along with their product (or its category) are skipped: the product, its
+# alerts and its history are being deleted in the same cascade.
+@receiver(post_delete, sender=Inventory)
+def update_product_stock(sender, instance, origin=None, **kwargs):
+    if not instance.quantity or not _deleted_from(origin, Inventory, Warehouse):
+        return
+    Product.objects.filter(pk=instance.product_id).update(stock=F('stock') - instance.quantity)
+    sync_low_stock([instance.product_id])
+    # Warehouses with ledger history are protected, so a warehouse delete only
+    # reaches rows the ledger never saw; recording them would reference it.
+    if _deleted_from(origin, Inventory):
+        record_adjustments([(instance.product_id, instance.warehouse_id, -instance.quantity)])
+
+
+# Cached scan lookups carry the product and its per-warehouse stock.
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_lookup(sender, instance, **kwargs):
+    invalidate_products([instance.pk])
+
 
 @receiver(post_save, sender=Inventory)
-def update_product_stock(sender, instance, **kwargs):
-    total_stock = instance.product.inventories.aggregate(total_stock=Sum('quantity'))['total_stock'] or 0
-    Product.objects.filter(pk=instance.product.pk).update(stock=total_stock)
+@receiver(post_delete, sender=Inventory)
+def invalidate_inventory_lookup(sender, instance, **kwargs):
+    invalidate_products([instance.product_id])
+
+
+# Cached token authentication carries the token and its user; logout deletes
+# the token, and saving a user may deactivate it or change its role.
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    invalidate_tokens(keys=[instance.key])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    invalidate_tokens(user_ids=[instance.pk])
@@ -0,0 +1,358 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import connections, transaction as db_transaction
+from django.db.models import F, Sum
+from django.utils.timezone import localdate
+
+from . import allocation
+from .alerts import sync_low_stock
+from .dashboard import record_transactions
+from .ledger import record_postings
+from .lookup import invalidate_products
+from .lots import LotLedger
+from .models import Inventory, Product, SalesRecord, SalesRollup, Transaction, Warehouse
+
+
+# For Purchase and Return, treat as incoming (stock increases);
+# For Sale, Damaged, or Expired, treat as outgoing (stock decreases).
+INCOMING_TYPES = ('Purchase', 'Return')
+OUTGOING_TYPES = ('Sale', 'Damaged', 'Expired')
+
+
+def _pk(value):
+    """Accept either a model instance or a raw primary key."""
+    return getattr(value, 'pk', value)
+
+
+def movements_for(transaction_type, product_id, quantity, warehouse_id=None,
+                  from_warehouse_id=None, to_warehouse_id=None):
+    """
+    Translate one transaction into a list of (product_id, warehouse_id, delta)
+    stock movements. Raises ValidationError for malformed transfers.
+    """
+    if transaction_type == 'Transfer':
+        if not (from_warehouse_id and to_warehouse_id):
+            raise ValidationError("Both from_warehouse and to_warehouse must be provided for a transfer.")
+        if from_warehouse_id == to_warehouse_id:
+            raise ValidationError("The from_warehouse and to_warehouse cannot be the same for a transfer.")
+        return [
+            (product_id, from_warehouse_id, -quantity),
+            (product_id, to_warehouse_id, quantity),
+        ]
+
+    if not warehouse_id:
+        raise ValidationError("No warehouse found.")
+    if transaction_type in INCOMING_TYPES:
+        return [(product_id, warehouse_id, quantity)]
+    if transaction_type in OUTGOING_TYPES:
+        return [(product_id, warehouse_id, -quantity)]
+    raise ValidationError(f"Unknown transaction type: {transaction_type}.")
+
+
+def lock_inventories(pairs):
+    """
+    Return {(product_id, warehouse_id): [inventory_id, quantity]} for the given
+    pairs, creating empty inventory rows where none exist yet. Rows are locked
+    with SELECT ... FOR UPDATE in primary-key order so concurrent batches
+    always acquire them in the same order.
+    """
+    pairs = set(pairs)
+    if not pairs:
+        return {}
+    product_ids = {p for p, _ in pairs}
+    warehouse_ids = {w for _, w in pairs}
+
+    def fetch():
+        rows = (
+            Inventory.objects.select_for_update()
+            .filter(product_id__in=product_ids, warehouse_id__in=warehouse_ids)
+            .order_by('pk')
+            .values_list('pk', 'product_id', 'warehouse_id', 'quantity')
+        )
+        return {
+            (product_id, warehouse_id): [pk, quantity]
+            for pk, product_id, warehouse_id, quantity in rows
+            if (product_id, warehouse_id) in pairs
+        }
+
+    found = fetch()
+    missing = pairs - found.keys()
+    if missing:
+        # A concurrent writer may create the same rows first; the unique
+        # (product, warehouse) constraint turns that into a no-op.
+        Inventory.objects.bulk_create([
+            Inventory(product_id=p, warehouse_id=w, quantity=0, incoming_stock=0, outgoing_stock=0)
+            for p, w in sorted(missing)
+        ], ignore_conflicts=True)
+        found = fetch()
+    return found
+
+
+def apply_deltas(deltas, inventory_ids, shortage_message="Not enough stock in the warehouse for this transaction."):
+    """
+    Apply net quantity deltas with one conditional
+    ``UPDATE ... SET quantity = quantity + delta WHERE quantity >= -delta``
+    per (product, warehouse), then move each product's aggregated stock by its
+    net delta. Rows are updated in (product, warehouse) order so concurrent
+    writers lock them in the same order. Must run inside an atomic block.
+    """
+    product_deltas = defaultdict(int)
+    for key in sorted(deltas):
+        delta = deltas[key]
+        if not delta:
+            continue
+        rows = Inventory.objects.filter(pk=inventory_ids[key])
+        if delta < 0:
+            rows = rows.filter(quantity__gte=-delta)
+        if not rows.update(quantity=F('quantity') + delta):
+            raise ValidationError(shortage_message)
+        product_deltas[key[0]] += delta
+
+    for product_id in sorted(product_deltas):
+        delta = product_deltas[product_id]
+        if delta:
+            Product.objects.filter(pk=product_id).update(stock=F('stock') + delta)
+    sync_low_stock(product_deltas)
+    invalidate_products(product_deltas)
+
+
+def post_movements(moves, shortage_message="Not enough stock in the warehouse for this transaction.",
+                   transaction_type=None, batch_number=None):
+    """
+    Atomically apply the (product_id, warehouse_id, delta) movements of a
+    single transaction. The stock check and the write are the same UPDATE,
+    so concurrent workers cannot both pass the check and oversell. With a
+    ``transaction_type`` the movements are also booked against stock lots.
+    """
+    deltas = defaultdict(int)
+    for product_id, warehouse_id, delta in moves:
+        deltas[(product_id, warehouse_id)] += delta
+    with db_transaction.atomic():
+        inventories = lock_inventories(deltas)
+        apply_deltas(deltas, {key: pk for key, (pk, _) in inventories.items()}, shortage_message)
+        if transaction_type:
+            ledger = LotLedger(deltas, {key: quantity for key, (_, quantity) in inventories.items()})
+            ledger.apply(ledger.plan(moves, transaction_type, batch_number))
+            ledger.save()
+
+
+def rollup_periods(day):
+    """The (granularity, period_start) buckets a date falls into."""
+    return [('day', day), ('month', day.replace(day=1))]
+
+
+def apply_rollups(transactions):
+    """
+    Add Sale and Purchase transactions to their daily and monthly
+    SalesRollup rows: one INSERT for missing buckets, then one UPDATE per
+    touched bucket.
+    """
+    totals = defaultdict(lambda: [0, Decimal('0'), 0, Decimal('0')])
+    for txn in transactions:
+        if txn.transaction_type not in ('Sale', 'Purchase'):
+            continue
+        for granularity, period_start in rollup_periods(localdate(txn.transaction_date)):
+            bucket = totals[(txn.product_id, txn.warehouse_id, granularity, period_start)]
+            if txn.transaction_type == 'Sale':
+                bucket[0] += txn.quantity
+                bucket[1] += txn.total_price
+            else:
+                bucket[2] += txn.quantity
+                bucket[3] += txn.total_price
+    if not totals:
+        return
+
+    SalesRollup.objects.bulk_create(
+        [
+            SalesRollup(product_id=p, warehouse_id=w, granularity=g, period_start=period)
+            for p, w, g, period in sorted(totals, key=str)
+        ],
+        ignore_conflicts=True,
+    )
+    for (product_id, warehouse_id, granularity, period_start), values in sorted(totals.items(), key=str):
+        sold, sale_amount, purchased, purchase_amount = values
+        SalesRollup.objects.filter(
+            product_id=product_id, warehouse_id=warehouse_id,
+            granularity=granularity, period_start=period_start,
+        ).update(
+            quantity_sold=F('quantity_sold') + sold,
+            sale_amount=F('sale_amount') + sale_amount,
+            quantity_purchased=F('quantity_purchased') + purchased,
+            purchase_amount=F('purchase_amount') + purchase_amount,
+        )
+
+
+def refresh_sales_records(batch_size=1000):
+    """
+    Rewrite the lifetime SalesRecord totals from the monthly SalesRollup rows.
+    Postings only touch the rollups; this runs with every dashboard rebuild.
+    Returns the number of products refreshed.
+    """
+    totals = (
+        SalesRollup.objects.filter(granularity='month')
+        .values('product_id')
+        .annotate(
+            sold=Sum('quantity_sold'), sale_amount=Sum('sale_amount'),
+            purchased=Sum('quantity_purchased'), purchase_amount=Sum('purchase_amount'),
+        )
+        .order_by('product_id')
+    )
+    records = {}
+    for product_id, pk in SalesRecord.objects.order_by('-pk').values_list('product_id', 'pk'):
+        records[product_id] = pk  # The oldest record per product wins.
+
+    updated, created = [], []
+    for row in totals.iterator(chunk_size=batch_size):
+        record = SalesRecord(
+            pk=records.get(row['product_id']), product_id=row['product_id'],
+            total_quantity_sold=row['sold'], total_sale_amount=row['sale_amount'],
+            total_quantity_purchased=row['purchased'], total_purchase_amount=row['purchase_amount'],
+        )
+        (updated if record.pk else created).append(record)
+    SalesRecord.objects.bulk_update(updated, [
+        'total_quantity_sold', 'total_sale_amount', 'total_quantity_purchased', 'total_purchase_amount',
+    ], batch_size=batch_size)
+    SalesRecord.objects.bulk_create(created, batch_size=batch_size)
+    return len(updated) + len(created)
+
+
+def insert_transactions(transactions):
+    """
+    Insert already-posted transactions and return them with their primary
+    keys set, which the ledger rows need. Backends that cannot return ids
+    from a multi-row INSERT (MySQL) get one INSERT per row instead.
+    """
+    if connections[Transaction.objects.db].features.can_return_rows_from_bulk_insert:
+        return Transaction.objects.bulk_create(transactions, batch_size=1000)
+    for txn in transactions:
+        # Model.save, not Transaction.save: the stock has already been moved.
+        super(Transaction, txn).save(force_insert=True)
+    return transactions
+
+
+def bulk_post(rows, user=None):
+    """
+    Post a batch of transactions in one database transaction.
+
+    Each row is a dict with ``product``, ``transaction_type``, ``quantity``,
+    ``unit_price`` and optionally ``batch_number``, ``expiry_date`` (of a
+    received batch), ``warehouse``, ``from_warehouse`` and ``to_warehouse``
+    (instances or primary keys).
+    Rows without a ``warehouse`` are placed by the allocation strategy; an
+    outgoing row no single warehouse can cover may be split into one
+    transaction per warehouse. Rows are checked in order against the locked
+    stock levels; rows that fail are reported as
+    ``{"index": i, "errors": [...]}`` and skipped, the rest are posted.
+
+    Returns ``(transactions, errors)``.
+    """
+    errors = []
+    if not rows:
+        return [], errors
+
+    transaction_by = None
+    if user is not None and user.is_authenticated:
+        transaction_by = f"{user.first_name} {user.last_name}".strip() or user.username
+    else:
+        user = None
+
+    product_ids = {_pk(row.get('product')) for row in rows}
+    known_products = set(Product.objects.filter(pk__in=product_ids).values_list('pk', flat=True))
+    warehouse_ids = {_pk(row.get(key)) for row in rows for key in ('warehouse', 'from_warehouse', 'to_warehouse')}
+    known_warehouses = set(Warehouse.objects.filter(pk__in=warehouse_ids - {None}).values_list('pk', flat=True))
+    candidates = allocation.load_candidates(
+        _pk(row.get('product')) for row in rows
+        if row.get('transaction_type') != 'Transfer' and not row.get('warehouse')
+    )
+
+    # Translate every row into (warehouse_id, quantity) parts and stock movements up front.
+    planned = []
+    for index, row in enumerate(rows):
+        product_id = _pk(row.get('product'))
+        warehouse_id = _pk(row.get('warehouse'))
+        from_id = _pk(row.get('from_warehouse'))
+        to_id = _pk(row.get('to_warehouse'))
+        transaction_type = row.get('transaction_type')
+        row_errors = []
+        if product_id not in known_products:
+            row_errors.append(f"Product {product_id} does not exist.")
+        for known_id in (warehouse_id, from_id, to_id):
+            if known_id is not None and known_id not in known_warehouses:
+                row_errors.append(f"Warehouse {known_id} does not exist.")
+        quantity = row.get('quantity') or 0
+        if quantity <= 0:
+            row_errors.append("Quantity must be greater than zero.")
+        if not row_errors:
+            try:
+                if transaction_type == 'Transfer':
+                    parts = [(None, quantity)]
+                elif warehouse_id:
+                    parts = [(warehouse_id, quantity)]
+                elif transaction_type in INCOMING_TYPES + OUTGOING_TYPES:
+                    parts = allocation.allocate(
+                        candidates[product_id], quantity, incoming=transaction_type in INCOMING_TYPES,
+                    )
+                else:
+                    raise ValidationError(f"Unknown transaction type: {transaction_type}.")
+                moves = [
+                    move for part_warehouse_id, part_quantity in parts
+                    for move in movements_for(
+                        transaction_type, product_id, part_quantity, part_warehouse_id, from_id, to_id,
+                    )
+                ]
+            except ValidationError as exc:
+                row_errors.extend(exc.messages)
+        if row_errors:
+            errors.append({"index": index, "errors": row_errors})
+            continue
+        planned.append((index, row, parts, moves))
+
+    with db_transaction.atomic():
+        inventories = lock_inventories(key[:2] for _, _, _, moves in planned for key in moves)
+        balances = {key: quantity for key, (_, quantity) in inventories.items()}
+        ledger = LotLedger(inventories, balances)
+        deltas = defaultdict(int)
+        transactions = []
+
+        for index, row, parts, moves in planned:
+            if any(balances[(p, w)] + delta < 0 for p, w, delta in moves):
+                errors.append({"index": index, "errors": ["Not enough stock in the warehouse for this transaction."]})
+                continue
+            try:
+                lot_changes = ledger.plan(moves, row['transaction_type'], row.get('batch_number'), row.get('expiry_date'))
+            except ValidationError as exc:
+                errors.append({"index": index, "errors": exc.messages})
+                continue
+            ledger.apply(lot_changes)
+            for p, w, delta in moves:
+                balances[(p, w)] += delta
+                deltas[(p, w)] += delta
+
+            unit_price = Decimal(str(row['unit_price']))
+            # A split row becomes one transaction per warehouse it was taken from.
+            for warehouse_id, quantity in parts:
+                transactions.append(Transaction(
+                    product_id=_pk(row['product']),
+                    transaction_type=row['transaction_type'],
+                    quantity=quantity,
+                    unit_price=unit_price,
+                    total_price=unit_price * quantity,
+                    user=user,
+                    transaction_by=transaction_by,
+                    batch_number=row.get('batch_number'),
+                    from_warehouse_id=_pk(row.get('from_warehouse')),
+                    to_warehouse_id=_pk(row.get('to_warehouse')),
+                    warehouse_id=warehouse_id,
+                ))
+
+        apply_deltas(deltas, {key: pk for key, (pk, _) in inventories.items()})
+        ledger.save()
+        transactions = insert_transactions(transactions)
+        record_postings(transactions)
+        apply_rollups(transactions)
+        record_transactions(transactions)
+
+    errors.sort(key=lambda error: error["index"])
+    return transactions, errors
@@ -1,3 +1,1484 @@
-from django.test import TestCase
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.timezone import localdate
+from django.test import TestCase, TransactionTestCase
+from django.urls import URLResolver, reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from . import allocation, auth, catalog, codes, dashboard, jobs, ledger, log, lookup, lots, metrics, reports, stock
+from .models import (
+    Category, DashboardSnapshot, IdempotencyKey, Inventory, LowStockAlert, Product, Report, SalesRecord, SalesRollup,
+    StockLot, StockMovement, StockSnapshot, Supplier, Transaction, User, Warehouse,
+)
+
+
+def make_product(name="Widget", buying_price="5.00", selling_price="8.00", **kwargs):
+    category, _ = Category.objects.get_or_create(category_name="General")
+    return Product.objects.create(
+        product_name=name, category=category,
+        buying_price=Decimal(buying_price), selling_price=Decimal(selling_price), **kwargs
+    )
+
+
+#  BULK TRANSACTIONS  +++++++++++++++++++++++++++++++++++++++
+class BulkPostTests(TestCase):
+    def setUp(self):
+        self.main = Warehouse.objects.create(name="Main", location="A")
+        self.backup = Warehouse.objects.create(name="Backup", location="B")
+        self.product = make_product()
+        self.user = User.objects.create_user(username="clerk", password="pw")
+
+    def test_bulk_post_applies_net_deltas(self):
+        rows = [
+            {"product": self.product.pk, "transaction_type": "Purchase", "quantity": 10, "unit_price": Decimal("5")},
+            {"product": self.product.pk, "transaction_type": "Sale", "quantity": 3, "unit_price": Decimal("8")},
+            {"product": self.product.pk, "transaction_type": "Transfer", "quantity": 2, "unit_price": Decimal("5"),
+             "from_warehouse": self.main.pk, "to_warehouse": self.backup.pk},
+        ]
+        transactions, errors = Transaction.objects.bulk_post(rows, user=self.user)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(transactions), 3)
+        self.assertEqual(Inventory.objects.get(product=self.product, warehouse=self.main).quantity, 5)
+        self.assertEqual(Inventory.objects.get(product=self.product, warehouse=self.backup).quantity, 2)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 7)
+        # Postings only write the rollups; SalesRecord is derived from them.
+        self.assertFalse(SalesRecord.objects.exists())
+        stock.refresh_sales_records()
+        record = SalesRecord.objects.get(product=self.product)
+        self.assertEqual(record.total_quantity_sold, 3)
+        self.assertEqual(record.total_quantity_purchased, 10)
+        self.assertEqual(record.total_sale_amount, Decimal("24"))
+
+    def test_bulk_post_links_movements_without_bulk_returning(self):
+        # MySQL cannot return ids from a multi-row INSERT.
+        rows = [
+            {"product": self.product.pk, "transaction_type": "Purchase", "quantity": 10, "unit_price": Decimal("5")},
+            {"product": self.product.pk, "transaction_type": "Transfer", "quantity": 2, "unit_price": Decimal("5"),
+             "from_warehouse": self.main.pk, "to_warehouse": self.backup.pk},
+        ]
+        with mock.patch.object(type(connection.features), "can_return_rows_from_bulk_insert", False):
+            transactions, errors = Transaction.objects.bulk_post(rows, user=self.user)
+
+        self.assertEqual(errors, [])
+        self.assertTrue(all(txn.pk for txn in transactions))
+        self.assertEqual(StockMovement.objects.count(), 3)
+        self.assertFalse(StockMovement.objects.filter(transaction__isnull=True).exists())
+        self.assertEqual(
+            set(StockMovement.objects.values_list("transaction_id", flat=True)), {txn.pk for txn in transactions},
+        )
+
+    def test_bulk_post_reports_errors_per_row(self):
+        rows = [
+            {"product": self.product.pk, "transaction_type": "Purchase", "quantity": 2, "unit_price": Decimal("5")},
+            {"product": self.product.pk, "transaction_type": "Sale", "quantity": 5, "unit_price": Decimal("8")},
+            {"product": 9999, "transaction_type": "Sale", "quantity": 1, "unit_price": Decimal("8")},
+        ]
+        transactions, errors = Transaction.objects.bulk_post(rows)
+
+        self.assertEqual(len(transactions), 1)
+        self.assertEqual([error["index"] for error in errors], [1, 2])
+        self.assertEqual(Inventory.objects.get(product=self.product, warehouse=self.main).quantity, 2)
+
+    def test_bulk_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post("/api/transactions/bulk/", [
+            {"product": self.product.pk, "transaction_type": "Purchase", "quantity": 4, "unit_price": "5.00"},
+            {"product": self.product.pk, "transaction_type": "Sale", "quantity": 0, "unit_price": "8.00"},
+        ], format="json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["created"], 1)
+        self.assertEqual(response.data["errors"][0]["index"], 1)
+        self.assertEqual(Transaction.objects.get().transaction_by, "clerk")
+
+    def test_update_rejects_posted_fields(self):
+        (txn,), _ = Transaction.objects.bulk_post(
+            [{"product": self.product.pk, "transaction_type": "Purchase", "quantity": 4, "unit_price": Decimal("5")}]
+        )
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.patch(f"/api/transactions/{txn.pk}/", {"quantity": 9}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("quantity", response.data)
+
+        response = client.patch(f"/api/transactions/{txn.pk}/", {"quantity": 4, "status": "Pending"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        txn.refresh_from_db()
+        self.assertEqual((txn.quantity, txn.status), (4, "Pending"))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 4)
+
+
+#  CONCURRENT STOCK MUTATION  +++++++++++++++++++++++++++++++++++++++
+class ConcurrentStockTests(TransactionTestCase):
+    """
+    Fire parallel sales and transfers at one SKU and check that stock is
+    conserved: nothing oversold, nothing lost.
+    """
+    workers = 8
+    attempts_per_worker = 10
+    initial_stock = 40
+
+    def setUp(self):
+        self.main = Warehouse.objects.create(name="Main", location="A")
+        self.backup = Warehouse.objects.create(name="Backup", location="B")
+        self.product = make_product()
+        Transaction.objects.create(
+            product=self.product, transaction_type="Purchase", quantity=self.initial_stock, unit_price=Decimal("5")
+        )
+
+    def _run(self, make_transaction):
+        outcomes = []
+        lock = threading.Lock()
+
+        def worker(number):
+            try:
+                for _ in range(self.attempts_per_worker):
+                    while True:
+                        try:
+                            make_transaction(number)
+                            result = "ok"
+                        except ValidationError:
+                            result = "rejected"
+                        except OperationalError:
+                            # SQLite serializes writers by failing them; retry.
+                            continue
+                        break
+                    with lock:
+                        outcomes.append(result)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(number,)) for number in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes.count("ok")
+
+    def _quantities(self):
+        return {
+            inventory.warehouse_id: inventory.quantity
+            for inventory in Inventory.objects.filter(product=self.product)
+        }
+
+    def test_parallel_sales_never_oversell(self):
+        sold = self._run(lambda number: Transaction.objects.create(
+            product=self.product, transaction_type="Sale", quantity=1, unit_price=Decimal("8")
+        ))
+
+        self.assertEqual(sold, self.initial_stock)
+        self.assertEqual(self._quantities()[self.main.pk], 0)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 0)
+        stock.refresh_sales_records()
+        self.assertEqual(SalesRecord.objects.get(product=self.product).total_quantity_sold, sold)
+
+    def test_parallel_transfers_conserve_stock(self):
+        def transfer(number):
+            source, target = (self.main, self.backup) if number % 2 else (self.backup, self.main)
+            Transaction.objects.create(
+                product=self.product, transaction_type="Transfer", quantity=3, unit_price=Decimal("5"),
+                from_warehouse=source, to_warehouse=target,
+            )
+
+        self._run(transfer)
+
+        quantities = self._quantities()
+        self.assertTrue(all(quantity >= 0 for quantity in quantities.values()))
+        self.assertEqual(sum(quantities.values()), self.initial_stock)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, self.initial_stock)
+
+
+#  INCREMENTAL PRODUCT STOCK  +++++++++++++++++++++++++++++++++++++++
+class ProductStockTests(TestCase):
+    def setUp(self):
+        self.main = Warehouse.objects.create(name="Main", location="A")
+        self.backup = Warehouse.objects.create(name="Backup", location="B")
+        self.product = make_product()
+
+    def test_inventory_writes_apply_deltas(self):
+        main = Inventory.objects.create(product=self.product, warehouse=self.main, quantity=10)
+        Inventory.objects.create(product=self.product, warehouse=self.backup, quantity=4)
+        main.outgoing_stock = 3
+        main.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 11)
+
+        main.delete()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 4)
+
+    def test_deleting_stocked_product_or_category(self):
+        # Cascaded inventory deletes must not sync stock or alerts for a product being deleted.
+        Inventory.objects.create(product=self.product, warehouse=self.main, quantity=10)
+        self.product.delete()
+        self.assertFalse(Product.objects.exists())
+        self.assertFalse(LowStockAlert.objects.exists())
+
+        other = make_product(name="Gadget")
+        Inventory.objects.create(product=other, warehouse=self.backup, quantity=10)
+        other.category.delete()
+        self.assertFalse(Product.objects.exists())
+        self.assertFalse(Inventory.objects.exists())
+        self.assertFalse(LowStockAlert.objects.exists())
+
+    def test_warehouse_with_stock_history_is_kept(self):
+        Inventory.objects.create(product=self.product, warehouse=self.main, quantity=10)
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username="clerk", password="pw"))
+
+        response = client.delete(f"/api/warehouses/{self.main.pk}/")
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(StockMovement.objects.filter(warehouse=self.main).exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 10)
+
+        self.assertEqual(client.delete(f"/api/warehouses/{self.backup.pk}/").status_code, 204)
+
+    def test_reconcile_stock_fixes_drift(self):
+        Inventory.objects.create(product=self.product, warehouse=self.main, quantity=10)
+        Product.objects.filter(pk=self.product.pk).update(stock=2)
+
+        out = StringIO()
+        call_command("reconcile_stock", "--fix", stdout=out)
+
+        self.assertIn("Corrected stock for 1 product(s).", out.getvalue())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 10)
+
+
+#  PAGINATION & SPARSE FIELDSETS  +++++++++++++++++++++++++++++++++++++++
+class ListPaginationTests(TestCase):
+    def setUp(self):
+        Warehouse.objects.create(name="Main", location="A")
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username="clerk", password="pw"))
+        self.products = [make_product(name=f"Item {i}") for i in range(5)]
+
+    def test_limit_offset_with_fields(self):
+        response = self.client.get("/api/products/", {"limit": 2, "fields": "id,sku"})
+
+        self.assertEqual(response.data["count"], 5)
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertEqual(set(response.data["results"][0]), {"id", "sku"})
+
+    def test_transactions_use_cursor_paging(self):
+        for product in self.products:
+            Transaction.objects.create(product=product, transaction_type="Purchase", quantity=1, unit_price=Decimal("5"))
+
+        first = self.client.get("/api/transactions/", {"page_size": 3})
+        second = self.client.get(first.data["next"])
+
+        self.assertEqual(len(first.data["results"]), 3)
+        self.assertEqual(len(second.data["results"]), 2)
+        self.assertNotIn("count", first.data)
+        seen = [row["id"] for row in first.data["results"] + second.data["results"]]
+        self.assertEqual(len(set(seen)), 5)
+
+
+class ListFilterTests(TestCase):
+    def setUp(self):
+        self.main = Warehouse.objects.create(name="Main", location="A")
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username="clerk", password="pw"))
+        self.supplier = Supplier.objects.create(supplier_name="Acme Foods", phone_number="1", email="a@x.com")
+        self.apple = make_product(name="Green Apple", selling_price="9.00", supplier=self.supplier)
+        self.pear = make_product(name="Pear", selling_price="6.00")
+        Transaction.objects.create(product=self.apple, transaction_type="Purchase", quantity=10, unit_price=Decimal("5"))
+        Transaction.objects.create(product=self.pear, transaction_type="Purchase", quantity=1, unit_price=Decimal("5"))
+
+    def _names(self, url, params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [row.get("product_name") for row in response.data["results"]]
+
+    def test_product_filters_search_and_ordering(self):
+        self.assertEqual(self._names("/api/products/", {"search": "appl"}), ["Green Apple"])
+        self.assertEqual(self._names("/api/products/", {"search": "acme"}), ["Green Apple"])
+        self.assertEqual(self._names("/api/products/", {"search": self.pear.sku[:7]}), ["Pear"])
+        self.assertEqual(self._names("/api/products/", {"low_stock": "1"}), ["Pear"])
+        self.assertEqual(self._names("/api/products/", {"supplier": self.supplier.pk}), ["Green Apple"])
+        self.assertEqual(self._names("/api/products/", {"min_price": "7", "warehouse": self.main.pk}), ["Green Apple"])
+        self.assertEqual(self._names("/api/products/", {"ordering": "selling_price"}), ["Pear", "Green Apple"])
+
+        response = self.client.get("/api/products/", {"min_price": "cheap"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("min_price", response.data)
+
+    def test_inventory_and_transaction_filters(self):
+        self.assertEqual(self._names("/api/inventory/", {"low_stock": "true"}), ["Pear"])
+        self.assertEqual(self._names("/api/inventory/", {"ordering": "-quantity"}), ["Green Apple", "Pear"])
+
+        Transaction.objects.create(product=self.apple, transaction_type="Sale", quantity=2, unit_price=Decimal("9"))
+        today = localdate().isoformat()
+        self.assertEqual(
+            self._names("/api/transactions/", {"transaction_type": "Sale", "from": today, "to": today}), ["Green Apple"]
+        )
+        self.assertEqual(self._names("/api/transactions/", {"to": "2000-01-01"}), [])
+        rows = self.client.get("/api/transactions/", {"ordering": "quantity", "page_size": 2}).data
+        self.assertEqual([row["quantity"] for row in rows["results"]], [1, 2])
+        self.assertEqual([row["quantity"] for row in self.client.get(rows["next"]).data["results"]], [10])
+
+
+#  INVENTORY LISTING QUERIES  +++++++++++++++++++++++++++++++++++++++
+class InventoryListQueryTests(TestCase):
+    def setUp(self):
+        self.warehouse = Warehouse.objects.create(name="Main", location="A")
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username="clerk", password="pw"))
+
+    def _add_rows(self, count):
+        for i in range(count):
+            product = make_product(name=f"Item {Product.objects.count()}")
+            Transaction.objects.create(product=product, transaction_type="Purchase", quantity=5, unit_price=Decimal("5"))
+            Transaction.objects.create(product=product, transaction_type="Sale", quantity=1, unit_price=Decimal("8"))
+
+    def _count_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/inventory/", {"limit": 100})
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_query_count_does_not_scale_with_rows(self):
+        self._add_rows(2)
+        small, _ = self._count_queries()
+        self._add_rows(20)
+        large, response = self._count_queries()
+
+        self.assertEqual(small, large)
+        self.assertEqual(response.data["results"][0]["last_transaction_type"], "Sale")
+
+
+#  DASHBOARD  +++++++++++++++++++++++++++++++++++++++
+class DashboardStatsTests(TestCase):
+    def setUp(self):
+        Warehouse.objects.create(name="Main", location="A")
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username="clerk", password="pw"))
+        product = make_product(buying_price="5.00", selling_price="8.00")
+        for transaction_type, quantity, unit_price in [
+            ("Purchase", 10, "5"), ("Sale", 4, "8"), ("Damaged", 1, "5"), ("Expired", 1, "5"),
+        ]:
+            Transaction.objects.create(
+                product=product, transaction_type=transaction_type, quantity=quantity, unit_price=Decimal(unit_price)
+            )
+
+    def test_profit_is_aggregated_in_sql(self):
+        self.client.get("/api/dashboard/")  # Builds the snapshot.
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/dashboard/")
+
+        # 4 sold at a 3.00 margin, 2 written off at 5.00 cost.
+        self.assertEqual(response.data["profit"], Decimal("2.00"))
+        self.assertEqual(response.data["loss"], 0)
+        self.assertEqual(len(response.data["recent_transactions"]), 4)
+        # Snapshot row, recent transactions, recent reports.
+        self.assertEqual(len(ctx.captured_queries), 3)
+
+    def test_date_range(self):
+        response = self.client.get("/api/dashboard/", {"start_date": "2000-01-01", "end_date": "2000-12-31"})
+        self.assertEqual(response.data["profit"], 0)
+
+        response = self.client.get("/api/dashboard/", {"start_date": "yesterday"})
+        self.assertEqual(response.status_code, 400)
+
+        today = localdate()
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(dashboard.profit_total(today, today), Decimal("2.00"))
+        # A plain range on transaction_date, not a per-row date cast.
+        self.assertNotIn("cast_date", ctx.captured_queries[0]["sql"])
+        report = Report(report_type="Sales Report", data_range_start=today, data_range_end=today)
+        self.assertEqual(reports.count_rows(report), 1)
+
+    def test_snapshot_is_updated_incrementally(self):
+        first = self.client.get("/api/dashboard/")
+        rebuilt_at = DashboardSnapshot.objects.get().rebuilt_at
+        product = Product.objects.get()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            Transaction.objects.create(product=product, transaction_type="Sale", quantity=2, unit_price=Decimal("8"))
+            # The posting itself leaves the shared snapshot row alone.
+            self.assertEqual(DashboardSnapshot.objects.get().total_inventory_sold, 4)
+        self.assertTrue(callbacks)
+
+        second = self.client.get("/api/dashboard/")
+
+        self.assertEqual(DashboardSnapshot.objects.get().rebuilt_at, rebuilt_at)
+        self.assertEqual(second.data["available_inventory"], first.data["available_inventory"] - 2)
+        self.assertEqual(second.data["total_inventory_sold"], 6)
+        self.assertEqual(second.data["profit"], Decimal("8.00"))
+        fresh = self.client.get("/api/dashboard/", {"fresh": "1"})
+        self.assertEqual(fresh.data["profit"], Decimal("8.00"))
+        self.assertEqual(fresh.data["available_inventory"], second.data["available_inventory"])
+
+    def test_stale_snapshot_is_rebuilt_off_the_request_path(self):
+        self.client.get("/api/dashboard/")
+        stale_at = timezone.now() - timedelta(hours=1)
+        DashboardSnapshot.objects.update(rebuilt_at=stale_at, net_profit=Decimal("99.00"))
+
+        # Requests serve the stored snapshot even when it is old.
+        self.assertEqual(self.client.get("/api/dashboard/").data["profit"], Decimal("99.00"))
+        self.assertEqual(DashboardSnapshot.objects.get().rebuilt_at, stale_at)
+
+        # A rebuild queued behind a newer one returns it without recomputing.
+        self.assertEqual(dashboard.rebuild_snapshot(since=stale_at).net_profit, Decimal("99.00"))
+
+        self.assertIsNotNone(dashboard.rebuild_stale_snapshot(max_age=60))
+        self.assertIsNone(dashboard.rebuild_stale_snapshot(max_age=60))
+        self.assertEqual(self.client.get("/api/dashboard/").data["profit"], Decimal("2.00"))
+
+
+#  SALES ROLLUPS  +++++++++++++++++++++++++++++++++++++++
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        self.warehouse = Warehouse.objects.create(name="Main", location="A")
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username="clerk", password="pw"))
+        self.product = make_product()
+        Transaction.objects.create(product=self.product, transaction_type="Purchase", quantity=10, unit_price=Decimal("5"))
+        Transaction.objects.create(product=self.product, transaction_type="Sale", quantity=2, unit_price=Decimal("8"))
+        Transaction.objects.bulk_post([
+            {"product": self.product.pk, "transaction_type": "Sale", "quantity": 3, "unit_price": Decimal("8")},
+        ])
+
+    def test_rollups_are_maintained_on_post(self):
+        today = localdate()
+        day = SalesRollup.objects.get(granularity="day", period_start=today)
+        month = SalesRollup.objects.get(granularity="month", period_start=today.replace(day=1))
+        for rollup in (day, month):
+            self.assertEqual(rollup.warehouse, self.warehouse)
+            self.assertEqual(rollup.quantity_sold, 5)
+            self.assertEqual(rollup.sale_amount, Decimal("40"))
+            self.assertEqual(rollup.quantity_purchased, 10)
+
+    def test_range_query_and_backfill(self):
+        today = localdate().isoformat()
+        response = self.client.get("/api/sales/", {"from": today, "to": today, "granularity": "day"})
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(response.data["results"][0]["quantity_sold"], 5)
+
+        before = list(SalesRollup.objects.order_by("granularity").values_list("quantity_sold", "sale_amount"))
+        call_command("backfill_sales_rollups", stdout=StringIO())
+        after = list(SalesRollup.objects.order_by("granularity").values_list("quantity_sold", "sale_amount"))
+        self.assertEqual(before, after)
+
+    def test_rollups_without_warehouse_share_one_row(self):
+        sale = Transaction(
+            product=self.product, transaction_type="Sale", quantity=1,
+            total_price=Decimal("8"), transaction_date=timezone.now(),
+        )
+        stock.apply_rollups([sale])
+        stock.apply_rollups([sale])
+        unassigned = SalesRollup.objects.filter(warehouse__isnull=True)
+        self.assertEqual(unassigned.count(), 2)  # One day and one month row.
+        self.assertEqual(set(unassigned.values_list("quantity_sold", flat=True)), {2})
+
+    def test_warehouse_with_sales_history_is_kept(self):
+        response = self.client.delete(f"/api/warehouses/{self.warehouse.pk}/")
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(SalesRollup.objects.filter(warehouse=self.warehouse).exists())
+
+
+#  SEED DATA  +++++++++++++++++++++++++++++++++++++++
+class SeedCommandTests(TestCase):
+    def test_seed_ims_builds_consistent_dataset(self):
+        call_command("seed_ims", products=20, warehouses=3, transactions=200, seed=7, stdout=StringIO())
+
+        self.assertEqual(Product.objects.count(), 20)
+        self.assertEqual(Transaction.objects.count(), 200)
+        out = StringIO()
+        call_command("reconcile_stock", stdout=out)
+        self.assertIn("matches", out.getvalue())
+        for stock, threshold, is_low_stock in Product.objects.values_list("stock", "low_stock_threshold", "is_low_stock"):
+            self.assertEqual(is_low_stock, stock < threshold)
+        self.assertEqual(
+            set(LowStockAlert.objects.filter(status="Open").values_list("product_id", flat=True)),
+            set(Product.objects.filter(is_low_stock=True).values_list("pk", flat=True)),
+        )
+        self.assertEqual(
+            sum(SalesRecord.objects.values_list("total_quantity_sold", flat=True)),
+            sum(SalesRollup.objects.filter(granularity="month").values_list("quantity_sold", flat=True)),
+        )
+
+
+#  REPORTS  +++++++++++++++++++++++++++++++++++++++
+class ReportDownloadTests(TestCase):
+    def setUp(self):
+        Warehouse.objects.create(name="Main", location="A")
+        self.user = User.objects.create_user(username="clerk", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        product = make_product(name="Cola, Cherry")
+        Transaction.objects.create(product=product, transaction_type="Purchase", quantity=10, unit_price=Decimal("5"))
+        Transaction.objects.create(product=product, transaction_type="Sale", quantity=4, unit_price=Decimal("8"))
+        Transaction.objects.create(product=product, transaction_type="Damaged", quantity=1, unit_price=Decimal("5"))
+
+    def _download(self, report_type, report_format):
+        report = Report.objects.create(report_type=report_type, format=report_format, user=self.user)
+        response = self.client.get(f"/api/reports/{report.pk}/download/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content)
+
+    def test_profit_and_loss_csv(self):
+        lines = self._download("Profit & Loss", "CSV").decode().splitlines()
+        self.assertEqual(lines[0].split(",")[0], "Product")
+        # 4 sold at 8.00 against a 5.00 cost, 1 written off.
+        self.assertTrue(lines[1].startswith('"Cola, Cherry",'))
+        self.assertTrue(lines[1].endswith(",7.00"))
+
+    def test_every_type_and_format_streams(self):
+        for report_type, _ in Report.REPORT_TYPES:
+            for report_format, _ in Report.FORMAT_CHOICES:
+                body = self._download(report_type, report_format)
+                if report_format == "PDF":
+                    self.assertTrue(body.startswith(b"%PDF-1.4"))
+                    self.assertTrue(body.rstrip().endswith(b"%%EOF"))
+                elif report_format == "Excel":
+                    self.assertIn(b"<Workbook", body)
+                else:
+                    self.assertTrue(body)
+
+
+#  REPORT JOBS  +++++++++++++++++++++++++++++++++++++++
+class ReportJobTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = self.settings(MEDIA_ROOT=self.media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        Warehouse.objects.create(name="Main", location="A")
+        self.user = User.objects.create_user(username="clerk", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        product = make_product()
+        Transaction.objects.create(product=product, transaction_type="Purchase", quantity=10, unit_price=Decimal("5"))
+
+    def test_report_is_queued_then_generated(self):
+        response = self.client.post("/api/reports/", {"report_type": "Inventory Audit", "format": "CSV"})
+        self.assertEqual(response.data["status"], "Pending")
+        report_id = response.data["id"]
+
+        self.assertEqual(jobs.claim_jobs(5), [report_id])
+        self.assertEqual(jobs.claim_jobs(5), [])
+        self.assertEqual(jobs.run_job(report_id), "Completed")
+
+        detail = self.client.get(f"/api/reports/{report_id}/")
+        self.assertEqual(detail.data["status"], "Completed")
+        self.assertEqual(detail.data["progress"], 100)
+        self.assertEqual(detail.data["rows_written"], 1)
+        download = self.client.get(f"/api/reports/{report_id}/download/")
+        self.assertIn(b"Purchase", b"".join(download.streaming_content))
+
+    def test_cancel(self):
+        pending = Report.objects.create(report_type="Sales Report", format="PDF", user=self.user)
+        response = self.client.post(f"/api/reports/{pending.pk}/cancel/")
+        self.assertEqual(response.data["status"], "Cancelled")
+        self.assertEqual(jobs.claim_jobs(5), [])
+
+        running = Report.objects.create(report_type="Sales Report", format="PDF", user=self.user)
+        jobs.claim_jobs(5)
+        self.client.post(f"/api/reports/{running.pk}/cancel/")
+        original, jobs.HEARTBEAT_SECONDS = jobs.HEARTBEAT_SECONDS, 0
+        try:
+            self.assertEqual(jobs.run_job(running.pk), "Cancelled")
+        finally:
+            jobs.HEARTBEAT_SECONDS = original
+
+    def test_stale_jobs_are_requeued_unless_cancelled(self):
+        silent = Report.objects.create(report_type="Sales Report", format="PDF", user=self.user)
+        cancelled = Report.objects.create(report_type="Sales Report", format="PDF", user=self.user)
+        jobs.claim_jobs(5)
+        Report.objects.update(heartbeat_at=timezone.now() - timedelta(minutes=10))
+        jobs.request_cancel(cancelled)
+
+        self.assertEqual(jobs.requeue_stale(60), 1)
+        silent.refresh_from_db()
+        cancelled.refresh_from_db()
+        self.assertEqual(silent.status, "Pending")
+        self.assertEqual(cancelled.status, "Cancelled")
+        self.assertIsNotNone(cancelled.finished_at)
+        self.assertEqual(jobs.claim_jobs(5), [silent.pk])
+
+    def test_late_cancel_is_not_overwritten(self):
+        report = Report.objects.create(report_type="Inventory Audit", format="CSV", user=self.user)
+        jobs.claim_jobs(5)
+        stream_report = jobs.reports.stream_report
+
+        def cancel_then_stream(job, **kwargs):
+            # The cancel lands after the job's last check (none runs for one row).
+            jobs.request_cancel(job)
+            return stream_report(job, **kwargs)
+
+        with mock.patch.object(jobs.reports, "stream_report", side_effect=cancel_then_stream):
+            self.assertEqual(jobs.run_job(report.pk), "Cancelled")
+        report.refresh_from_db()
+        self.assertEqual(report.status, "Cancelled")
+        self.assertFalse(report.output_file)
+        self.assertEqual(os.listdir(os.path.join(self.media.name, "reports")), [])
+
+    def test_heartbeat_precedes_the_row_count(self):
+        report = Report.objects.create(report_type="Inventory Audit", format="CSV", user=self.user)
+        jobs.claim_jobs(5)
+        Report.objects.filter(pk=report.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        beats = []
+
+        def count_rows(job):
+            beats.append(Report.objects.get(pk=job.pk).heartbeat_at)
+            return 1
+
+        with mock.patch.object(jobs.reports, "count_rows", side_effect=count_rows):
+            jobs.run_job(report.pk)
+        self.assertGreater(beats[0], timezone.now() - timedelta(minutes=1))
+
+
+#  SKU / BARCODE ALLOCATION  +++++++++++++++++++++++++++++++++++++++
+class CodeAllocationTests(TestCase):
+    def test_ean13_check_digit(self):
+        self.assertEqual(codes.ean13_check_digit("400638133393"), "1")
+        self.assertTrue(codes.is_valid_ean13("4006381333931"))
+        self.assertFalse(codes.is_valid_ean13("4006381333932"))
+
+    def test_ranges_are_consecutive_per_prefix(self):
+        skus = codes.allocate_skus([("Fruit", "Apple"), ("Fruit", "Pear"), ("Fruit", "Apple")])
+        self.assertEqual(skus, ["FRU-APP-00001", "FRU-PEA-00001", "FRU-APP-00002"])
+        self.assertEqual(codes.allocate_skus([("Fruit", "Apple")]), ["FRU-APP-00003"])
+
+        first = codes.allocate_barcodes(500)
+        second = codes.allocate_barcodes(2)
+        self.assertEqual(len(set(first + second)), 502)
+        self.assertTrue(all(codes.is_valid_ean13(code) and code.startswith("200") for code in first + second))
+        self.assertEqual(second[0][:12], "200000000501")
+
+    def test_reserving_a_range_is_one_update_per_prefix(self):
+        codes.allocate_barcodes(1)
+        with CaptureQueriesContext(connection) as queries:
+            codes.allocate_barcodes(10000)
+        self.assertEqual(sum(query["sql"].startswith("UPDATE") for query in queries.captured_queries), 1)
+
+    def test_product_save_uses_allocator(self):
+        product = make_product(name="Widget")
+        self.assertEqual(product.sku, "GEN-WID-00001")
+        self.assertTrue(codes.is_valid_ean13(product.barcode))
+
+
+#  LOW STOCK ALERTS  +++++++++++++++++++++++++++++++++++++++
+class LowStockAlertTests(TestCase):
+    def setUp(self):
+        Warehouse.objects.create(name="Main", location="A")
+        self.product = make_product(name="Hot Item", low_stock_threshold=5)
+        self.user = User.objects.create_user(username="clerk", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _post(self, transaction_type, quantity):
+        Transaction.objects.create(
+            product=self.product, transaction_type=transaction_type, quantity=quantity, unit_price=Decimal("5")
+        )
+        self.product.refresh_from_db()
+
+    def test_alerts_only_on_crossings(self):
+        # A new product without stock starts flagged, with an open alert.
+        self.assertTrue(self.product.is_low_stock)
+        created = LowStockAlert.objects.get()
+        self.assertEqual((created.stock, created.status), (0, "Open"))
+        self._post("Purchase", 10)
+        self.assertFalse(self.product.is_low_stock)
+        self.assertFalse(LowStockAlert.objects.filter(status="Open").exists())
+
+        for _ in range(4):
+            self._post("Sale", 2)
+        self.assertTrue(self.product.is_low_stock)
+        alert = LowStockAlert.objects.get(status="Open")
+        self.assertEqual((alert.stock, alert.threshold, alert.status), (4, 5, "Open"))
+
+        self._post("Purchase", 10)
+        alert.refresh_from_db()
+        self.assertEqual(alert.status, "Resolved")
+        self.assertIsNotNone(alert.resolved_at)
+
+        Transaction.objects.bulk_post([
+            {"product": self.product.pk, "transaction_type": "Sale", "quantity": 3, "unit_price": Decimal("8")}
+            for _ in range(5)
+        ])
+        self.assertEqual(LowStockAlert.objects.filter(status="Open").count(), 1)
+
+    def test_threshold_change_and_endpoint(self):
+        self._post("Purchase", 6)
+        self.product.low_stock_threshold = 10
+        self.product.save()
+        self.assertTrue(Product.objects.get(pk=self.product.pk).is_low_stock)
+
+        response = self.client.get("/api/alerts/low-stock/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["product_name"] for row in response.data["results"]], ["Hot Item"])
+        self.assertEqual(response.data["results"][0]["current_stock"], 6)
+        # The alert opened when the product was created was resolved by the purchase.
+        self.assertEqual(self.client.get("/api/alerts/low-stock/", {"status": "Resolved"}).data["count"], 1)
+        self.assertEqual(self.client.get("/api/products/", {"low_stock": "1"}).data["count"], 1)
+
+    def test_stock_and_flag_are_read_only(self):
+        alerts = LowStockAlert.objects.count()
+        response = self.client.patch(
+            f"/api/products/{self.product.pk}/", {"stock": 500, "is_low_stock": False}, format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.is_low_stock), (0, True))
+        # A client-cleared flag would have looked like a fresh crossing.
+        self.assertEqual(LowStockAlert.objects.count(), alerts)
+
+
+#  SCAN LOOKUP  +++++++++++++++++++++++++++++++++++++++
+class ProductLookupTests(TestCase):
+    def setUp(self):
+        lookup.cache.clear()
+        self.addCleanup(lookup.cache.clear)
+        self.main = Warehouse.objects.create(name="Main", location="A")
+        self.product = make_product(name="Scanner", barcode="2000000000015")
+        Inventory.objects.create(product=self.product, warehouse=self.main, quantity=7)
+        self.user = User.objects.create_user(username="clerk", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_lookup_by_barcode_or_sku_in_one_query(self):
+        with self.assertNumQueries(1):
+            by_barcode = lookup.lookup("2000000000015")
+        self.assertEqual(by_barcode["warehouses"], [{"warehouse_id": self.main.pk, "warehouse": "Main", "quantity": 7}])
+        self.assertEqual(lookup.lookup(self.product.sku)["id"], self.product.pk)
+        with self.assertNumQueries(0):
+            lookup.lookup("2000000000015")
+
+        response = self.client.get("/api/products/lookup/", {"code": self.product.sku})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["stock"], 7)
+        self.assertEqual(self.client.get("/api/products/lookup/", {"code": "missing"}).status_code, 404)
+
+    def test_stock_movements_invalidate_on_commit(self):
+        lookup.lookup(self.product.barcode)
+        with self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.create(product=self.product, transaction_type="Sale", quantity=2, unit_price=Decimal("8"))
+        self.assertEqual(lookup.lookup(self.product.barcode)["warehouses"][0]["quantity"], 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.product_name = "Renamed"
+            self.product.save()
+        self.assertEqual(lookup.lookup(self.product.barcode)["product_name"], "Renamed")
+
+    def test_cache_is_bounded_lru(self):
+        cache = lookup.LookupCache(max_size=2, ttl=60)
+        cache.put("a", 1, {"id": 1}, cache.generation)
+        cache.put("b", 2, {"id": 2}, cache.generation)
+        cache.get("a")
+        cache.put("c", 3, {"id": 3}, cache.generation)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(len(cache), 2)
+
+        stale_read = cache.generation
+        cache.invalidate([1])
+        self.assertIsNone(cache.get("a"))
+        cache.put("a", 1, {"id": 1}, stale_read)
+        self.assertIsNone(cache.get("a"))
+
+
+#  PRODUCT IMPORT / EXPORT  +++++++++++++++++++++++++++++++++++++++
+class ProductImportExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="clerk", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _upload(self, name, body):
+        upload = SimpleUploadedFile(name, body.encode("utf-8"))
+        return self.client.post("/api/products/import/", {"file": upload}, format="multipart")
+
+    def test_csv_import_generates_codes_and_reports_bad_lines(self):
+        make_product(name="Existing", sku="GEN-EXI-0001")
+        body = (
+            "product_name,category,buying_price,selling_price,sku,low_stock_threshold\n"
+            "Apple,Fruit,1.00,2.00,,5\n"
+            "Pear,Fruit,1.00,0.50,,\n"
+            "Plum,Fruit,1.00,2.00,GEN-EXI-0001,\n"
+            "Kiwi,Fruit,abc,2.00,,\n"
+            "\"Grape, Red\",Fruit,1.00,2.00,FRU-GRA-0001,\n"
+        )
+        response = self._upload("catalog.csv", body)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual([error["line"] for error in response.data["errors"]], [3, 4, 5])
+
+        apple = Product.objects.get(product_name="Apple")
+        self.assertEqual(apple.sku, "FRU-APP-00001")
+        self.assertTrue(codes.is_valid_ean13(apple.barcode))
+        self.assertEqual(apple.stock, 0)
+        self.assertIn("stock is low", apple.low_stock_warning)
+        self.assertEqual(Product.objects.get(sku="FRU-GRA-0001").product_name, "Grape, Red")
+
+    def test_import_rejects_skus_in_generated_format(self):
+        # FRU-APP-00001 would also be the SKU generated for the first row.
+        body = (
+            "product_name,category,buying_price,selling_price,sku\n"
+            "Apple,Fruit,1.00,2.00,\n"
+            "Apricot,Fruit,1.00,2.00,fru-app-00001\n"
+        )
+        response = self._upload("catalog.csv", body)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["created"], 1)
+        self.assertEqual(response.data["errors"][0]["line"], 3)
+        self.assertIn("generated SKU format", response.data["errors"][0]["errors"][0])
+        self.assertEqual(Product.objects.get().sku, "FRU-APP-00001")
+
+    def test_jsonl_import_is_chunked(self):
+        lines = [
+            '{"product_name": "Item %d", "category": "Bulk", "buying_price": 1, "selling_price": 2}' % i
+            for i in range(25)
+        ]
+        upload = SimpleUploadedFile("catalog.jsonl", ("\n".join(lines) + "\nnot json\n").encode())
+        result = catalog.import_products(catalog.parse_rows(upload, "jsonl"), chunk_size=10)
+        self.assertEqual(result["created"], 25)
+        self.assertEqual(result["errors"], [{"line": 26, "errors": ["Row could not be parsed."]}])
+        self.assertEqual(Product.objects.filter(category__category_name="Bulk").values("sku").distinct().count(), 25)
+        # Imported products start without stock, so each has an open alert.
+        self.assertEqual(LowStockAlert.objects.filter(status="Open", product__category__category_name="Bulk").count(), 25)
+
+    def test_export_round_trips(self):
+        make_product(name="Cola", sku="GEN-COL-0001", barcode="123")
+        response = self.client.get("/api/products/export/")
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(","), catalog.EXPORT_FIELDS)
+        self.assertTrue(lines[1].startswith("GEN-COL-0001,123,Cola,General,5.00,8.00,"))
+
+        response = self.client.get("/api/products/export/", {"file_format": "jsonl"})
+        row = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(row["sku"], "GEN-COL-0001")
+        self.assertEqual(row["category"], "General")
+
+
+#  LOGGING  +++++++++++++++++++++++++++++++++++++++
+class StructuredLoggingTests(TestCase):
+    def _record(self, msg="stock low for %s", args=("Widget",), **extra):
+        record = logging.LogRecord("inventory.alerts", logging.WARNING, __file__, 1, msg, args, None)
+        record.__dict__.update(extra)
+        return record
+
+    def test_json_records_carry_extras(self):
+        entry = json.loads(log.JSONFormatter().format(self._record(product_id=7)))
+        self.assertEqual(entry["message"], "stock low for Widget")
+        self.assertEqual(entry["level"], "WARNING")
+        self.assertEqual(entry["product_id"], 7)
+
+    def test_rate_limit_reports_suppressed_count(self):
+        sampler = log.RateLimitFilter(rate=2, period=60)
+        passed = [sampler.filter(self._record()) for _ in range(5)]
+        self.assertEqual(passed, [True, True, False, False, False])
+
+        sampler._windows[("inventory.alerts", "stock low for %s")][0] -= 60
+        record = self._record()
+        self.assertTrue(sampler.filter(record))
+        self.assertEqual(record.suppressed, 3)
+
+    def test_background_handler_writes_off_thread(self):
+        stream = StringIO()
+        handler = log.BackgroundHandler(stream=stream)
+        handler.setFormatter(log.JSONFormatter())
+        handler.handle(self._record(product_id=1))
+        handler.close()
+        self.assertEqual(json.loads(stream.getvalue())["product_id"], 1)
+
+
+#  REQUEST METRICS  +++++++++++++++++++++++++++++++++++++++
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username="clerk", password="pw"))
+        make_product()
+
+    def test_requests_are_recorded_per_view(self):
+        self.client.get("/api/products/")
+        self.client.get("/api/products/")
+        body = self.client.get("/api/metrics/").content.decode()
+
+        self.assertIn('ims_http_requests_total{view="product-list",method="GET",status="200"} 2', body)
+        self.assertIn('ims_http_request_duration_seconds_count{view="product-list",method="GET"} 2', body)
+        self.assertIn('ims_http_db_queries_bucket{view="product-list",method="GET",le="+Inf"} 2', body)
+        self.assertIn('ims_http_response_size_bytes_count{view="product-list",method="GET"} 2', body)
+
+    def test_slow_requests_log_their_queries(self):
+        with self.settings(SLOW_REQUEST_SECONDS=0), self.assertLogs("inventory.metrics", "WARNING") as captured:
+            self.client.get("/api/products/")
+        record = captured.records[0]
+        self.assertEqual(record.view, "product-list")
+        self.assertEqual(record.db_queries, len(record.queries))
+        self.assertTrue(any("inventory_product" in sql for _, sql in record.queries))
+
+
+#  QUERY SCALING (N+1 DETECTOR)  +++++++++++++++++++++++++++++++++++++++
+def inventory_routes():
+    """Yield ``(name, url_pattern)`` for every named route in inventory/urls.py (format suffixes skipped)."""
+    from . import urls
+
+    def walk(patterns):
+        for entry in patterns:
+            if isinstance(entry, URLResolver):
+                yield from walk(entry.url_patterns)
+            elif entry.name and "format" not in entry.pattern.regex.groupindex:
+                yield entry
+
+    seen = set()
+    for entry in walk(urls.urlpatterns):
+        if entry.name not in seen:
+            seen.add(entry.name)
+            yield entry.name, entry
+
+
+def sql_shape(sql):
+    """A statement with its literals blanked out, so repeats of one query group together."""
+    return re.sub(r"'[^']*'|\b\d+(\.\d+)?\b", "?", sql)
+
+
+class QueryScalingTests(TestCase):
+    """
+    GET every inventory route with a small and a larger data set (both below
+    one page) and fail if any route's query count grows with the row count.
+    """
+    SMALL = 3
+    LARGE = 15
+
+    # Routes whose views build their queryset in code rather than declaring one.
+    PK_MODELS = {"report-cancel": Report, "report-download": Report}
+
+    def setUp(self):
+        self.main = Warehouse.objects.create(name="Main", location="A")
+        self.backup = Warehouse.objects.create(name="Backup", location="B")
+        self.user = User.objects.create_user(username="auditor", password="pw", is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        lookup.cache.clear()
+        self.addCleanup(lookup.cache.clear)
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = self.settings(MEDIA_ROOT=self.media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def _seed(self, count):
+        for _ in range(count):
+            n = Product.objects.count()
+            category = Category.objects.create(category_name=f"Category {n}")
+            supplier = Supplier.objects.create(supplier_name=f"Supplier {n}", phone_number=f"555{n:05d}",
+                                               email=f"supplier{n}@example.com")
+            product = Product.objects.create(
+                product_name=f"Item {n}", category=category, supplier=supplier, low_stock_threshold=5,
+                buying_price=Decimal("5.00"), selling_price=Decimal("8.00"),
+            )
+            Transaction.objects.bulk_post([
+                {"product": product, "transaction_type": "Purchase", "quantity": 10, "unit_price": Decimal("5"),
+                 "batch_number": f"LOT-{n}"},
+                {"product": product, "transaction_type": "Sale", "quantity": 6, "unit_price": Decimal("8")},
+                {"product": product, "transaction_type": "Transfer", "quantity": 1, "unit_price": Decimal("5"),
+                 "from_warehouse": self.main, "to_warehouse": self.backup},
+            ], user=self.user)
+            Report.objects.create(report_type="Stock Report", format="CSV", user=self.user)
+            User.objects.create_user(username=f"clerk{n}", password="pw")
+        stock.refresh_sales_records()  # What the background dashboard rebuild does.
+
+    def _url(self, name, entry):
+        params = set(entry.pattern.regex.groupindex)
+        if not params:
+            return reverse(name)
+        view_class = getattr(entry.callback, "cls", None) or getattr(entry.callback, "view_class", None)
+        queryset = getattr(view_class, "queryset", None)
+        model = self.PK_MODELS.get(name) or (queryset.model if queryset is not None else None)
+        self.assertIsNotNone(model, f"Add route {name} to PK_MODELS.")
+        return reverse(name, kwargs={"pk": model.objects.order_by("pk").first().pk})
+
+    def _measure(self):
+        """{route name: (status, [sql, ...])} for one GET of every route, after a warm-up GET."""
+        results = {}
+        for name, entry in inventory_routes():
+            url = self._url(name, entry)
+            for attempt in range(2):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                    if response.streaming:
+                        b"".join(response.streaming_content)
+            self.assertLess(response.status_code, 500, f"GET {url} failed")
+            results[name] = (response.status_code, [query["sql"] for query in queries.captured_queries])
+        return results
+
+    def test_query_counts_do_not_grow_with_rows(self):
+        self._seed(self.SMALL)
+        small = self._measure()
+        self._seed(self.LARGE - self.SMALL)
+        large = self._measure()
+
+        problems = []
+        for name, (status_code, statements) in sorted(large.items()):
+            before = small[name][1]
+            if len(statements) == len(before):
+                continue
+            growth = Counter(map(sql_shape, statements)) - Counter(map(sql_shape, before))
+            details = "\n".join(f"      +{extra}x {shape[:300]}" for shape, extra in growth.most_common(3))
+            problems.append(f"  {name} (HTTP {status_code}): {len(before)} -> {len(statements)} queries\n{details}")
+        self.assertFalse(problems, "Query count grows with row count:\n" + "\n".join(problems))
+
+
+#  TOKEN AUTHENTICATION CACHE  +++++++++++++++++++++++++++++++++++++++
+class CachedTokenAuthTests(TestCase):
+    def setUp(self):
+        auth.cache.clear()
+        self.addCleanup(auth.cache.clear)
+        self.user = User.objects.create_user(username="scanner", password="pw")
+        self.client = APIClient()
+
+    def login(self):
+        self.client.credentials()
+        response = self.client.post("/api/login/", {"username": "scanner", "password": "pw"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {response.json()['token']}")
+        return response.json()["token"]
+
+    def test_repeat_requests_skip_the_token_query(self):
+        self.login()
+        self.assertEqual(self.client.get("/api/user-profile/").status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/user-profile/")
+        self.assertEqual(response.json()["username"], "scanner")
+
+    def test_logout_revokes_the_cached_token(self):
+        self.login()
+        self.assertEqual(self.client.get("/api/user-profile/").status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post("/api/logout/").status_code, 200)
+        self.assertEqual(self.client.get("/api/user-profile/").status_code, 401)
+
+    def test_deactivating_the_user_revokes_the_cached_token(self):
+        self.login()
+        self.assertEqual(self.client.get("/api/user-profile/").status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        response = self.client.get("/api/user-profile/")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()["detail"], "User inactive or deleted.")
+
+    def test_expired_tokens_are_rejected_and_replaced_on_login(self):
+        key = self.login()
+        self.assertEqual(self.client.get("/api/user-profile/").status_code, 200)
+        Token.objects.filter(key=key).update(created=timezone.now() - timedelta(hours=2))
+        auth.cache.clear()
+        with self.settings(TOKEN_EXPIRY_SECONDS=3600):
+            response = self.client.get("/api/user-profile/")
+            self.assertEqual(response.status_code, 401)
+            self.assertEqual(response.json()["detail"], "Token has expired.")
+            self.assertFalse(Token.objects.filter(key=key).exists())
+
+            new_key = self.login()
+        self.assertNotEqual(new_key, key)
+        self.assertEqual(self.client.get("/api/user-profile/").status_code, 200)
+
+
+#  WAREHOUSE ALLOCATION  +++++++++++++++++++++++++++++++++++++++
+class WarehouseAllocationTests(TestCase):
+    def setUp(self):
+        self.main = Warehouse.objects.create(name="Main", location="A")
+        self.backup = Warehouse.objects.create(name="Backup", location="B")
+        self.product = make_product()
+
+    def stock(self, **quantities):
+        Transaction.objects.bulk_post([
+            {"product": self.product, "transaction_type": "Purchase", "quantity": quantity,
+             "unit_price": Decimal("5"), "warehouse": getattr(self, name)}
+            for name, quantity in quantities.items()
+        ])
+
+    def quantities(self):
+        return dict(Inventory.objects.filter(product=self.product).values_list("warehouse__name", "quantity"))
+
+    def test_candidates_load_in_one_query(self):
+        self.stock(backup=4)
+        with self.assertNumQueries(1):
+            candidates = allocation.load_candidates([self.product.pk])[self.product.pk]
+        self.assertEqual(
+            [(c["warehouse_id"], c["quantity"]) for c in candidates], [(self.main.pk, 0), (self.backup.pk, 4)],
+        )
+
+    def test_explicit_warehouse_is_used(self):
+        self.stock(main=5, backup=5)
+        txn = Transaction.objects.create(
+            product=self.product, transaction_type="Sale", quantity=2, unit_price=Decimal("8"), warehouse=self.backup,
+        )
+        self.assertEqual(txn.warehouse, self.backup)
+        self.assertEqual(self.quantities(), {"Main": 5, "Backup": 3})
+
+    def test_sale_comes_from_the_first_warehouse_that_can_cover_it(self):
+        self.stock(main=2, backup=5)
+        txn = Transaction.objects.create(product=self.product, transaction_type="Sale", quantity=4, unit_price=Decimal("8"))
+        self.assertEqual(txn.warehouse, self.backup)
+        self.assertEqual(self.quantities(), {"Main": 2, "Backup": 1})
+
+    def test_most_stock_strategy(self):
+        self.stock(main=3, backup=6)
+        with self.settings(STOCK_ALLOCATION_STRATEGY="most_stock"):
+            txn = Transaction.objects.create(product=self.product, transaction_type="Sale", quantity=1, unit_price=Decimal("8"))
+        self.assertEqual(txn.warehouse, self.backup)
+
+    def test_fifo_strategy_prefers_the_oldest_batch(self):
+        self.stock(main=3, backup=3)
+        Inventory.objects.filter(warehouse=self.main).update(batch_number="B-002")
+        Inventory.objects.filter(warehouse=self.backup).update(batch_number="B-001")
+        with self.settings(STOCK_ALLOCATION_STRATEGY="fifo"):
+            txn = Transaction.objects.create(product=self.product, transaction_type="Sale", quantity=1, unit_price=Decimal("8"))
+        self.assertEqual(txn.warehouse, self.backup)
+
+    def test_round_robin_strategy_rotates(self):
+        with self.settings(STOCK_ALLOCATION_STRATEGY="round_robin"):
+            posted, errors = Transaction.objects.bulk_post([
+                {"product": self.product, "transaction_type": "Purchase", "quantity": 1, "unit_price": Decimal("5")}
+                for _ in range(4)
+            ])
+        self.assertEqual(errors, [])
+        self.assertEqual(self.quantities(), {"Main": 2, "Backup": 2})
+
+    def test_bulk_sale_is_split_across_warehouses(self):
+        self.stock(main=3, backup=4)
+        posted, errors = Transaction.objects.bulk_post([
+            {"product": self.product, "transaction_type": "Sale", "quantity": 6, "unit_price": Decimal("8")},
+        ])
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted((t.warehouse_id, t.quantity) for t in posted), [(self.main.pk, 3), (self.backup.pk, 3)])
+        self.assertEqual(self.quantities(), {"Main": 0, "Backup": 1})
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 1)
+
+    def test_split_can_be_turned_off(self):
+        self.stock(main=3, backup=4)
+        with self.settings(STOCK_ALLOCATION_SPLIT=False):
+            posted, errors = Transaction.objects.bulk_post([
+                {"product": self.product, "transaction_type": "Sale", "quantity": 6, "unit_price": Decimal("8")},
+            ])
+        self.assertEqual(posted, [])
+        self.assertEqual(errors, [{"index": 0, "errors": ["Not enough stock in any warehouse for this transaction."]}])
+        self.assertEqual(self.quantities(), {"Main": 3, "Backup": 4})
+
+
+#  STOCK LOTS  +++++++++++++++++++++++++++++++++++++++
+class StockLotTests(TestCase):
+    def setUp(self):
+        self.main = Warehouse.objects.create(name="Main", location="A")
+        self.backup = Warehouse.objects.create(name="Backup", location="B")
+        self.product = make_product(expiration_date=localdate() + timedelta(days=90))
+        self.today = localdate()
+
+    def receive(self, batch, quantity, expires_in=None, warehouse=None):
+        posted, errors = Transaction.objects.bulk_post([{
+            "product": self.product, "transaction_type": "Purchase", "quantity": quantity, "unit_price": Decimal("5"),
+            "batch_number": batch, "warehouse": warehouse or self.main,
+            "expiry_date": None if expires_in is None else self.today + timedelta(days=expires_in),
+        }])
+        self.assertEqual(errors, [])
+
+    def lots(self):
+        return dict(StockLot.objects.filter(product=self.product, warehouse=self.main).values_list("batch_number", "quantity"))
+
+    def test_receipts_open_lots_with_expiry(self):
+        self.receive("A", 5, expires_in=10)
+        self.receive("A", 3, expires_in=20)
+        self.receive("B", 4)
+        lots_by_batch = {lot.batch_number: lot for lot in StockLot.objects.all()}
+        self.assertEqual(lots_by_batch["A"].quantity, 8)
+        self.assertEqual(lots_by_batch["A"].expiry_date, self.today + timedelta(days=10))
+        self.assertEqual(lots_by_batch["B"].expiry_date, self.product.expiration_date)
+
+    def test_sales_pick_the_first_expiring_lots(self):
+        self.receive("LATE", 5, expires_in=30)
+        self.receive("SOON", 3, expires_in=5)
+        Transaction.objects.create(product=self.product, transaction_type="Sale", quantity=4, unit_price=Decimal("8"))
+        self.assertEqual(self.lots(), {"LATE": 4, "SOON": 0})
+
+    def test_sales_skip_expired_lots_and_use_untracked_stock_last(self):
+        self.receive("OLD", 2, expires_in=-1)
+        self.receive("NEW", 2, expires_in=10)
+        Transaction.objects.bulk_post([
+            {"product": self.product, "transaction_type": "Purchase", "quantity": 3, "unit_price": Decimal("5")},
+        ])
+        posted, errors = Transaction.objects.bulk_post([
+            {"product": self.product, "transaction_type": "Sale", "quantity": 4, "unit_price": Decimal("8")},
+            {"product": self.product, "transaction_type": "Sale", "quantity": 2, "unit_price": Decimal("8")},
+        ])
+        self.assertEqual(len(posted), 1)
+        self.assertEqual(errors, [{"index": 1, "errors": ["Not enough unexpired stock in the warehouse for this transaction."]}])
+        self.assertEqual(self.lots(), {"OLD": 2, "NEW": 0})
+        self.assertEqual(Inventory.objects.get(product=self.product, warehouse=self.main).quantity, 3)
+
+    def test_named_batch_is_taken_from_that_lot(self):
+        self.receive("A", 5, expires_in=5)
+        self.receive("B", 5, expires_in=10)
+        posted, errors = Transaction.objects.bulk_post([
+            {"product": self.product, "transaction_type": "Sale", "quantity": 2, "unit_price": Decimal("8"),
+             "batch_number": "B"},
+            {"product": self.product, "transaction_type": "Sale", "quantity": 7, "unit_price": Decimal("8"),
+             "batch_number": "A"},
+        ])
+        self.assertEqual(errors, [{"index": 1, "errors": ["Batch A has only 5 in stock."]}])
+        self.assertEqual(self.lots(), {"A": 5, "B": 3})
+
+    def test_unknown_batch_is_rejected_instead_of_picked_by_expiry(self):
+        self.receive("A", 5, expires_in=5)
+        self.receive("B", 5, expires_in=10, warehouse=self.backup)
+        posted, errors = Transaction.objects.bulk_post([
+            {"product": self.product, "transaction_type": "Sale", "quantity": 1, "unit_price": Decimal("8"),
+             "batch_number": batch, "warehouse": self.main}
+            for batch in ("TYPO", "B")
+        ])
+        self.assertEqual(posted, [])
+        self.assertEqual([error["errors"] for error in errors], [
+            ["Batch TYPO is not stocked in this warehouse."], ["Batch B is not stocked in this warehouse."],
+        ])
+        self.assertEqual(self.lots(), {"A": 5})
+
+    def test_transfers_carry_lots_to_the_destination(self):
+        self.receive("A", 5, expires_in=5)
+        Transaction.objects.create(
+            product=self.product, transaction_type="Transfer", quantity=2, unit_price=Decimal("5"),
+            from_warehouse=self.main, to_warehouse=self.backup,
+        )
+        moved = StockLot.objects.get(warehouse=self.backup)
+        self.assertEqual((moved.batch_number, moved.quantity), ("A", 2))
+        self.assertEqual(moved.expiry_date, self.today + timedelta(days=5))
+        self.assertEqual(self.lots(), {"A": 3})
+
+    def test_expiring_before_lists_lots_with_stock_soonest_first(self):
+        self.receive("LATE", 1, expires_in=20)
+        self.receive("SOON", 1, expires_in=3)
+        self.receive("EMPTY", 1, expires_in=1)
+        Transaction.objects.create(
+            product=self.product, transaction_type="Sale", quantity=1, unit_price=Decimal("8"), batch_number="EMPTY",
+        )
+        cutoff = self.today + timedelta(days=30)
+        self.assertEqual(
+            list(StockLot.objects.expiring_before(cutoff).values_list("batch_number", flat=True)), ["SOON", "LATE"],
+        )
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username="picker", password="pw"))
+        response = client.get("/api/lots/", {"expiring_before": (self.today + timedelta(days=10)).isoformat()})
+        self.assertEqual([lot["batch_number"] for lot in response.json()["results"]], ["SOON"])
+
+    def test_expire_lots_writes_off_lapsed_lots_in_one_pass(self):
+        self.receive("GONE", 4, expires_in=-2)
+        self.receive("GONE2", 1, expires_in=-1, warehouse=self.backup)
+        self.receive("FRESH", 3, expires_in=5)
+        out = StringIO()
+        call_command("expire_lots", stdout=out)
+        self.assertIn("Wrote off 2 lapsed lot(s).", out.getvalue())
+
+        expired = Transaction.objects.filter(transaction_type="Expired").order_by("batch_number")
+        self.assertEqual(
+            [(t.batch_number, t.quantity, t.warehouse_id) for t in expired],
+            [("GONE", 4, self.main.pk), ("GONE2", 1, self.backup.pk)],
+        )
+        self.assertEqual(self.lots(), {"GONE": 0, "FRESH": 3})
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 3)
+        self.assertEqual(lots.expired_lot_rows(), [])
+
+
+#  STOCK LEDGER  +++++++++++++++++++++++++++++++++++++++
+class StockLedgerTests(TestCase):
+    def setUp(self):
+        self.main = Warehouse.objects.create(name="Main", location="A")
+        self.backup = Warehouse.objects.create(name="Backup", location="B")
+        self.product = make_product()
+        self.start = timezone.now() - timedelta(days=10)
+
+    def post(self, transaction_type, quantity, days, **extra):
+        """Post a transaction and date its movements ``days`` after self.start."""
+        txn = Transaction.objects.create(
+            product=self.product, transaction_type=transaction_type, quantity=quantity, unit_price=Decimal("5"), **extra,
+        )
+        StockMovement.objects.filter(transaction=txn).update(occurred_at=self.start + timedelta(days=days))
+        return txn
+
+    def history(self):
+        self.post("Purchase", 10, 1, warehouse=self.main)
+        self.post("Sale", 3, 2, warehouse=self.main)
+        self.post("Transfer", 4, 3, from_warehouse=self.main, to_warehouse=self.backup)
+        self.post("Purchase", 5, 5, warehouse=self.backup)
+
+    def at(self, days):
+        return self.start + timedelta(days=days, hours=12)
+
+    def test_postings_and_adjustments_write_movements(self):
+        self.history()
+        self.assertEqual(
+            list(StockMovement.objects.order_by("pk").values_list("reason", "warehouse__name", "delta")),
+            [("Purchase", "Main", 10), ("Sale", "Main", -3), ("Transfer", "Main", -4), ("Transfer", "Backup", 4),
+             ("Purchase", "Backup", 5)],
+        )
+        inventory = Inventory.objects.get(product=self.product, warehouse=self.backup)
+        inventory.quantity = 7
+        inventory.save()
+        inventory.delete()
+        self.assertEqual(
+            list(StockMovement.objects.filter(reason="Adjustment").order_by("pk").values_list("delta", flat=True)),
+            [-2, -7],
+        )
+        # Ledger totals still match the live inventory.
+        for row in Inventory.objects.filter(product=self.product):
+            total = StockMovement.objects.filter(product=self.product, warehouse=row.warehouse).aggregate(t=Sum("delta"))["t"]
+            self.assertEqual(total, row.quantity)
+
+        movement = StockMovement.objects.first()
+        movement.delta = 99
+        with self.assertRaises(ValidationError):
+            movement.save()
+
+    def test_stock_as_of_replays_history(self):
+        self.history()
+        self.assertEqual(ledger.stock_as_of(self.product.pk, self.at(0)), {})
+        self.assertEqual(ledger.stock_as_of(self.product.pk, self.at(2)), {self.main.pk: 7})
+        self.assertEqual(ledger.stock_as_of(self.product.pk, self.at(3)), {self.main.pk: 3, self.backup.pk: 4})
+        self.assertEqual(ledger.stock_as_of(self.product.pk, warehouse_ids=[self.backup.pk]), {self.backup.pk: 9})
+
+    def test_snapshots_give_the_same_answers_and_bound_the_replay(self):
+        self.history()
+        expected = {days: ledger.stock_as_of(self.product.pk, self.at(days)) for days in range(7)}
+
+        self.assertEqual(ledger.take_snapshots(cutoff=self.at(2)), 1)
+        self.assertEqual(ledger.take_snapshots(cutoff=self.at(4)), 2)
+        self.assertEqual(ledger.take_snapshots(cutoff=self.at(4)), 0)
+        self.assertEqual(
+            dict(StockSnapshot.objects.filter(taken_at=self.at(4)).values_list("warehouse__name", "quantity")),
+            {"Main": 3, "Backup": 4},
+        )
+
+        # Movements already folded into a snapshot are not read again.
+        StockMovement.objects.filter(occurred_at__lte=self.at(4)).update(delta=1000)
+        for days in (5, 6):
+            with self.assertNumQueries(2):
+                self.assertEqual(ledger.stock_as_of(self.product.pk, self.at(days)), expected[days])
+
+    def test_stock_as_of_endpoint(self):
+        self.history()
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username="auditor", password="pw"))
+        day = (self.start + timedelta(days=3)).date().isoformat()
+        response = client.get(f"/api/products/{self.product.pk}/stock-as-of/", {"at": day})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["total"], 7)
+        self.assertEqual(
+            response.json()["warehouses"],
+            [{"warehouse": self.main.pk, "quantity": 3}, {"warehouse": self.backup.pk, "quantity": 4}],
+        )
+        response = client.get(f"/api/products/{self.product.pk}/stock-as-of/", {"at": "yesterday"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_snapshot_stock_command(self):
+        self.history()
+        out = StringIO()
+        call_command("snapshot_stock", stdout=out)
+        self.assertIn("Wrote 2 stock snapshot(s).", out.getvalue())
+
+
+#  IDEMPOTENCY KEYS  +++++++++++++++++++++++++++++++++++++++
+class IdempotentPostingTests(TestCase):
+    def setUp(self):
+        Warehouse.objects.create(name="Main", location="A")
+        self.product = make_product()
+        Transaction.objects.bulk_post([
+            {"product": self.product, "transaction_type": "Purchase", "quantity": 10, "unit_price": Decimal("5")},
+        ])
+        self.user = User.objects.create_user(username="till", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.sale = {"product": self.product.pk, "transaction_type": "Sale", "quantity": 3, "unit_price": "8.00"}
+
+    def stock(self):
+        self.product.refresh_from_db()
+        return self.product.stock
+
+    def test_retried_create_replays_without_posting_again(self):
+        first = self.client.post("/api/transactions/", self.sale, format="json", HTTP_IDEMPOTENCY_KEY="sale-1")
+        self.assertEqual(first.status_code, 201)
+        with self.assertNumQueries(1):
+            retry = self.client.post("/api/transactions/", self.sale, format="json", HTTP_IDEMPOTENCY_KEY="sale-1")
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Transaction.objects.filter(transaction_type="Sale").count(), 1)
+        self.assertEqual(self.stock(), 7)
+        self.assertEqual(SalesRollup.objects.get(product=self.product, granularity="month").quantity_sold, 3)
+
+    def test_keys_are_per_user_and_reuse_with_another_body_is_rejected(self):
+        self.client.post("/api/transactions/", self.sale, format="json", HTTP_IDEMPOTENCY_KEY="sale-1")
+        changed = self.client.post(
+            "/api/transactions/", {**self.sale, "quantity": 4}, format="json", HTTP_IDEMPOTENCY_KEY="sale-1",
+        )
+        self.assertEqual(changed.status_code, 422)
+
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username="till2", password="pw"))
+        response = other.post("/api/transactions/", self.sale, format="json", HTTP_IDEMPOTENCY_KEY="sale-1")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.stock(), 4)
+
+    def test_failed_requests_do_not_keep_the_key(self):
+        response = self.client.post(
+            "/api/transactions/bulk/", {"idempotency_key": "bulk-1", "transactions": [{**self.sale, "quantity": 50}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        Transaction.objects.bulk_post([
+            {"product": self.product, "transaction_type": "Purchase", "quantity": 50, "unit_price": Decimal("5")},
+        ])
+        response = self.client.post(
+            "/api/transactions/bulk/", {"idempotency_key": "bulk-1", "transactions": [{**self.sale, "quantity": 50}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.stock(), 10)
+
+    def test_bulk_retry_with_header_replays(self):
+        payload = [self.sale, self.sale]
+        first = self.client.post("/api/transactions/bulk/", payload, format="json", HTTP_IDEMPOTENCY_KEY="bulk-2")
+        retry = self.client.post("/api/transactions/bulk/", payload, format="json", HTTP_IDEMPOTENCY_KEY="bulk-2")
+        self.assertEqual((first.status_code, retry.status_code), (201, 201))
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(self.stock(), 4)
+
+    def test_purge_idempotency_keys(self):
+        self.client.post("/api/transactions/", self.sale, format="json", HTTP_IDEMPOTENCY_KEY="old")
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(hours=48))
+        out = StringIO()
+        call_command("purge_idempotency_keys", stdout=out)
+        self.assertIn("Deleted 1 idempotency key(s).", out.getvalue())
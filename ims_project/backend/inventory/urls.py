@@ -14,11 +14,14 @@ from .views import (
     InventoryViewSet,
     WarehouseViewSet,
     TransactionViewSet,
+    StockLotViewSet,
     UserListView  # If needed
 )
 
+from .metrics import metrics_view
+
 # Import other views separately
-from .views import dashboard_stats, ReportCreateView, login_user, logout_user
+from .views import dashboard_stats, LowStockAlertListView, ReportCreateView, ReportDetailView, ReportCancelView, ReportDownloadView, login_user, logout_user
 
 router = DefaultRouter()
 router.register(r'categories', CategoryViewSet)
@@ -28,6 +31,7 @@ router.register(r"inventory", InventoryViewSet, basename="inventory")
 router.register(r'sales', SalesRecordViewSet)
 router.register(r'suppliers', SupplierViewSet)
 router.register(r'transactions', TransactionViewSet)
+router.register(r'lots', StockLotViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -37,7 +41,12 @@ urlpatterns = [
     path("register/", register_user, name="register_user"),
     path('api/users/', UserListView.as_view(), name='user-list'),
     path('dashboard/', dashboard_stats, name='dashboard-stats'),
+    path('metrics/', metrics_view, name='metrics'),
+    path('alerts/low-stock/', LowStockAlertListView.as_view(), name='low-stock-alerts'),
     path('reports/', ReportCreateView.as_view(), name='report-create'),
+    path('reports/<int:pk>/', ReportDetailView.as_view(), name='report-detail'),
+    path('reports/<int:pk>/cancel/', ReportCancelView.as_view(), name='report-cancel'),
+    path('reports/<int:pk>/download/', ReportDownloadView.as_view(), name='report-download'),
 ]
 
 if settings.DEBUG:
@@ -1,8 +1,13 @@
-from django.http import JsonResponse
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth import get_user_model
 import json
-from django.db.models import Sum
+import logging
+import os
+from django.db.models import ProtectedError, Sum
+from django.conf import settings
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.timezone import is_naive, make_aware, now
 from django.shortcuts import render
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
@@ -20,15 +25,25 @@ from rest_framework.permissions import IsAuthenticated  # ✅ Import DRF authent
 from rest_framework.authtoken.models import Token
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework import generics
-from .models import Category, Product, SalesRecord, Supplier, Inventory, Warehouse , Transaction, User, Report 
+from rest_framework.filters import SearchFilter
+from . import catalog, dashboard, idempotency, jobs, ledger, lookup, reports
+from .auth import issue_token
+from . import filters
+from .filters import KeysetOrderingFilter, QueryParamFilter
+from .pagination import TransactionCursorPagination
+from .models import Category, Product, SalesRecord, Supplier, Inventory, Warehouse , Transaction, User, Report, SalesRollup, LowStockAlert, StockLot
 from .serializers import (
     CategorySerializer, ProductSerializer, SalesRecordSerializer, SupplierSerializer,
-    InventorySerializer, WarehouseSerializer, TransactionSerializer, ReportSerializer 
+    InventorySerializer, WarehouseSerializer, TransactionSerializer, ReportSerializer,
+    BulkTransactionRowSerializer, SalesRollupSerializer, LowStockAlertSerializer, UserSerializer,
+    StockLotSerializer,
     )
 
 
 User = get_user_model()
 
+logger = logging.getLogger(__name__)
+
 #  USER PROFILE VIEW  +++++++++++++++++++++++++++++++++++++++
 @api_view(["GET", "PUT"])  # Allow both GET and PUT methods
 @permission_classes([IsAuthenticated])
@@ -110,7 +125,7 @@ def login_user(request):
         password = data.get("password")
         user = authenticate(username=username, password=password)
         if user:
-            token, created = Token.objects.get_or_create(user=user)
+            token = issue_token(user)
             return JsonResponse({
                 "message": "Login successful",
                 "token": token.key,
@@ -134,37 +149,39 @@ def logout_user(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def dashboard_stats(request):
-    # 1. Available inventory: sum of all Product.stock values.
-    available_inventory = Product.objects.aggregate(total=Sum('stock'))['total'] or 0
-
-    # 2. Aggregate SalesRecord fields.
-    sales_agg = SalesRecord.objects.aggregate(
-        total_sale_amount=Sum('total_sale_amount'),
-        total_purchase_amount=Sum('total_purchase_amount'),
-        total_quantity_purchased=Sum('total_quantity_purchased'),
-        total_quantity_sold=Sum('total_quantity_sold')
-    )
-    total_sale_amount = sales_agg.get('total_sale_amount') or 0
-    total_purchase_amount = sales_agg.get('total_purchase_amount') or 0
-    total_inventory_purchased = sales_agg.get('total_quantity_purchased') or 0
-    total_inventory_sold = sales_agg.get('total_quantity_sold') or 0
-
-    # 3. Calculate profit/loss using per-transaction logic.
-    transactions = Transaction.objects.filter(transaction_type__in=["Sale", "Damaged", "Expired"])
-    total_profit = 0
-    for txn in transactions:
-        if txn.transaction_type == "Sale":
-            # Profit = (sale unit price - buying price) * quantity sold.
-            total_profit += (txn.unit_price - txn.product.buying_price) * txn.quantity
-        elif txn.transaction_type in ["Damaged", "Expired"]:
-            # Loss due to damage/expiration: cost of items lost.
-            total_profit -= txn.product.buying_price * txn.quantity
+    """
+    Dashboard totals are served from the stored snapshot, which posted
+    transactions keep current and a background job rebuilds when it gets
+    old. ?fresh=1 rebuilds it first; ?start_date= and
+    ?end_date= (YYYY-MM-DD) compute profit/loss live for that range.
+    """
+    start_param = request.query_params.get("start_date")
+    end_param = request.query_params.get("end_date")
+    try:
+        start_date = parse_date(start_param) if start_param else None
+        end_date = parse_date(end_param) if end_param else None
+    except ValueError:
+        start_date = end_date = None
+    if (start_param and not start_date) or (end_param and not end_date):
+        return Response({"error": "Dates must be in YYYY-MM-DD format."}, status=status.HTTP_400_BAD_REQUEST)
+
+    # 1-2. Available inventory and SalesRecord totals.
+    snapshot = dashboard.get_snapshot(fresh=request.query_params.get("fresh") in ("1", "true"))
+
+    # 3. Profit/loss.
+    if start_date or end_date:
+        total_profit = dashboard.profit_total(start_date, end_date)
+    else:
+        total_profit = snapshot.net_profit
 
     profit_display = total_profit if total_profit >= 0 else 0
     loss_display = abs(total_profit) if total_profit < 0 else 0
 
     # 4. Recent transactions (last 10).
-    recent_transactions_qs = Transaction.objects.order_by('-transaction_date')[:10]
+    recent_transactions_qs = (
+        Transaction.objects.select_related('product', 'from_warehouse', 'to_warehouse')
+        .order_by('-transaction_date')[:10]
+    )
     recent_transactions = TransactionSerializer(recent_transactions_qs, many=True).data
 
     # 5. Recent reports (last 6).
@@ -175,11 +192,12 @@ def dashboard_stats(request):
     ]
 
     data = {
-        "available_inventory": available_inventory,
-        "total_sale_amount": total_sale_amount,
-        "total_purchase_amount": total_purchase_amount,
-        "total_inventory_purchased": total_inventory_purchased,
-        "total_inventory_sold": total_inventory_sold,
+        "available_inventory": snapshot.available_inventory,
+        "total_sale_amount": snapshot.total_sale_amount,
+        "total_purchase_amount": snapshot.total_purchase_amount,
+        "total_inventory_purchased": snapshot.total_inventory_purchased,
+        "total_inventory_sold": snapshot.total_inventory_sold,
+        "snapshot_updated": snapshot.updated_at,
         "profit": round(profit_display, 2),
         "loss": round(loss_display, 2),
         "recent_transactions": recent_transactions,
@@ -208,6 +226,17 @@ class ProductViewSet(viewsets.ModelViewSet):
     queryset = Product.objects.all().order_by("-date_updated")
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticated]
+    filter_backends = [QueryParamFilter, SearchFilter, KeysetOrderingFilter]
+    filter_params = {
+        "category": ("category_id", filters.integer),
+        "supplier": ("supplier_id", filters.integer),
+        "warehouse": (filters.product_in_warehouse, filters.integer),
+        "low_stock": (filters.product_low_stock, filters.boolean),
+        "min_price": ("selling_price__gte", filters.decimal),
+        "max_price": ("selling_price__lte", filters.decimal),
+    }
+    search_fields = ["@product_name", "^sku", "^barcode", "@supplier__supplier_name"]
+    ordering_fields = ["product_name", "sku", "selling_price", "buying_price", "stock", "date_created", "date_updated"]
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -220,7 +249,7 @@ class ProductViewSet(viewsets.ModelViewSet):
             "warning": product.low_stock_warning if product.low_stock_warning else None,
         }
 
-        print("API Response (Create):", response_data)  # ✅ Debugging
+        logger.info("product created", extra={"product_id": product.pk, "sku": product.sku})
         return Response(response_data, status=status.HTTP_201_CREATED)
 
     def update(self, request, *args, **kwargs):
@@ -235,15 +264,109 @@ class ProductViewSet(viewsets.ModelViewSet):
             "warning": product.low_stock_warning if product.low_stock_warning else None,
         }
 
-        print("API Response (Update):", response_data)  # ✅ Debugging
+        logger.info("product updated", extra={"product_id": product.pk, "fields": sorted(request.data)})
         return Response(response_data, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=["get"], url_path="stock-as-of")
+    def stock_as_of(self, request, pk=None):
+        """
+        Stock per warehouse at ?at= (YYYY-MM-DD for the end of that day, or an
+        ISO datetime; default now), replayed from the movement ledger.
+        ?warehouse= limits it to one warehouse.
+        """
+        product = self.get_object()
+        raw_at = request.query_params.get("at", "").strip()
+        raw_warehouse = request.query_params.get("warehouse", "").strip()
+        try:
+            if not raw_at:
+                moment = now()
+            elif len(raw_at) == 10:
+                moment = filters.day_end(raw_at)
+            else:
+                moment = parse_datetime(raw_at)
+                if moment is None:
+                    raise ValueError
+                if settings.USE_TZ and is_naive(moment):
+                    moment = make_aware(moment)
+        except ValueError:
+            return Response({"error": "at must be a YYYY-MM-DD date or an ISO datetime."}, status=status.HTTP_400_BAD_REQUEST)
+        if raw_warehouse and not raw_warehouse.isdigit():
+            return Response({"error": "warehouse must be a whole number."}, status=status.HTTP_400_BAD_REQUEST)
+
+        quantities = ledger.stock_as_of(product.pk, moment, [int(raw_warehouse)] if raw_warehouse else None)
+        return Response({
+            "product": product.pk,
+            "at": moment.isoformat(),
+            "total": sum(quantities.values()),
+            "warehouses": [
+                {"warehouse": warehouse_id, "quantity": quantity} for warehouse_id, quantity in quantities.items()
+            ],
+        })
+
+    @action(detail=False, methods=["get"], url_path="lookup")
+    def scan_lookup(self, request):
+        """Resolve a scanned ?code= (barcode or SKU) to the product and its stock per warehouse."""
+        code = request.query_params.get("code", "").strip()
+        if not code:
+            return Response({"error": "Pass the scanned barcode or SKU as ?code=."}, status=status.HTTP_400_BAD_REQUEST)
+        product = lookup.lookup(code)
+        if product is None:
+            return Response({"error": f"No product with barcode or SKU {code}."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(product)
+
+    @action(detail=False, methods=["post"], url_path="import", parser_classes=[MultiPartParser, FormParser])
+    def import_products(self, request):
+        """
+        Create products from an uploaded CSV or JSON-lines ``file``. The upload
+        is parsed as a stream and inserted in chunks; bad rows are reported by
+        line number and skipped.
+        """
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"error": "Upload a CSV or JSONL file as 'file'."}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = catalog.format_for(upload.name, request.data.get("file_format"))
+        if file_format not in catalog.FORMATS:
+            return Response({"error": f"Unsupported format: {file_format}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        result = catalog.import_products(catalog.parse_rows(upload, file_format))
+        response_data = {
+            "message": f"{result['created']} products imported, {result['failed']} rows rejected.",
+            **result,
+        }
+        response_status = status.HTTP_201_CREATED if result["created"] else status.HTTP_400_BAD_REQUEST
+        return Response(response_data, status=response_status)
+
+    @action(detail=False, methods=["get"], url_path="export")
+    def export_products(self, request):
+        """Stream every product as CSV (default) or JSON lines (?file_format=jsonl)."""
+        file_format = request.query_params.get("file_format", "csv").lower()
+        if file_format not in catalog.FORMATS:
+            return Response({"error": f"Unsupported format: {file_format}."}, status=status.HTTP_400_BAD_REQUEST)
+        chunks, content_type, filename = catalog.stream_export(file_format)
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
 
 #  INVENTORY VIEW  ++++++++++++++++++++++++++++++++++++++++++++++++++
 class InventoryViewSet(viewsets.ModelViewSet):
-    queryset = Inventory.objects.all().order_by("-last_updated")
+    queryset = (
+        Inventory.objects.select_related("product", "warehouse")
+        .with_last_transaction_type()
+        .order_by("-last_updated")
+    )
     serializer_class = InventorySerializer
     permission_classes = [IsAuthenticated]
+    filter_backends = [QueryParamFilter, SearchFilter, KeysetOrderingFilter]
+    filter_params = {
+        "product": ("product_id", filters.integer),
+        "warehouse": ("warehouse_id", filters.integer),
+        "category": ("product__category_id", filters.integer),
+        "supplier": ("product__supplier_id", filters.integer),
+        "low_stock": (filters.inventory_low_stock, filters.boolean),
+    }
+    search_fields = ["@product__product_name", "^product__sku", "^product__barcode"]
+    ordering_fields = ["quantity", "last_updated", "product__product_name", "warehouse__name"]
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -255,7 +378,9 @@ class InventoryViewSet(viewsets.ModelViewSet):
             "inventory": InventorySerializer(inventory).data,
         }
 
-        print("API Response (Create):", response_data)  # ✅ Debugging
+        logger.info("inventory created", extra={
+            "inventory_id": inventory.pk, "product_id": inventory.product_id, "warehouse_id": inventory.warehouse_id,
+        })
         return Response(response_data, status=status.HTTP_201_CREATED)
 
     def update(self, request, *args, **kwargs):
@@ -269,50 +394,140 @@ class InventoryViewSet(viewsets.ModelViewSet):
             "inventory": InventorySerializer(inventory).data,
         }
 
-        print("API Response (Update):", response_data)  # ✅ Debugging
+        logger.info("inventory updated", extra={"inventory_id": inventory.pk, "fields": sorted(request.data)})
         return Response(response_data, status=status.HTTP_200_OK)
 
 
+#  STOCK LOT VIEW  ++++++++++++++++++++++++++++++++++++++++++++++++++
+class StockLotViewSet(viewsets.ReadOnlyModelViewSet):
+    """Batch stock per warehouse; ?expiring_before=YYYY-MM-DD lists lots to pick or write off first."""
+    queryset = StockLot.objects.select_related("product", "warehouse").order_by("expiry_date", "id")
+    serializer_class = StockLotSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [QueryParamFilter, SearchFilter, KeysetOrderingFilter]
+    filter_params = {
+        "product": ("product_id", filters.integer),
+        "warehouse": ("warehouse_id", filters.integer),
+        "expiring_before": (filters.lot_expiring_before, filters.day),
+    }
+    search_fields = ["^batch_number", "^product__sku"]
+    ordering_fields = ["expiry_date", "quantity", "received_at"]
+
+
 #  WAREHOUSE VIEW  ++++++++++++++++++++++++++++++++++++++++++++++++++
 class WarehouseViewSet(viewsets.ModelViewSet):
     queryset = Warehouse.objects.all().order_by("name")
     serializer_class = WarehouseSerializer
 
+    def destroy(self, request, *args, **kwargs):
+        return self.delete_warehouse(request, pk=kwargs.get("pk"))
+
     @action(detail=True, methods=["delete"])
     def delete_warehouse(self, request, pk=None):
         warehouse = get_object_or_404(Warehouse, pk=pk)
-        warehouse.delete()
+        try:
+            warehouse.delete()
+        except ProtectedError:
+            return Response(
+                {"error": "This warehouse has stock or sales history and cannot be deleted."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
         return Response({"message": "Warehouse deleted successfully"}, status=204)
 
 
+#  SALES RECORD VIEW  ++++++++++++++++++++++++++++++++++++++++++++++++++
+class SalesRecordViewSet(viewsets.ModelViewSet):
+    queryset = SalesRecord.objects.all().order_by("-date", "-id")
+    serializer_class = SalesRecordSerializer
+
+    def list(self, request, *args, **kwargs):
+        """
+        Without parameters, list the lifetime SalesRecord totals (derived
+        from the monthly rollups when the dashboard is rebuilt). With
+        ?from=YYYY-MM-DD&to=YYYY-MM-DD&granularity=day|month (and optionally
+        product / warehouse ids), list the pre-aggregated SalesRollup rows.
+        """
+        params = request.query_params
+        if not any(key in params for key in ("from", "to", "granularity")):
+            return super().list(request, *args, **kwargs)
+
+        granularity = params.get("granularity", "day")
+        if granularity not in dict(SalesRollup.GRANULARITIES):
+            return Response({"error": "granularity must be 'day' or 'month'."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            start_date = parse_date(params["from"]) if params.get("from") else None
+            end_date = parse_date(params["to"]) if params.get("to") else None
+        except ValueError:
+            start_date = end_date = None
+        if (params.get("from") and not start_date) or (params.get("to") and not end_date):
+            return Response({"error": "Dates must be in YYYY-MM-DD format."}, status=status.HTTP_400_BAD_REQUEST)
+
+        rollups = SalesRollup.objects.filter(granularity=granularity).select_related("product")
+        if start_date:
+            if granularity == "month":
+                start_date = start_date.replace(day=1)
+            rollups = rollups.filter(period_start__gte=start_date)
+        if end_date:
+            rollups = rollups.filter(period_start__lte=end_date)
+        if params.get("product", "").isdigit():
+            rollups = rollups.filter(product_id=params["product"])
+        if params.get("warehouse", "").isdigit():
+            rollups = rollups.filter(warehouse_id=params["warehouse"])
+        rollups = rollups.order_by("period_start", "product_id", "warehouse_id")
+
+        page = self.paginate_queryset(rollups)
+        serializer = SalesRollupSerializer(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+
 #  SUPPLIER VIEW  ++++++++++++++++++++++++++++++++++++++++++++++++++
 class SupplierViewSet(viewsets.ModelViewSet):
     queryset = Supplier.objects.all().order_by("supplier_name")
     serializer_class = SupplierSerializer
 
     def create(self, request, *args, **kwargs):
-        print("🔹 Incoming Data:", request.data)  # Debugging: Print incoming request data
-        
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         else:
-            print("❌ Validation Errors:", serializer.errors)  # Debugging: Print errors
+            logger.info("supplier rejected", extra={"errors": serializer.errors})
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 
 #  TRANSACTION VIEW  ++++++++++++++++++++++++++++++++++++++++++++++++++
 class TransactionViewSet(viewsets.ModelViewSet):
-    queryset = Transaction.objects.all()
+    queryset = Transaction.objects.select_related(
+        "product", "warehouse", "from_warehouse", "to_warehouse",
+    ).order_by("-transaction_date", "-id")
     serializer_class = TransactionSerializer
+    pagination_class = TransactionCursorPagination
+    filter_backends = [QueryParamFilter, SearchFilter, KeysetOrderingFilter]
+    filter_params = {
+        "transaction_type": ("transaction_type", str),
+        "product": ("product_id", filters.integer),
+        "category": ("product__category_id", filters.integer),
+        "supplier": ("product__supplier_id", filters.integer),
+        "warehouse": (filters.transaction_in_warehouse, filters.integer),
+        "status": ("status", str),
+        "from": ("transaction_date__gte", filters.day_start),
+        "to": ("transaction_date__lt", filters.day_end),
+        "min_price": ("total_price__gte", filters.decimal),
+        "max_price": ("total_price__lte", filters.decimal),
+    }
+    search_fields = ["@product__product_name", "^product__sku", "^product__barcode", "^batch_number"]
+    ordering_fields = ["transaction_date", "quantity", "total_price"]
+    ordering = ("-transaction_date", "-id")
 
     def create(self, request, *args, **kwargs):
         """
-        Create a new transaction
+        Create a new transaction. Retries carrying the same Idempotency-Key
+        header get the original response back instead of posting it again.
         """
-        return super().create(request, *args, **kwargs)
+        return idempotency.run_once(
+            request, "transaction-create", lambda: super(TransactionViewSet, self).create(request, *args, **kwargs),
+        )
 
     def update(self, request, *args, **kwargs):
         """
@@ -343,6 +558,46 @@ class TransactionViewSet(viewsets.ModelViewSet):
         context["request"] = self.request
         return context
 
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk(self, request):
+        """
+        Post a batch of transactions. Accepts a JSON list (or {"transactions": [...]})
+        and reports errors per row index; valid rows are posted together.
+        An Idempotency-Key header or "idempotency_key" field makes retries safe.
+        """
+        rows = request.data.get("transactions") if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list):
+            return Response({"error": "Expected a list of transactions."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # The key may also travel in the body: {"idempotency_key": ..., "transactions": [...]}.
+        key = request.data.get("idempotency_key") if isinstance(request.data, dict) else None
+        return idempotency.run_once(request, "transaction-bulk", lambda: self._post_bulk(request, rows), key, rows)
+
+    def _post_bulk(self, request, rows):
+        errors = []
+        valid_rows = []
+        positions = []
+        for index, row in enumerate(rows):
+            row_serializer = BulkTransactionRowSerializer(data=row)
+            if row_serializer.is_valid():
+                valid_rows.append(row_serializer.validated_data)
+                positions.append(index)
+            else:
+                errors.append({"index": index, "errors": row_serializer.errors})
+
+        transactions, post_errors = Transaction.objects.bulk_post(valid_rows, user=request.user)
+        for error in post_errors:
+            errors.append({"index": positions[error["index"]], "errors": error["errors"]})
+        errors.sort(key=lambda error: error["index"])
+
+        response_data = {
+            "message": f"{len(transactions)} of {len(rows)} transactions posted.",
+            "created": len(transactions),
+            "errors": errors,
+        }
+        response_status = status.HTTP_201_CREATED if transactions else status.HTTP_400_BAD_REQUEST
+        return Response(response_data, status=response_status)
+
 
 
 #  REPORT VIEW  ++++++++++++++++++++++++++++++++++++++++++++++++++
@@ -356,25 +611,56 @@ class ReportCreateView(generics.CreateAPIView):
         serializer.save(user=self.request.user)
 
 
+class ReportDetailView(generics.RetrieveAPIView):
+    """Poll a report's generation status and progress."""
+    queryset = Report.objects.all()
+    serializer_class = ReportSerializer
+    permission_classes = [IsAuthenticated]
 
 
-# ✅ Move the ViewSet inside a function to avoid circular import issues
-def get_viewsets():
- 
-    class ProductViewSet(viewsets.ModelViewSet):
-        queryset = Product.objects.all()
-        serializer_class = ProductSerializer
+class ReportCancelView(APIView):
+    permission_classes = [IsAuthenticated]
 
-    class SalesRecordViewSet(viewsets.ModelViewSet):
-        queryset = SalesRecord.objects.all()
-        serializer_class = SalesRecordSerializer
-    
-    
-    return CategoryViewSet, ProductViewSet, SalesRecordViewSet
+    def post(self, request, pk):
+        report = get_object_or_404(Report, pk=pk)
+        report_status = jobs.request_cancel(report)
+        return Response({"message": f"Report is {report_status}.", "status": report_status})
 
-# ✅ Use this in `urls.py`
-CategoryViewSet, ProductViewSet, SalesRecordViewSet = get_viewsets()
 
+class ReportDownloadView(APIView):
+    """
+    Download a report. Completed background jobs are served from their file;
+    otherwise the rows are streamed straight from the database cursor.
+    """
+    permission_classes = [IsAuthenticated]
 
+    def get(self, request, pk):
+        report = get_object_or_404(Report, pk=pk)
+        if report.status == "Completed" and report.output_file:
+            return FileResponse(report.output_file.open("rb"), as_attachment=True,
+                                filename=os.path.basename(report.output_file.name))
+        chunks, content_type, filename = reports.stream_report(report)
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+#  LOW STOCK ALERTS  ++++++++++++++++++++++++++++++++++++++++++++++++++
+class LowStockAlertListView(generics.ListAPIView):
+    """
+    Open low-stock alerts, newest first, read through the (status, created_at)
+    index. ?status=Resolved or ?status=all widens the list; ?product= narrows it.
+    """
+    serializer_class = LowStockAlertSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [QueryParamFilter]
+    filter_params = {
+        "product": ("product_id", filters.integer),
+    }
 
-    
\ No newline at end of file
+    def get_queryset(self):
+        alerts = LowStockAlert.objects.select_related("product").order_by("-created_at", "-id")
+        alert_status = self.request.query_params.get("status", "Open")
+        if alert_status != "all":
+            alerts = alerts.filter(status=alert_status)
+        return alerts